@@ -0,0 +1,165 @@
+# adaptive.py
+"""Fréquence d'échantillonnage adaptative par VM et par conteneur.
+
+Chaque sonde (état de la VM, stats des conteneurs) a son propre intervalle,
+borné par [min_interval, max_interval]. Il raccourcit quand les mesures
+récentes varient, quand une valeur approche d'un seuil d'alerte ou quand un
+tableau de bord consulte la VM, et s'allonge progressivement sur un hôte calme.
+"""
+import math
+import time
+from threading import Lock
+
+# Métriques (MetricsHistory) prises en compte et seuils d'alerte correspondants (alerts/alerts.py)
+HOST_THRESHOLDS = {"cpu": 90, "ram_percent": 40, "disk_percent": 80}
+CONTAINER_THRESHOLDS = {"cpu_percent": 80, "mem_percent": 80}
+PROBES = ("host", "containers")
+
+
+def volatility_score(points, scale=10.0):
+    """Écart-type des derniers points, en points de pourcentage, ramené à [0, 1]"""
+    values = [v for _, v in points]
+    if len(values) < 3:
+        return 1.0              # trop peu d'historique : on échantillonne vite
+    mean = sum(values) / len(values)
+    std = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    return min(std / scale, 1.0)
+
+
+def proximity_score(value, threshold):
+    """0 sous la moitié du seuil, 1 au seuil et au-delà"""
+    if value is None or not threshold:
+        return 0.0
+    return min(max((value / threshold - 0.5) / 0.5, 0.0), 1.0)
+
+
+class AdaptiveScheduler:
+    """Intervalle et prochaine échéance de chaque sonde (label, host|containers)"""
+
+    def __init__(self, base_interval=60, min_interval=15, max_interval=300, window=10,
+                 view_ttl=120, volatility_scale=10.0, growth=1.5):
+        self.base_interval = base_interval
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.window = window
+        self.view_ttl = view_ttl
+        self.volatility_scale = volatility_scale
+        self.growth = growth
+        self._probes = {}       # (label, sonde) -> état
+        self._containers = {}   # (label, conteneur) -> intervalle souhaité
+        self._lock = Lock()
+        self.started = time.monotonic()
+
+    def due(self, labels, now=None):
+        """{label: [sondes à lancer]} ; les VMs retirées (autre partition, VM supprimée) sont oubliées"""
+        now = time.monotonic() if now is None else now
+        wanted = set(labels)
+        with self._lock:
+            for key in [k for k in self._probes if k[0] not in wanted]:
+                del self._probes[key]
+            for key in [k for k in self._containers if k[0] not in wanted]:
+                del self._containers[key]
+            due = {}
+            for label in labels:
+                for probe in PROBES:
+                    state = self._probes.get((label, probe))
+                    if state is None or state["next"] <= now:
+                        due.setdefault(label, []).append(probe)
+            return due
+
+    def _score(self, history, label, thresholds, container=None):
+        score, reason = 0.0, "idle"
+        for metric, threshold in thresholds.items():
+            points = history.series(label, metric, container=container)[-self.window:]
+            if not points:
+                continue
+            vol = volatility_score(points, self.volatility_scale)
+            prox = proximity_score(points[-1][1], threshold)
+            if vol > score:
+                score, reason = vol, f"variance:{metric}"
+            if prox > score:
+                score, reason = prox, f"threshold:{metric}"
+        return score, reason
+
+    def _target(self, score):
+        return self.max_interval - score * (self.max_interval - self.min_interval)
+
+    def update(self, label, probe, history, viewed=False, containers=(), now=None):
+        """Recalcule l'intervalle d'une sonde après un relevé"""
+        now = time.monotonic() if now is None else now
+        if probe == "host":
+            score, reason = self._score(history, label, HOST_THRESHOLDS)
+            target = self._target(score)
+        else:
+            # Une seule commande par VM : la sonde suit le conteneur le plus exigeant
+            targets = {}
+            for name in containers:
+                c_score, c_reason = self._score(history, label, CONTAINER_THRESHOLDS, container=name)
+                targets[name] = (self._target(c_score), c_score, c_reason)
+            with self._lock:
+                for key in [k for k in self._containers if k[0] == label and k[1] not in targets]:
+                    del self._containers[key]
+                for name, (interval, _, c_reason) in targets.items():
+                    self._containers[(label, name)] = {"interval": round(interval, 1), "reason": c_reason}
+            if targets:
+                target, score, reason = min(targets.values(), key=lambda t: t[0])
+            else:
+                target, score, reason = self.max_interval, 0.0, "no_containers"
+        if viewed:
+            target, score, reason = self.min_interval, 1.0, "dashboard"
+
+        with self._lock:
+            state = self._probes.setdefault((label, probe), {"interval": self.base_interval, "probes": 0})
+            # Accélération immédiate, ralentissement progressif (évite les oscillations)
+            interval = target if target <= state["interval"] else min(target, state["interval"] * self.growth)
+            state.update({
+                "interval": round(max(self.min_interval, min(interval, self.max_interval)), 1),
+                "score": round(score, 2),
+                "reason": reason,
+                "probes": state["probes"] + 1,
+            })
+            state["next"] = now + state["interval"]
+
+    def postpone(self, label, now=None):
+        """VM alimentée par son agent : on revérifie seulement au pas minimal"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            for probe in PROBES:
+                state = self._probes.setdefault((label, probe), {"interval": self.min_interval, "probes": 0})
+                state.update({"next": now + self.min_interval, "reason": "agent"})
+
+    def info(self, detail=False):
+        """Débit effectif comparé au pas fixe `base_interval`, et économie correspondante"""
+        with self._lock:
+            probes = {k: dict(v) for k, v in self._probes.items()}
+            containers = {k: dict(v) for k, v in self._containers.items()}
+        elapsed = time.monotonic() - self.started
+        scheduled = [s for s in probes.values() if s.get("reason") != "agent"]
+        effective = sum(60 / s["interval"] for s in scheduled)
+        fixed = len(scheduled) * 60 / self.base_interval
+        done = sum(s["probes"] for s in scheduled)
+        fixed_done = len(scheduled) * elapsed / self.base_interval
+        result = {
+            "bounds_s": [self.min_interval, self.max_interval],
+            "base_interval_s": self.base_interval,
+            "probes": len(scheduled),
+            "agent_fed": len(probes) - len(scheduled),
+            "effective_probes_per_min": round(effective, 2),
+            "fixed_probes_per_min": round(fixed, 2),
+            "savings_percent": round(100 * (1 - effective / fixed), 1) if fixed else 0.0,
+            "probes_done": done,
+            "probes_at_fixed_rate": round(fixed_done),
+            "reasons": {},
+        }
+        for s in scheduled:
+            reason = s["reason"].split(":")[0]
+            result["reasons"][reason] = result["reasons"].get(reason, 0) + 1
+        if detail:
+            now = time.monotonic()
+            result["schedule"] = {
+                f"{label}/{probe}": {"interval_s": s["interval"], "score": s.get("score"), "reason": s["reason"],
+                                     "next_in_s": round(s["next"] - now, 1)}
+                for (label, probe), s in sorted(probes.items())
+            }
+            result["containers"] = {f"{label}/{name}": c for (label, name), c in sorted(containers.items())}
+        return result
@@ -0,0 +1,134 @@
+# admission.py
+"""Contrôle d'admission des commandes distantes, par hôte.
+
+Au plus `max_concurrent` commandes SSH simultanées par VM ; au-delà, les
+demandes attendent dans une file de priorité : les actions interactives
+(start/stop, logs) passent avant les lectures du tableau de bord, elles-mêmes
+avant la collecte de fond.
+"""
+import heapq
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+
+INTERACTIVE = 0
+NORMAL = 1
+BACKGROUND = 2
+PRIORITY_NAMES = {INTERACTIVE: "interactive", NORMAL: "normal", BACKGROUND: "background"}
+
+
+class AdmissionTimeout(Exception):
+    pass
+
+
+class _HostState:
+    def __init__(self):
+        self.active = 0
+        self.waiters = []           # tas de (priorité, ordre d'arrivée, Event)
+        self.admitted = 0
+        self.timeouts = 0
+        self.max_queued = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.by_priority = {name: {"admitted": 0, "wait_total": 0.0} for name in PRIORITY_NAMES.values()}
+
+
+class AdmissionController:
+    """Sémaphore par hôte dont les places libérées vont à la demande la plus prioritaire"""
+
+    def __init__(self, max_concurrent=3, timeout=60):
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._hosts = {}
+        self._lock = threading.Lock()
+        self._order = itertools.count()
+        self._local = threading.local()
+
+    @contextmanager
+    def priority(self, level):
+        """Priorité par défaut des commandes lancées par ce thread"""
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = level
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def current_priority(self):
+        level = getattr(self._local, "priority", None)
+        return NORMAL if level is None else level
+
+    @contextmanager
+    def slot(self, host, priority=None):
+        waited = self._acquire(host, self.current_priority() if priority is None else priority)
+        try:
+            yield waited
+        finally:
+            self._release(host)
+
+    def _acquire(self, host, priority):
+        started = time.monotonic()
+        with self._lock:
+            state = self._hosts.setdefault(host, _HostState())
+            if state.active < self.max_concurrent and not state.waiters:
+                state.active += 1
+                self._admitted(state, priority, 0.0)
+                return 0.0
+            event = threading.Event()
+            entry = (priority, next(self._order), event)
+            heapq.heappush(state.waiters, entry)
+            state.max_queued = max(state.max_queued, len(state.waiters))
+
+        if not event.wait(self.timeout):
+            with self._lock:
+                # La place a pu être attribuée entre l'expiration et la prise du verrou
+                if not event.is_set():
+                    state.waiters.remove(entry)
+                    heapq.heapify(state.waiters)
+                    state.timeouts += 1
+                    raise AdmissionTimeout(f"{host}: aucune place après {self.timeout}s "
+                                           f"({len(state.waiters)} en attente)")
+        waited = time.monotonic() - started
+        with self._lock:
+            self._admitted(state, priority, waited)
+        return waited
+
+    @staticmethod
+    def _admitted(state, priority, waited):
+        state.admitted += 1
+        state.wait_total += waited
+        state.wait_max = max(state.wait_max, waited)
+        stats = state.by_priority[PRIORITY_NAMES.get(priority, "normal")]
+        stats["admitted"] += 1
+        stats["wait_total"] += waited
+
+    def _release(self, host):
+        with self._lock:
+            state = self._hosts[host]
+            if state.waiters:
+                # La place passe directement au plus prioritaire (active inchangé)
+                _, _, event = heapq.heappop(state.waiters)
+                event.set()
+            else:
+                state.active -= 1
+
+    def info(self):
+        with self._lock:
+            hosts = {}
+            for host, s in self._hosts.items():
+                hosts[host] = {
+                    "active": s.active,
+                    "queued": len(s.waiters),
+                    "max_queued": s.max_queued,
+                    "admitted": s.admitted,
+                    "timeouts": s.timeouts,
+                    "avg_wait_ms": round(s.wait_total * 1000 / s.admitted, 1) if s.admitted else 0.0,
+                    "max_wait_ms": round(s.wait_max * 1000, 1),
+                    "by_priority": {
+                        name: {"admitted": p["admitted"],
+                               "avg_wait_ms": round(p["wait_total"] * 1000 / p["admitted"], 1) if p["admitted"] else 0.0}
+                        for name, p in s.by_priority.items()
+                    },
+                }
+        return {"max_concurrent": self.max_concurrent, "timeout_s": self.timeout, "hosts": hosts}
@@ -0,0 +1,235 @@
+# monitoring_agent.py
+"""Agent léger optionnel : échantillonne /proc et le socket Docker localement
+et pousse des lots en protocole ligne vers /api/ingest.
+
+Déployé via SSH par VMMonitor.deploy_agent (avec proc_metrics.py et ingest.py),
+n'utilise que la bibliothèque standard. Test local :
+
+    python agent/monitoring_agent.py --url http://127.0.0.1:5050/api/ingest --label local --interval 5
+"""
+import argparse
+import gzip
+import http.client
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import urllib.request
+from collections import deque
+
+# Déployé : modules à côté du script ; en local : racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from proc_metrics import PROC_FILES, ProcDeltaTracker  # noqa: E402
+from ingest import format_line  # noqa: E402
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("monitoring_agent")
+
+MAX_BUFFERED_LINES = 50000
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """Connexion HTTP sur le socket unix du démon Docker"""
+
+    def __init__(self, socket_path, timeout=5):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class DockerSampler:
+    """Stats des conteneurs via l'API Docker (CPU calculé par delta local)"""
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._previous = {}
+
+    def _get(self, path):
+        conn = UnixHTTPConnection(self.socket_path)
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            body = response.read()
+            if response.status != 200:
+                raise RuntimeError(f"Docker API {path}: HTTP {response.status}")
+            return json.loads(body)
+        finally:
+            conn.close()
+
+    def sample(self):
+        samples = []
+        seen = set()
+        for container in self._get("/containers/json"):
+            cid = container["Id"]
+            name = (container.get("Names") or [cid[:12]])[0].lstrip("/")
+            tags = {"name": name, "image": container.get("Image", "")}
+            project = (container.get("Labels") or {}).get("com.docker.compose.project")
+            if project:
+                tags["project"] = project
+            try:
+                stats = self._get(f"/containers/{cid}/stats?stream=false&one-shot=true")
+            except Exception as e:
+                logger.warning(f"Stats indisponibles pour {name}: {e}")
+                continue
+            seen.add(cid)
+
+            cpu_stats = stats.get("cpu_stats", {})
+            cpu_total = cpu_stats.get("cpu_usage", {}).get("total_usage", 0)
+            system_total = cpu_stats.get("system_cpu_usage", 0)
+            online = cpu_stats.get("online_cpus") or len(cpu_stats.get("cpu_usage", {}).get("percpu_usage") or []) or 1
+            previous = self._previous.get(cid)
+            if previous is None:
+                pre = stats.get("precpu_stats", {})
+                previous = (pre.get("cpu_usage", {}).get("total_usage", 0), pre.get("system_cpu_usage", 0))
+            self._previous[cid] = (cpu_total, system_total)
+            cpu_delta = cpu_total - previous[0]
+            system_delta = system_total - previous[1]
+            cpu_percent = (cpu_delta / system_delta) * online * 100.0 if previous[1] and system_delta > 0 else 0.0
+
+            memory = stats.get("memory_stats", {})
+            mem_stats = memory.get("stats", {})
+            cache = mem_stats.get("inactive_file", mem_stats.get("total_inactive_file", 0))
+            used = max(memory.get("usage", 0) - cache, 0)
+            limit = memory.get("limit", 0)
+
+            samples.append((tags, {
+                "cpu_percent": round(cpu_percent, 2),
+                "mem_used_mb": round(used / 1048576, 2),
+                "mem_limit_mb": round(limit / 1048576, 2),
+                "mem_percent": round(used * 100.0 / limit, 2) if limit else 0.0,
+            }))
+
+        for cid in set(self._previous) - seen:
+            del self._previous[cid]
+        return samples
+
+
+def read_proc_sections():
+    sections = {}
+    for name in PROC_FILES:
+        with open(f"/proc/{name}") as f:
+            sections[name] = f.read()
+    return sections
+
+
+def collect_lines(label, tracker, docker):
+    """Un échantillon complet sous forme de lignes du protocole"""
+    ts_ns = time.time_ns()
+    metrics = tracker.update(label, read_proc_sections())
+    tags = {"vm": label}
+    cpu = metrics["cpu_detail"].get("total", {})
+    load = metrics.get("load", {})
+
+    lines = [format_line("host", tags, {
+        "cpu": metrics["cpu"],
+        "user": cpu.get("user"),
+        "system": cpu.get("system"),
+        "iowait": cpu.get("iowait"),
+        "steal": cpu.get("steal"),
+        "load1": load.get("1m"),
+        "load5": load.get("5m"),
+        "load15": load.get("15m"),
+    }, ts_ns)]
+    for core, values in metrics["cpu_detail"].get("cores", {}).items():
+        lines.append(format_line("core", {**tags, "core": core}, {
+            k: values[k] for k in ("usage", "user", "system", "iowait", "steal")
+        }, ts_ns))
+    if metrics["ram"]:
+        lines.append(format_line("mem", tags, {
+            k: metrics["ram"][k] for k in ("total_mb", "used_mb", "free_mb", "available_mb", "usage_percent")
+        }, ts_ns))
+
+    fs = os.statvfs("/")
+    size_kb = fs.f_blocks * fs.f_frsize // 1024
+    avail_kb = fs.f_bavail * fs.f_frsize // 1024
+    used_kb = size_kb - fs.f_bfree * fs.f_frsize // 1024
+    lines.append(format_line("disk", tags, {
+        "size_kb": size_kb,
+        "used_kb": used_kb,
+        "avail_kb": avail_kb,
+        "use_percent": round(used_kb * 100.0 / (used_kb + avail_kb), 2) if used_kb + avail_kb else 0,
+    }, ts_ns))
+    for device, values in metrics.get("disk_io", {}).items():
+        lines.append(format_line("diskio", {**tags, "device": device}, values, ts_ns))
+
+    if docker is not None:
+        try:
+            for container_tags, values in docker.sample():
+                lines.append(format_line("container", {**tags, **container_tags}, values, ts_ns))
+        except Exception as e:
+            logger.warning(f"Socket Docker inaccessible: {e}")
+    return lines
+
+
+def push(url, token, lines, timeout=10):
+    body = gzip.compress("\n".join(lines).encode())
+    req = urllib.request.Request(url, data=body, method="POST", headers={
+        "Content-Type": "text/plain; charset=utf-8",
+        "Content-Encoding": "gzip",
+        "X-Agent-Token": token or "",
+    })
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent de métriques haute fréquence")
+    parser.add_argument("--url", required=True, help="URL de /api/ingest")
+    parser.add_argument("--label", required=True, help="Label de la VM")
+    parser.add_argument("--token", default=os.getenv("AGENT_TOKEN", ""))
+    parser.add_argument("--token-file", help="Fichier contenant le jeton (prioritaire sur --token)")
+    parser.add_argument("--interval", type=float, default=5.0, help="Période d'échantillonnage (s)")
+    parser.add_argument("--flush", type=float, default=15.0, help="Période d'envoi des lots (s)")
+    parser.add_argument("--docker-socket", default="/var/run/docker.sock")
+    parser.add_argument("--no-docker", action="store_true")
+    parser.add_argument("--once", action="store_true", help="Affiche un échantillon sans l'envoyer")
+    args = parser.parse_args()
+
+    if args.token_file:
+        with open(args.token_file) as f:
+            args.token = f.read().strip()
+
+    tracker = ProcDeltaTracker()
+    docker = None
+    if not args.no_docker and os.path.exists(args.docker_socket):
+        docker = DockerSampler(args.docker_socket)
+
+    if args.once:
+        print("\n".join(collect_lines(args.label, tracker, docker)))
+        return
+
+    buffer = deque(maxlen=MAX_BUFFERED_LINES)
+    last_flush = time.monotonic()
+    logger.info(f"Agent démarré pour {args.label} -> {args.url} (période {args.interval}s)")
+
+    while True:
+        started = time.monotonic()
+        try:
+            buffer.extend(collect_lines(args.label, tracker, docker))
+        except Exception as e:
+            logger.error(f"Erreur d'échantillonnage: {e}")
+
+        if buffer and started - last_flush >= args.flush:
+            batch = list(buffer)
+            try:
+                push(args.url, args.token, batch)
+                buffer.clear()
+            except Exception as e:
+                # On garde le lot (borné) pour le prochain envoi
+                logger.warning(f"Envoi échoué ({len(batch)} lignes en attente): {e}")
+            last_flush = started
+
+        time.sleep(max(args.interval - (time.monotonic() - started), 0))
+
+
+if __name__ == "__main__":
+    main()
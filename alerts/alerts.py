@@ -268,3 +268,60 @@ def parse_size_to_mb(size_str):
             return 0.0
     except:
         return 0.0
+
+
+FORECAST_ALERT_TYPES = {
+    "disk_percent": "disk_forecast",
+    "ram_percent": "ram_forecast",
+    "mem_percent": "container_ram_forecast",
+}
+
+
+def check_forecast_alerts(forecaster, label, horizon_hours=24):
+    """Alerte si une série disque/RAM de la VM (ou de ses conteneurs) sature avant l'horizon"""
+    alerts = []
+    for forecast in forecaster.get_vm_forecasts(label):
+        alert_type = FORECAST_ALERT_TYPES.get(forecast["metric"], "forecast")
+        target = f"conteneur {forecast['container']}" if forecast["container"] else f"VM {label}"
+        eta_hours = forecast["eta_hours"]
+        alert = {
+            "vm": label,
+            "alert_type": alert_type,
+            "current_usage": forecast["current"],
+            "eta_hours": eta_hours,
+            "horizon_hours": horizon_hours,
+            "forecast": forecast,
+            "timestamp": datetime.now().isoformat()
+        }
+        if forecast["container"]:
+            alert["container"] = forecast["container"]
+
+        if eta_hours is not None and eta_hours <= horizon_hours:
+            alert["status"] = "alert"
+            alert["message"] = f"Prévision {target}: saturation {forecast['metric']} estimée dans {eta_hours:.1f}h"
+        else:
+            alert["status"] = "ok"
+            alert["message"] = f"Prévision {target}: pas de saturation {forecast['metric']} avant {horizon_hours}h"
+        alerts.append(alert)
+    return alerts
+
+
+def check_anomaly_alerts(detector, label=None):
+    """Alertes `anomaly` : séries de conteneurs anormales par rapport à leur propre historique"""
+    alerts = []
+    for anomaly in detector.anomalies(label):
+        alerts.append({
+            "vm": anomaly["vm"],
+            "container": anomaly["container"],
+            "alert_type": "anomaly",
+            "status": "alert",
+            "metric": anomaly["metric"],
+            "z_score": anomaly["z_score"],
+            "current_value": anomaly["value"],
+            "baseline_mean": anomaly["mean"],
+            "baseline_std": anomaly["std"],
+            "message": (f"Anomalie {anomaly['metric']} conteneur {anomaly['container']}: "
+                        f"{anomaly['value']} (moyenne {anomaly['mean']}, z={anomaly['z_score']})"),
+            "timestamp": datetime.now().isoformat()
+        })
+    return alerts
@@ -0,0 +1,156 @@
+# anomaly.py
+"""Détection d'anomalies par série : moyenne et variance glissantes (EWMA).
+
+L'état de toutes les séries tient dans quelques tableaux NumPy indexés par un
+identifiant de série ; chaque cycle de collecte met à jour toutes les séries
+en une seule opération vectorisée (aucun objet Python par échantillon).
+"""
+import time
+from datetime import datetime
+from threading import Lock
+
+import numpy as np
+
+ANOMALY_METRICS = ("cpu_percent", "mem_percent")
+
+
+class AnomalyDetector:
+    """Score z de la dernière valeur de chaque série par rapport à son propre historique"""
+
+    def __init__(self, alpha=0.05, z_threshold=4.0, min_samples=20, min_std=1.0, metrics=ANOMALY_METRICS,
+                 stale_after=900):
+        self.alpha = alpha
+        # Série sans nouveau point depuis `stale_after` s (conteneur arrêté, VM injoignable) : plus signalée
+        self.stale_after = stale_after
+        self.z_threshold = z_threshold
+        self.min_samples = min_samples
+        self.min_std = min_std
+        self.metrics = metrics
+        self._ids = {}
+        self._keys = []
+        self._free = []         # identifiants de séries supprimées, réutilisés
+        self._lock = Lock()
+        self._allocate(64)
+        self.last_run = None
+        self.last_duration_ms = None
+
+    def _allocate(self, capacity):
+        def grow(name, dtype):
+            new = np.zeros(capacity, dtype=dtype)
+            old = getattr(self, name, None)
+            if old is not None:
+                new[:len(old)] = old
+            setattr(self, name, new)
+
+        grow("mean", np.float64)
+        grow("var", np.float64)
+        grow("count", np.int64)
+        grow("last_ts", np.float64)
+        grow("last_value", np.float64)
+        grow("last_z", np.float64)
+
+    def _series_ids(self, keys):
+        ids = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            sid = self._ids.get(key)
+            if sid is None:
+                if self._free:
+                    sid = self._free.pop()
+                    self._keys[sid] = key
+                else:
+                    sid = len(self._keys)
+                    self._keys.append(key)
+                self._ids[key] = sid
+            ids[i] = sid
+        if len(self._keys) > len(self.mean):
+            self._allocate(max(len(self._keys), 2 * len(self.mean)))
+        return ids
+
+    def update(self, history):
+        """Intègre le dernier point de chaque série de l'historique (un pas vectorisé)"""
+        started = time.perf_counter()
+        latest = history.latest(self.metrics)
+        with self._lock:
+            # Séries retirées de l'historique (conteneurs supprimés) : place libérée
+            gone = [key for key in self._ids if key not in latest]
+            if gone:
+                self._release(gone)
+            if latest:
+                keys = list(latest)
+                values = np.fromiter((latest[k][1] for k in keys), dtype=np.float64, count=len(keys))
+                stamps = np.fromiter((latest[k][0] for k in keys), dtype=np.float64, count=len(keys))
+                ids = self._series_ids(keys)
+
+                # Seuls les points nouveaux depuis le cycle précédent sont intégrés
+                fresh = stamps > self.last_ts[ids]
+                ids, values, stamps = ids[fresh], values[fresh], stamps[fresh]
+
+                mean = self.mean[ids]
+                var = self.var[ids]
+                count = self.count[ids]
+                std = np.maximum(np.sqrt(var), self.min_std)
+                z = np.where(count > 0, (values - mean) / std, 0.0)
+
+                diff = values - mean
+                increment = self.alpha * diff
+                first = count == 0
+                self.mean[ids] = np.where(first, values, mean + increment)
+                self.var[ids] = np.where(first, 0.0, (1 - self.alpha) * (var + diff * increment))
+                self.count[ids] = count + 1
+                self.last_ts[ids] = stamps
+                self.last_value[ids] = values
+                self.last_z[ids] = z
+
+            self.last_run = time.time()
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def _describe(self, sid):
+        label, container, metric = self._keys[sid]
+        return {
+            "vm": label,
+            "container": container,
+            "metric": metric,
+            "value": round(float(self.last_value[sid]), 2),
+            "mean": round(float(self.mean[sid]), 2),
+            "std": round(float(np.sqrt(self.var[sid])), 3),
+            "z_score": round(float(self.last_z[sid]), 2),
+            "samples": int(self.count[sid]),
+        }
+
+    def anomalies(self, label=None):
+        """Séries actives dont le dernier score |z| dépasse le seuil (après la période de chauffe)"""
+        with self._lock:
+            n = len(self._keys)
+            hits = np.nonzero((np.abs(self.last_z[:n]) >= self.z_threshold) & (self.count[:n] > self.min_samples)
+                              & (self.last_ts[:n] >= time.time() - self.stale_after))[0]
+            results = [self._describe(sid) for sid in hits]
+        if label is not None:
+            results = [r for r in results if r["vm"] == label]
+        return sorted(results, key=lambda r: -abs(r["z_score"]))
+
+    def _release(self, keys):
+        for key in keys:
+            sid = self._ids.pop(key)
+            self._keys[sid] = None
+            self.count[sid] = 0
+            self.last_ts[sid] = 0.0
+            self.last_z[sid] = 0.0
+            self._free.append(sid)
+
+    def forget(self, label, containers=None):
+        """Supprime les séries d'une VM, ou de certains de ses conteneurs (supprimés ou recréés)"""
+        with self._lock:
+            self._release([key for key in self._ids
+                           if key[0] == label and (containers is None or key[1] in containers)])
+
+    def info(self):
+        with self._lock:
+            return {
+                "series": len(self._ids),
+                "memory_bytes": sum(a.nbytes for a in (self.mean, self.var, self.count,
+                                                       self.last_ts, self.last_value, self.last_z)),
+                "last_run": datetime.fromtimestamp(self.last_run).isoformat() if self.last_run else None,
+                "last_duration_ms": self.last_duration_ms,
+                "alpha": self.alpha,
+                "z_threshold": self.z_threshold,
+            }
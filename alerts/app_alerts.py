@@ -2,14 +2,17 @@
 from flask import Blueprint, request, jsonify
 from alerts.alerts import (
     check_ram_alert, check_disk_alert,
-    check_container_cpu_alert, check_container_ram_alert, check_container_disk_alert
+    check_container_cpu_alert, check_container_ram_alert, check_container_disk_alert,
+    check_forecast_alerts, check_anomaly_alerts
 )
 
+from admission import BACKGROUND
+
 import logging
 
 logger = logging.getLogger(__name__)
 
-def create_alerts_routes(app, monitor):
+def create_alerts_routes(app, monitor, forecaster=None, anomaly_detector=None, shard=None):
     import smtplib
     import ssl
     from email.mime.text import MIMEText
@@ -21,21 +24,27 @@ def create_alerts_routes(app, monitor):
             alerts = []
             vms = monitor.get_all_vms()
 
-            for vm in vms:
-                label = vm["label"]
-
-                alerts.append(check_ram_alert(monitor, label))
-                alerts.append(check_disk_alert(monitor, label))
-
-                try:
-                    containers = monitor.get_vm_containers(label, container_type="running")
-                    for container in containers:
-                        name = container["Names"]
-                        alerts.append(check_container_cpu_alert(monitor, label, name))
-                        alerts.append(check_container_ram_alert(monitor, label, name))
-                        alerts.append(check_container_disk_alert(monitor, label, name))
-                except:
-                    continue
+            # Évaluation en masse : passe après les actions des utilisateurs dans la file de chaque VM
+            with monitor.admission.priority(BACKGROUND):
+                for vm in vms:
+                    label = vm["label"]
+
+                    alerts.append(check_ram_alert(monitor, label))
+                    alerts.append(check_disk_alert(monitor, label))
+                    if forecaster is not None:
+                        alerts.extend(check_forecast_alerts(forecaster, label))
+                    if anomaly_detector is not None:
+                        alerts.extend(check_anomaly_alerts(anomaly_detector, label))
+
+                    try:
+                        containers = monitor.get_vm_containers(label, container_type="running")
+                        for container in containers:
+                            name = container["Names"]
+                            alerts.append(check_container_cpu_alert(monitor, label, name))
+                            alerts.append(check_container_ram_alert(monitor, label, name))
+                            alerts.append(check_container_disk_alert(monitor, label, name))
+                    except:
+                        continue
 
             alerts = [a for a in alerts if a["status"] == "alert"]
 
@@ -74,24 +83,35 @@ def create_alerts_routes(app, monitor):
         alerts = []
 
         vms = monitor.get_all_vms()
-        for vm in vms:
-            label = vm["label"]
-
-            # Alertes VM
-            alerts.append(check_ram_alert(monitor, label))
-            alerts.append(check_disk_alert(monitor, label))
-
-            # Conteneurs actifs
-            try:
-                containers = monitor.get_vm_containers(label, container_type="running")
-                for container in containers:
-                    name = container["Names"]
-                    alerts.append(check_container_cpu_alert(monitor, label, name))
-                    alerts.append(check_container_ram_alert(monitor, label, name))
-                    alerts.append(check_container_disk_alert(monitor, label, name))
-            except:
-                continue
+        if shard is not None:
+            # Plusieurs instances : chacune évalue les VMs qu'elle collecte
+            vms = [vm for vm in vms if shard.owns(vm["label"])]
+        with monitor.admission.priority(BACKGROUND):
+            for vm in vms:
+                label = vm["label"]
 
+                # Alertes VM
+                alerts.append(check_ram_alert(monitor, label))
+                alerts.append(check_disk_alert(monitor, label))
+                if forecaster is not None:
+                    alerts.extend(check_forecast_alerts(forecaster, label))
+                if anomaly_detector is not None:
+                    alerts.extend(check_anomaly_alerts(anomaly_detector, label))
+
+                # Conteneurs actifs
+                try:
+                    containers = monitor.get_vm_containers(label, container_type="running")
+                    for container in containers:
+                        name = container["Names"]
+                        alerts.append(check_container_cpu_alert(monitor, label, name))
+                        alerts.append(check_container_ram_alert(monitor, label, name))
+                        alerts.append(check_container_disk_alert(monitor, label, name))
+                except:
+                    continue
+
+        if shard is not None and request.args.get("local") != "1":
+            alerts, errors = shard.gather("/api/alerts", request.args, "alerts", alerts)
+            return jsonify({"alerts": alerts, "shard_errors": errors})
         return jsonify({"alerts": alerts})
 
     @app.route('/api/vm/<label>/alerts/ram', methods=['GET'])
@@ -116,6 +136,34 @@ def create_alerts_routes(app, monitor):
             logger.error(f"Error checking disk alert for VM {label}: {e}")
             return jsonify({"vm": label, "alert_type": "disk", "error": str(e)}), 500
 
+    @app.route('/api/vm/<label>/forecast', methods=['GET'])
+    def api_get_vm_forecast(label):
+        if forecaster is None:
+            return jsonify({"vm": label, "error": "Prévision désactivée", "status": "disabled"}), 503
+        try:
+            horizon = request.args.get('horizon', 24, type=float)
+            return jsonify({
+                "vm": label,
+                "forecasts": forecaster.get_vm_forecasts(label),
+                "alerts": check_forecast_alerts(forecaster, label, horizon),
+                "forecaster": forecaster.info(),
+                "status": "ok"
+            }), 200
+        except Exception as e:
+            logger.error(f"Error computing forecast for VM {label}: {e}")
+            return jsonify({"vm": label, "error": str(e), "status": "error"}), 500
+
+    @app.route('/api/anomalies', methods=['GET'])
+    def api_get_anomalies():
+        if anomaly_detector is None:
+            return jsonify({"error": "Détection d'anomalies désactivée", "status": "disabled"}), 503
+        label = request.args.get('vm')
+        return jsonify({
+            "alerts": check_anomaly_alerts(anomaly_detector, label),
+            "detector": anomaly_detector.info(),
+            "status": "ok"
+        }), 200
+
     @app.route('/api/vm/<label>/alerts/container/<container_name>/cpu', methods=['GET'])
     def api_check_container_cpu_alert(label, container_name):
         try:
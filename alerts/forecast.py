@@ -0,0 +1,143 @@
+# forecast.py
+"""Prévision de saturation disque / mémoire à partir de l'historique des métriques.
+
+Toutes les séries sont alignées dans une matrice (séries x points) et les
+tendances sont ajustées en une seule passe NumPy (moindres carrés pondérés
+avec repondération de Huber), quel que soit le nombre de VMs et de conteneurs.
+"""
+import time
+from datetime import datetime
+from itertools import chain
+from threading import Lock
+
+import numpy as np
+
+# Métriques exprimées en pourcentage d'une capacité
+FORECAST_METRICS = ("disk_percent", "ram_percent", "mem_percent")
+
+
+def build_matrix(series, window_seconds, now, max_points=720):
+    """Aligne les séries à droite dans des matrices (t en heures relatives à now, y, masque).
+
+    Tous les points sont concaténés en un seul tableau puis placés par indexation
+    vectorisée : la colonne d'un point dépend de sa distance à la fin de sa série.
+    """
+    keys = list(series)
+    lengths = np.fromiter((len(series[k]) for k in keys), dtype=np.int64, count=len(keys))
+    width = int(min(lengths.max(initial=0), max_points))
+    t = np.zeros((len(keys), width), dtype=np.float64)
+    y = np.zeros((len(keys), width), dtype=np.float64)
+    mask = np.zeros((len(keys), width), dtype=bool)
+    if not width:
+        return keys, t, y, mask
+
+    points = np.fromiter(chain.from_iterable(chain.from_iterable(series[k] for k in keys)),
+                         dtype=np.float64, count=2 * int(lengths.sum())).reshape(-1, 2)
+    rows = np.repeat(np.arange(len(keys)), lengths)
+    # Rang depuis la fin de la série (0 = dernier point)
+    from_end = np.repeat(np.cumsum(lengths), lengths) - 1 - np.arange(len(points))
+    # Points triés par date : ceux de la fenêtre forment un suffixe, l'alignement à droite est conservé
+    keep = (from_end < width) & (points[:, 0] >= now - window_seconds)
+    rows, cols, points = rows[keep], width - 1 - from_end[keep], points[keep]
+    t[rows, cols] = (points[:, 0] - now) / 3600.0
+    y[rows, cols] = points[:, 1]
+    mask[rows, cols] = True
+    return keys, t, y, mask
+
+
+def _weighted_fit(t, y, w):
+    sw = w.sum(axis=1)
+    st = (w * t).sum(axis=1)
+    sy = (w * y).sum(axis=1)
+    stt = (w * t * t).sum(axis=1)
+    sty = (w * t * y).sum(axis=1)
+    den = sw * stt - st * st
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(np.abs(den) > 1e-12, (sw * sty - st * sy) / den, 0.0)
+        intercept = np.where(sw > 0, (sy - slope * st) / sw, np.nan)
+    return slope, intercept
+
+
+def fit_trends(t, y, mask, robust_iterations=3, huber_k=1.345):
+    """Ajuste y = a + b.t pour chaque ligne ; retourne (pente/h, valeur à t=0, écart-type résiduel)"""
+    w = mask.astype(np.float64)
+    slope, intercept = _weighted_fit(t, y, w)
+    for _ in range(robust_iterations):
+        resid = np.abs(y - (intercept[:, None] + slope[:, None] * t))
+        masked = np.where(mask, resid, np.nan)
+        with np.errstate(all="ignore"):
+            scale = 1.4826 * np.nanmedian(masked, axis=1)
+        scale = np.where(np.isfinite(scale) & (scale > 1e-9), scale, 1e-9)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            w = np.where(mask, np.minimum(1.0, huber_k * scale[:, None] / np.maximum(resid, 1e-12)), 0.0)
+        slope, intercept = _weighted_fit(t, y, w)
+
+    resid = np.where(mask, y - (intercept[:, None] + slope[:, None] * t), 0.0)
+    count = mask.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        residual_std = np.sqrt((resid ** 2).sum(axis=1) / np.maximum(count - 2, 1))
+    return slope, intercept, residual_std
+
+
+class Forecaster:
+    """Calcule, à chaque cycle de collecte, le temps estimé avant saturation de chaque série"""
+
+    def __init__(self, window_hours=6, min_points=5, capacity=100.0, horizon_hours=24 * 365):
+        self.window_seconds = window_hours * 3600
+        # Au-delà, pas de saturation prévue (série quasi plate) : eta None
+        self.horizon_hours = horizon_hours
+        self.min_points = min_points
+        self.capacity = capacity
+        self._results = {}
+        self._lock = Lock()
+        self.last_run = None
+        self.last_duration_ms = None
+
+    def update(self, history):
+        started = time.perf_counter()
+        now = time.time()
+        series = {k: v for k, v in history.snapshot(FORECAST_METRICS).items() if len(v) >= self.min_points}
+        results = {}
+        if series:
+            keys, t, y, mask = build_matrix(series, self.window_seconds, now)
+            slope, current, residual_std = fit_trends(t, y, mask)
+            count = mask.sum(axis=1)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                eta_hours = np.where(slope > 1e-6, (self.capacity - current) / slope, np.inf)
+            eta_hours = np.where(current >= self.capacity, 0.0, eta_hours)
+            eta_hours = np.where(eta_hours > self.horizon_hours, np.inf, eta_hours)
+
+            for i, key in enumerate(keys):
+                if count[i] < self.min_points:
+                    continue
+                label, container, metric = key
+                eta = float(eta_hours[i])
+                results[key] = {
+                    "vm": label,
+                    "container": container,
+                    "metric": metric,
+                    "current": round(float(current[i]), 2),
+                    "slope_per_hour": round(float(slope[i]), 4),
+                    "residual_std": round(float(residual_std[i]), 3),
+                    "points": int(count[i]),
+                    "eta_hours": round(eta, 2) if np.isfinite(eta) else None,
+                    "eta": datetime.fromtimestamp(now + eta * 3600).isoformat() if np.isfinite(eta) else None,
+                }
+
+        with self._lock:
+            self._results = results
+            self.last_run = now
+            self.last_duration_ms = round((time.perf_counter() - started) * 1000, 2)
+
+    def get_vm_forecasts(self, label):
+        with self._lock:
+            return [r for (vm, _, _), r in self._results.items() if vm == label]
+
+    def info(self):
+        with self._lock:
+            return {
+                "series": len(self._results),
+                "last_run": datetime.fromtimestamp(self.last_run).isoformat() if self.last_run else None,
+                "last_duration_ms": self.last_duration_ms,
+                "window_hours": self.window_seconds / 3600,
+            }
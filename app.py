@@ -1,27 +1,107 @@
 # app.py
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 from datetime import datetime
 from vm_utils import VMMonitor
+from collector import Collector
+from shared_cache import LeaderLock
+from sharding import LOCAL_PARAM, ShardCoordinator, ShardRegistry
+from adaptive import AdaptiveScheduler
+from admission import AdmissionTimeout
+from ingest import parse_lines
+from intents import format_answer
+from listing import apply_listing, has_listing_params
 import logging
 import paramiko
 import socket
 import io
+import json
+import os
+import gzip
+import hmac
+import atexit
 from alerts.app_alerts import create_alerts_routes
+from alerts.forecast import Forecaster
+from alerts.anomaly import AnomalyDetector
 
 # Initialize
-monitor = VMMonitor()
+if int(os.getenv("FAKE_FLEET", 0)):
+    # FAKE_FLEET=N : VMs simulées (tests de charge et de répartition sans SSH ni MySQL)
+    from fake_fleet import FakeFleetMonitor
+    monitor = FakeFleetMonitor()
+else:
+    monitor = VMMonitor()
+# Plusieurs instances (SHARD_ID) : les VMs sont réparties par hachage cohérent sur le label
+SHARD_ID = os.getenv("SHARD_ID")
+shard = ShardCoordinator(
+    ShardRegistry(os.getenv("SHARD_REGISTRY", "/tmp/vm-monitor/shards.db")),
+    SHARD_ID,
+    os.getenv("SHARD_URL", f"http://127.0.0.1:{os.getenv('PORT', 5050)}"),
+    heartbeat_interval=float(os.getenv("SHARD_HEARTBEAT", 5)),
+    ttl=float(os.getenv("SHARD_TTL", 15)),
+) if SHARD_ID else None
+if shard is not None:
+    # Une VM consultée via une autre instance accélère tout de même sa collecte chez le propriétaire
+    monitor.view_logs.append(shard.registry)
+# Plusieurs workers : le verrou désigne le seul collecteur qui interroge la flotte (par instance)
+LEADER_LOCK_PATH = (f"{os.environ['SHARED_CACHE_PATH']}.{SHARD_ID or 'leader'}.lock"
+                    if os.getenv("SHARED_CACHE_PATH") else None)
+COLLECT_INTERVAL = int(os.getenv("COLLECT_INTERVAL", 60))
+# Fréquence adaptative : chaque sonde entre SAMPLING_MIN et SAMPLING_MAX secondes (ADAPTIVE_SAMPLING=0 : pas fixe)
+scheduler = AdaptiveScheduler(
+    base_interval=COLLECT_INTERVAL,
+    min_interval=int(os.getenv("SAMPLING_MIN", 15)),
+    max_interval=int(os.getenv("SAMPLING_MAX", 300)),
+    view_ttl=int(os.getenv("SAMPLING_VIEW_TTL", 120)),
+) if os.getenv("ADAPTIVE_SAMPLING", "1") == "1" else None
+collector = Collector(
+    monitor,
+    interval=COLLECT_INTERVAL,
+    leader_lock=LeaderLock(LEADER_LOCK_PATH) if LEADER_LOCK_PATH else None,
+    shard=shard,
+    scheduler=scheduler,
+)
+AGENT_TOKEN = os.getenv("AGENT_TOKEN", "")
+forecaster = Forecaster(window_hours=float(os.getenv("FORECAST_WINDOW_HOURS", 6)))
+collector.add_cycle_hook(lambda labels: forecaster.update(monitor.history))
+# Série sans point depuis trois intervalles de sonde : conteneur arrêté ou VM injoignable, plus signalée
+anomaly_detector = AnomalyDetector(
+    z_threshold=float(os.getenv("ANOMALY_Z_THRESHOLD", 4.0)),
+    stale_after=3 * (scheduler.max_interval if scheduler else COLLECT_INTERVAL),
+)
+collector.add_cycle_hook(lambda labels: anomaly_detector.update(monitor.history))
+monitor.container_removed_hooks.append(anomaly_detector.forget)
+# Inventaire des images : seules les VMs dont l'inventaire a expiré sont interrogées
+collector.add_cycle_hook(lambda labels: monitor.refresh_stale_images(labels))
+# Redémarrage à chaud : dernières données servies (marquées stale) pendant un premier cycle étalé
+if monitor.load_checkpoint():
+    collector.stagger = collector.interval
+collector.add_cycle_hook(lambda labels: monitor.save_checkpoint())
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
-create_alerts_routes(app, monitor)
+create_alerts_routes(app, monitor, forecaster, anomaly_detector, shard)
+
+
+@app.after_request
+def busy_status(response):
+    """File de commandes de la VM saturée ("busy") : 503 au lieu de l'erreur générique de la route"""
+    if response.status_code >= 400 and response.is_json:
+        data = response.get_json(silent=True)
+        items = data if isinstance(data, list) else [data]
+        if any(isinstance(item, dict) and item.get("status") == "busy" for item in items):
+            response.status_code = 503
+            response.headers["Retry-After"] = str(int(monitor.admission.timeout))
+    return response
+
 
 @app.route('/api/vm/<label>/joget-projects', methods=['GET'])
 def api_get_joget_projects(label):
     try:
-        data = monitor.get_joget_projects(label)
+        # ?refresh=1 : ignore le cache et refait l'inventaire complet
+        data = monitor.get_joget_projects(label, force=request.args.get("refresh") == "1")
         return jsonify(data), 200 if data.get("status") == "ok" else 500
     except Exception as e:
         logger.error(f"Erreur lors de la récupération des projets Joget pour VM {label} : {e}")
@@ -58,6 +138,26 @@ def api_stop_container():
     return jsonify(result), 200 if result.get("status") == "stopped" else 500
 
 
+@app.route('/api/containers/actions', methods=['POST'])
+def api_bulk_container_actions():
+    """Actions groupées : [{"vm", "container", "action": start|stop|restart}], résultats en NDJSON au fil de l'eau"""
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Expected a non-empty 'items' list", "status": "bad_request"}), 400
+
+    def generate():
+        total, failed = 0, 0
+        for result in monitor.bulk_container_actions(items):
+            total += 1
+            failed += result["status"] not in ("started", "stopped", "restarted")
+            yield json.dumps(result) + "\n"
+        yield json.dumps({"status": "done", "total": total, "failed": failed}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson",
+                    headers={"X-Accel-Buffering": "no"})
+
+
 @app.route('/api/vm/docker/container/logs', methods=['GET'])
 def api_get_container_logs():
     print("Headers:", dict(request.headers))
@@ -91,9 +191,28 @@ def api_get_all_vms():
         vms = monitor.get_all_vms()
         if isinstance(vms, dict) and "error" in vms:
             return jsonify(vms), 500
+        if shard is None:
+            return jsonify({
+                "total": len(vms),
+                "vms": vms,
+                "timestamp": datetime.now().isoformat()
+            })
+
+        # Chaque instance renseigne le statut des VMs qu'elle collecte
+        owned = monitor.annotate_vms([{**vm, "shard": SHARD_ID} for vm in vms if shard.owns(vm["label"])])
+        if request.args.get(LOCAL_PARAM) == "1":
+            return jsonify({"total": len(owned), "vms": owned, "shard": SHARD_ID})
+        merged, errors = shard.gather("/api/vms", request.args, "vms", owned)
+        seen = {vm["label"] for vm in merged}
+        # Instance injoignable : ses VMs restent listées, sans statut
+        merged += [{**vm, "shard": shard.owner(vm["label"]), "shard_unreachable": True}
+                   for vm in vms if vm["label"] not in seen]
+        merged.sort(key=lambda vm: vm["label"])
         return jsonify({
-            "total": len(vms), 
-            "vms": vms, 
+            "total": len(merged),
+            "vms": merged,
+            "shards": shard.status()["members"],
+            "shard_errors": errors,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -127,17 +246,28 @@ def api_get_vm_stats():
             "status": "server_error"
         }), 500
 
+def listing_response(result, default_sort="Names"):
+    """Sans paramètre de liste : réponse complète inchangée ; sinon filtres, tri, projection et curseur"""
+    if not has_listing_params(request.args):
+        return jsonify(result), 200
+    try:
+        data, meta = apply_listing(result.get("data", []), request.args, default_sort=default_sort)
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "bad_request"}), 400
+    return jsonify({**result, "data": data, "count": len(data), **meta}), 200
+
+
 @app.route('/api/vm/<label>/docker/containers', methods=['GET'])
 def api_get_vm_containers(label):
     """Récupère les conteneurs Docker d'une VM"""
     try:
-        containers = monitor.get_docker_containers(label)
+        containers = monitor.list_containers(label, force=request.args.get("refresh") == "1")
         
         if isinstance(containers, dict) and "error" in containers:
             status_code = 404 if containers.get("status") == "not_found" else 500
             return jsonify(containers), status_code
             
-        return jsonify(containers)
+        return listing_response(containers)
     except Exception as e:
         logger.error(f"Error getting containers for VM {label}: {e}")
         return jsonify({"vm": label, "error": str(e), "status": "server_error"}), 500
@@ -153,13 +283,13 @@ def api_get_vm_images():
         }), 400
 
     try:
-        images = monitor.get_docker_images(label)
+        images = monitor.get_inventory(label, "images", force=request.args.get("refresh") == "1")
         
         if isinstance(images, dict) and "error" in images:
             status_code = 404 if images.get("status") == "not_found" else 500
             return jsonify(images), status_code
             
-        return jsonify(images), 200
+        return listing_response(images, default_sort="Repository")
     except Exception as e:
         logger.error(f"Error getting images for VM {label}: {e}")
         return jsonify({
@@ -237,8 +367,10 @@ def api_get_running_containers():
 }), 400
 
     try:
-        data = monitor.get_running_containers(label)
-        return jsonify(data), 200 if data.get("status") == "ok" else 404
+        data = monitor.list_containers(label, state="running", force=request.args.get("refresh") == "1")
+        if data.get("status") != "ok":
+            return jsonify(data), 404
+        return listing_response(data)
     except Exception as e:
         logger.error(f"Error getting running containers for VM {label}: {e}")
         return jsonify([{"vm": label, "error": str(e), "status": "server_error"}]), 500
@@ -280,8 +412,10 @@ def api_get_stopped_containers():
         }), 400
 
     try:
-        data = monitor.get_stopped_containers(label)
-        return jsonify(data), 200 if data.get("status") == "ok" else 404
+        data = monitor.list_containers(label, state="stopped", force=request.args.get("refresh") == "1")
+        if data.get("status") != "ok":
+            return jsonify(data), 404
+        return listing_response(data)
     except Exception as e:
         logger.error(f"Error getting stopped containers for VM {label}: {e}")
         return jsonify({
@@ -475,6 +609,189 @@ def validate_vm_credentials():
         }), 500
 
 
+@app.route('/api/ingest', methods=['POST'])
+def api_ingest():
+    """Reçoit les lots de métriques poussés par les agents (protocole ligne)"""
+    if not AGENT_TOKEN:
+        # Sans jeton configuré, n'importe qui pourrait écrire dans les caches et l'historique
+        return jsonify({"error": "Ingestion disabled: AGENT_TOKEN is not configured", "status": "disabled"}), 403
+    token = request.headers.get("X-Agent-Token", "")
+    if not hmac.compare_digest(token, AGENT_TOKEN):
+        return jsonify({"error": "Invalid agent token", "status": "unauthorized"}), 401
+
+    try:
+        body = request.get_data()
+        if request.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        points, errors = parse_lines(body.decode("utf-8"))
+        result = monitor.ingest_agent_points(points)
+        return jsonify({**result, "rejected": errors, "status": "ok"}), 200
+    except Exception as e:
+        logger.error(f"Erreur ingestion agent: {e}")
+        return jsonify({"error": str(e), "status": "bad_request"}), 400
+
+
+@app.route('/api/vm/<label>/agent/deploy', methods=['POST'])
+def api_deploy_agent(label):
+    """Déploie l'agent de push sur une VM via SSH"""
+    if not AGENT_TOKEN:
+        return jsonify({"vm": label, "error": "AGENT_TOKEN is not configured: /api/ingest would refuse the agent",
+                        "status": "disabled"}), 409
+    data = request.get_json(silent=True) or {}
+    ingest_url = data.get("ingest_url") or request.host_url.rstrip("/") + "/api/ingest"
+    interval = data.get("interval", 5)
+    result = monitor.deploy_agent(label, ingest_url, interval=interval, token=AGENT_TOKEN)
+    status_code = 200 if result.get("status") == "deployed" else (404 if result.get("status") == "not_found" else 500)
+    return jsonify(result), status_code
+
+
+@app.route('/api/vm/<label>/agent/stop', methods=['POST'])
+def api_stop_agent(label):
+    result = monitor.stop_agent(label)
+    status_code = 200 if result.get("status") == "stopped" else (404 if result.get("status") == "not_found" else 500)
+    return jsonify(result), status_code
+
+
+@app.route('/api/vm/<label>/history', methods=['GET'])
+def api_get_vm_history(label):
+    """Historique d'une métrique (cpu, ram_percent, disk_percent, cpu_percent, mem_percent)"""
+    metric = request.args.get("metric", "cpu")
+    container = request.args.get("container")
+    points = monitor.history.series(label, metric, container=container)
+    return jsonify({
+        "vm": label,
+        "container": container,
+        "metric": metric,
+        "points": [{"ts": ts, "value": value} for ts, value in points],
+        "count": len(points)
+    })
+
+
+@app.route('/api/fleet/top', methods=['GET'])
+def api_fleet_top():
+    """Top-N des conteneurs de toute la flotte (metric=cpu|mem|mem_percent)"""
+    metric = request.args.get("metric", "cpu")
+    n = request.args.get("n", 10, type=int)
+    try:
+        containers = monitor.fleet_index.top(metric, n, vm=request.args.get("vm"))
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "bad_request"}), 400
+    return jsonify({
+        "metric": metric,
+        "containers": containers,
+        "count": len(containers),
+        "index": monitor.fleet_index.info(),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@app.route('/api/fleet/aggregate', methods=['GET'])
+def api_fleet_aggregate():
+    """Agrégats par image, VM ou projet compose (by=image|vm|project)"""
+    by = request.args.get("by", "image")
+    metric = request.args.get("metric", "cpu")
+    n = request.args.get("n", type=int)
+    try:
+        groups = monitor.fleet_index.aggregate(by, metric, n)
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "bad_request"}), 400
+    return jsonify({
+        "by": by,
+        "metric": metric,
+        "groups": groups,
+        "count": len(groups),
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+def _bool_arg(name):
+    value = request.args.get(name)
+    return None if value is None else value.lower() in ("1", "true", "yes")
+
+
+@app.route('/api/fleet/images', methods=['GET'])
+def api_fleet_images():
+    """Images de la flotte dédupliquées par ID (filtres : vm, q, dangling, unused ; tri : size|fleet_size|vms|name)"""
+    vm = request.args.get("vm")
+    if request.args.get("refresh") == "1":
+        labels = [vm] if vm else [v["label"] for v in monitor.get_all_vms() if isinstance(v, dict)]
+        monitor.refresh_stale_images(labels, force=True)
+    elif vm and monitor.image_index.updated_at(vm) is None:
+        monitor.refresh_image_inventory(vm)
+
+    offset = max(request.args.get("offset", 0, type=int), 0)
+    limit = min(max(request.args.get("limit", 50, type=int), 1), 500)
+    try:
+        images, total = monitor.image_index.query(
+            vm=vm,
+            q=request.args.get("q"),
+            dangling=_bool_arg("dangling"),
+            unused=_bool_arg("unused"),
+            sort=request.args.get("sort", "size"),
+            offset=offset,
+            limit=limit,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e), "status": "bad_request"}), 400
+    return jsonify({
+        "images": images,
+        "total": total,
+        "offset": offset,
+        "limit": limit,
+        "summary": monitor.image_index.summary(),
+        "status": "ok",
+        "timestamp": datetime.now().isoformat()
+    })
+
+
+@app.route('/api/chatbot/command', methods=['POST'])
+def api_chatbot_command():
+    """Répond aux questions sur l'état de l'infrastructure (intentions reconnues) sans LLM"""
+    data = request.get_json(silent=True) or {}
+    message = data.get("message", "")
+    try:
+        result = monitor.process_chatbot_message(message)
+    except AdmissionTimeout as e:
+        result = {"error": str(e), "status": "busy"}
+    except Exception as e:
+        logger.error(f"Erreur commande chatbot '{message}': {e}")
+        return jsonify({"error": str(e), "status": "failed"}), 500
+    if result.get("status") == "unknown":
+        return jsonify(result), 200
+    return jsonify({**result, "answer": format_answer(result)}), 200
+
+
+@app.route('/api/collector/schedule', methods=['GET'])
+def api_collector_schedule():
+    """Intervalle, score et raison de chaque sonde (fréquence adaptative)"""
+    if scheduler is None:
+        return jsonify({"error": "Fréquence adaptative désactivée (ADAPTIVE_SAMPLING=0)", "status": "disabled"}), 404
+    return jsonify({**scheduler.info(detail=True), "timestamp": datetime.now().isoformat()})
+
+
+@app.route('/api/admission', methods=['GET'])
+def api_admission():
+    """Commandes en cours, file d'attente et temps d'attente par VM"""
+    return jsonify({**monitor.admission.info(), "timestamp": datetime.now().isoformat()})
+
+
+@app.route('/api/collector/stats', methods=['GET'])
+def api_collector_stats():
+    return jsonify({
+        "collector": {**collector.stats, "interval": collector.interval},
+        "history": monitor.history.info(),
+        "forecaster": forecaster.info(),
+        "anomaly_detector": anomaly_detector.info(),
+        "stats_streams": monitor.stats_streams.info(),
+        "shared_cache": monitor.shared_cache_info(),
+        "checkpoint": monitor.checkpoint_info(),
+        "shard": shard.status() if shard else None,
+        "admission": monitor.admission.info(),
+        "scheduler": scheduler.info() if scheduler else None,
+        "timestamp": datetime.now().isoformat()
+    })
+
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({"error": "Endpoint not found"}), 404
@@ -488,5 +805,11 @@ def internal_error(error):
     return jsonify({"error": "Internal server error"}), 500
 
 if __name__ == '__main__':
-    logger.info("Starting Flask server on http://0.0.0.0:5050")
-    app.run(host='0.0.0.0', port=5050, debug=True)
\ No newline at end of file
+    port = int(os.getenv("PORT", 5050))
+    debug = os.getenv("FLASK_DEBUG", "1") == "1"
+    logger.info(f"Starting Flask server on http://0.0.0.0:{port}")
+    # Avec le reloader, seul le processus enfant lance la collecte
+    if collector.interval > 0 and (not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true"):
+        collector.start()
+        atexit.register(monitor.save_checkpoint, True)
+    app.run(host='0.0.0.0', port=port, debug=debug)
\ No newline at end of file
@@ -1,58 +1,348 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
+import json
+import logging
 import os
+import threading
+import time
+import urllib.request
+import uuid
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_openai import ChatOpenAI
-from langchain.chains import ConversationalRetrievalChain
-from langchain.memory import ConversationBufferMemory
+# Seuls des modules légers sont importés ici : modèle d'embeddings, index FAISS
+# et client LLM sont chargés à la demande (ou préchargés en arrière-plan)
+from chatbot.utils.memory import SessionMemoryStore
+from chatbot.utils.resources import LazyResource, warm_up_in_background
+from intents import parse_intent
+
+_import_started = time.perf_counter()
+logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+VECTORSTORE_DIR = "chatbot/vectorstore"
+# Grâce à la recherche hybride et au re-classement, moins de chunks suffisent dans le prompt
+RETRIEVER_K = int(os.getenv("RETRIEVER_K", 3))
+RETRIEVER_CANDIDATES = int(os.getenv("RETRIEVER_CANDIDATES", 20))
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# API du tableau de bord : questions sur l'état en direct des VMs et conteneurs
+MONITOR_API_URL = os.getenv("MONITOR_API_URL", "http://127.0.0.1:5050")
+MONITOR_API_TIMEOUT = float(os.getenv("MONITOR_API_TIMEOUT", 10))
+
 app = Flask(__name__)
 CORS(app)
 
-embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
 
-retriever = FAISS.load_local(
-    "chatbot/vectorstore",
-    embeddings=embedding_model,
-    allow_dangerous_deserialization=True
-).as_retriever()
+def load_embedding_model():
+    from chatbot.utils.embeddings import get_embeddings
+    return get_embeddings()
 
-llm = ChatOpenAI(
-    model=os.getenv("MODEL_NAME", "gpt-3.5-turbo"),
-    api_key=os.getenv("OPENROUTER_API_KEY"),
-    base_url=os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1"),
-)
 
-memory = ConversationBufferMemory(
-    memory_key="chat_history",
-    return_messages=True,
-    output_key="answer"  # 🔥 Ajout critique ici
-)
+def load_vectorstore():
+    from chatbot.utils.ann import load_vectorstore as load_index
+    # Relevée avant la lecture : une reconstruction pendant le chargement déclenchera un rechargement
+    _index_state["fingerprint"] = vectorstore_fingerprint()
+    # Index mappé en mémoire (lecture seule) : partagé entre workers, chargement quasi immédiat
+    return load_index(
+        VECTORSTORE_DIR,
+        embedding_model.get(),
+        mmap=os.getenv("VECTORSTORE_MMAP", "1") == "1",
+        ef_search=int(os.getenv("VECTORSTORE_EF_SEARCH", 64)),
+        nprobe=int(os.getenv("VECTORSTORE_NPROBE", 16)),
+    )
+
+
+def load_llm():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI(
+        model=os.getenv("MODEL_NAME", "gpt-3.5-turbo"),
+        api_key=os.getenv("OPENROUTER_API_KEY"),
+        base_url=os.getenv("OPENAI_BASE_URL", "https://openrouter.ai/api/v1"),
+    )
+
+
+def load_retriever():
+    from chatbot.utils.hybrid import BM25Index, CrossEncoderReranker, HybridRetriever
+    store = vectorstore.get()
+    # RERANK_MODEL vide : fusion BM25 + vecteurs sans re-classement
+    reranker = CrossEncoderReranker(RERANK_MODEL) if RERANK_MODEL else None
+    if reranker:
+        reranker.load()
+    return HybridRetriever(store, BM25Index.from_vectorstore(store), reranker, candidates=RETRIEVER_CANDIDATES)
+
+
+def vectorstore_fingerprint():
+    # Change dès que generate_vectorstore.py réécrit l'index
+    try:
+        stats = [os.stat(os.path.join(VECTORSTORE_DIR, name)) for name in ("index.faiss", "index.pkl")]
+        return tuple((st.st_mtime_ns, st.st_size) for st in stats)
+    except OSError:
+        return None
+
+
+def reload_if_rebuilt():
+    """Index réécrit par generate_vectorstore.py : vectorstore et retriever rechargés au prochain usage.
+
+    Le cache de réponses s'invalide de lui-même sur la même empreinte.
+    """
+    if not vectorstore.loaded or vectorstore_fingerprint() == _index_state["fingerprint"]:
+        return False
+    with _index_state["lock"]:
+        if not vectorstore.loaded or vectorstore_fingerprint() == _index_state["fingerprint"]:
+            return False
+        logger.info("Vectorstore reconstruit : rechargement de l'index et du retriever")
+        retriever.reset()
+        vectorstore.reset()
+        return True
+
+
+def load_answer_cache():
+    # Cache sémantique des réponses, devant la recherche et l'appel au LLM
+    from chatbot.utils.semantic_cache import SemanticCache
+    return SemanticCache(
+        dim=vectorstore.get().index.d,
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.92)),
+        ttl=int(os.getenv("ANSWER_CACHE_TTL", 86400)),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 2000)),
+        fingerprint=vectorstore_fingerprint,
+    )
+
+
+_index_state = {"fingerprint": None, "lock": threading.Lock()}
+embedding_model = LazyResource("embeddings", load_embedding_model)
+vectorstore = LazyResource("vectorstore", load_vectorstore)
+retriever = LazyResource("retriever", load_retriever)
+llm = LazyResource("llm", load_llm)
+answer_cache = LazyResource("answer_cache", load_answer_cache)
+RESOURCES = (embedding_model, vectorstore, retriever, llm, answer_cache)
 
-qa_chain = ConversationalRetrievalChain.from_llm(
-    llm=llm,
-    retriever=retriever,
-    memory=memory,
-    return_source_documents=True,
-    output_key="answer"  # 🔥 Ajout critique ici aussi
+
+def summarize_turns(previous_summary, turns):
+    # Condense les échanges sortis de la fenêtre dans le résumé de la session
+    transcript = "\n".join(f"Utilisateur : {q}\nAssistant : {a}" for q, a in turns)
+    prompt = (
+        "Résume en quelques phrases la conversation suivante en conservant les faits techniques utiles "
+        "(noms de serveurs, commandes, versions).\n\n"
+        f"Résumé précédent : {previous_summary or 'aucun'}\n\n{transcript}\n\nRésumé :"
+    )
+    return llm.get().invoke(prompt).content.strip()
+
+
+# Mémoire par session (fenêtre glissante + résumé), bornée en taille
+memory_store = SessionMemoryStore(
+    summarizer=summarize_turns,
+    window_turns=int(os.getenv("CHAT_WINDOW_TURNS", 4)),
+    max_tokens=int(os.getenv("CHAT_MAX_TOKENS", 1500)),
+    idle_ttl=int(os.getenv("CHAT_SESSION_TTL", 1800)),
+    max_sessions=int(os.getenv("CHAT_MAX_SESSIONS", 1000)),
 )
 
+
+def get_session_id(data):
+    return data.get("session_id") or request.headers.get("X-Session-Id") or uuid.uuid4().hex
+
+
+def build_chat_history(session_id):
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    summary, turns = memory_store.get_history(session_id)
+    history = [SystemMessage(content=f"Résumé de la conversation : {summary}")] if summary else []
+    for question, answer in turns:
+        history += [HumanMessage(content=question), AIMessage(content=answer)]
+    return history
+
+
+def condense_question(question, history):
+    # Même reformulation que ConversationalRetrievalChain quand il y a un historique
+    if not history:
+        return question
+    from langchain.chains.conversational_retrieval.prompts import CONDENSE_QUESTION_PROMPT
+    from langchain_core.messages import get_buffer_string
+    prompt = CONDENSE_QUESTION_PROMPT.format(chat_history=get_buffer_string(history), question=question)
+    return llm.get().invoke(prompt).content.strip()
+
+
+def resolve_question(question, session_id):
+    """(question autonome, embedding, réponse en cache ou None).
+
+    Sans historique, la question est cherchée telle quelle (aucun appel LLM). Avec un
+    historique, seule la question reformulée est cherchée : « comment le redémarrer ? »
+    dépend du sujet de la conversation.
+    """
+    reload_if_rebuilt()
+    history = build_chat_history(session_id)
+    standalone = condense_question(question, history) if history else question
+    embedding = embedding_model.get().embed_query(standalone)
+    return standalone, embedding, answer_cache.get().lookup(embedding)
+
+
+def retrieve(question, embedding):
+    # L'embedding de la question, déjà calculé pour le cache, est réutilisé
+    return retriever.get().search(question, embedding, k=RETRIEVER_K)
+
+
+def build_prompt(question, docs):
+    from langchain.chains.conversational_retrieval.prompts import QA_PROMPT
+    return QA_PROMPT.format(context="\n\n".join(d.page_content for d in docs), question=question)
+
+
+def answer_live_question(question):
+    """Réponse directe depuis les données de supervision si la question est reconnue, sinon None"""
+    if parse_intent(question) is None:
+        return None
+    req = urllib.request.Request(
+        MONITOR_API_URL.rstrip("/") + "/api/chatbot/command",
+        data=json.dumps({"message": question}).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(req, timeout=MONITOR_API_TIMEOUT) as resp:
+            result = json.loads(resp.read().decode("utf-8"))
+    except Exception as e:
+        # Tableau de bord injoignable : on se rabat sur la documentation
+        logger.warning(f"API de supervision indisponible ({req.full_url}): {e} ; réponse via la documentation")
+        return None
+    if not result.get("answer"):
+        logger.warning(f"Question reconnue mais sans réponse de l'API de supervision: {result.get('status')}")
+        return None
+    return result
+
+
+def format_sources(docs):
+    return [
+        {"source": doc.metadata.get("source"), "page": doc.metadata.get("page"), "snippet": doc.page_content[:200]}
+        for doc in docs
+    ]
+
+
 @app.route("/ask", methods=["POST"])
 def ask():
-    data = request.get_json()
+    data = request.get_json() or {}
     question = data.get("question", "")
+    session_id = get_session_id(data)
 
     try:
-        result = qa_chain.invoke({"question": question})
-        return jsonify({"response": result["answer"]})
+        live = answer_live_question(question)
+        if live:
+            memory_store.add_turn(session_id, question, live["answer"])
+            return jsonify({"response": live["answer"], "sources": [], "intent": live["intent"],
+                            "cached": False, "session_id": session_id})
+
+        standalone, embedding, cached = resolve_question(question, session_id)
+        if cached:
+            answer, sources = cached["answer"], cached["sources"]
+        else:
+            docs = retrieve(standalone, embedding)
+            answer = llm.get().invoke(build_prompt(standalone, docs)).content
+            sources = format_sources(docs)
+            answer_cache.get().put(embedding, standalone, answer, sources)
+
+        memory_store.add_turn(session_id, question, answer)
+        return jsonify({"response": answer, "sources": sources, "cached": bool(cached), "session_id": session_id})
     except Exception as e:
         print(f"❌ Erreur pendant le traitement de la question : {e}")
         return jsonify({"error": str(e)}), 500
 
+
+def sse(event, payload):
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+@app.route("/ask/stream", methods=["POST"])
+def ask_stream():
+    """Réponse en Server-Sent Events : sources d'abord, puis les tokens au fil de la génération"""
+    data = request.get_json() or {}
+    question = data.get("question", "")
+    session_id = get_session_id(data)
+
+    def generate():
+        try:
+            yield sse("session", {"session_id": session_id})
+            live = answer_live_question(question)
+            if live:
+                yield sse("sources", {"sources": [], "intent": live["intent"]})
+                yield sse("token", {"token": live["answer"]})
+                memory_store.add_turn(session_id, question, live["answer"])
+                yield sse("done", {"response": live["answer"], "intent": live["intent"], "session_id": session_id})
+                return
+
+            standalone, embedding, cached = resolve_question(question, session_id)
+            if cached:
+                yield sse("sources", {"sources": cached["sources"], "cached": True})
+                yield sse("token", {"token": cached["answer"]})
+                memory_store.add_turn(session_id, question, cached["answer"])
+                yield sse("done", {"response": cached["answer"], "cached": True, "session_id": session_id})
+                return
+
+            docs = retrieve(standalone, embedding)
+            sources = format_sources(docs)
+            yield sse("sources", {"sources": sources})
+
+            answer = []
+            for chunk in llm.get().stream(build_prompt(standalone, docs)):
+                if chunk.content:
+                    answer.append(chunk.content)
+                    yield sse("token", {"token": chunk.content})
+
+            full_answer = "".join(answer)
+            answer_cache.get().put(embedding, standalone, full_answer, sources)
+            memory_store.add_turn(session_id, question, full_answer)
+            yield sse("done", {"response": full_answer, "session_id": session_id})
+        except Exception as e:
+            print(f"❌ Erreur pendant le streaming de la réponse : {e}")
+            yield sse("error", {"error": str(e)})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.route("/session/<session_id>", methods=["DELETE"])
+def clear_session(session_id):
+    memory_store.clear(session_id)
+    return jsonify({"session_id": session_id, "status": "cleared"})
+
+
+@app.route("/memory/stats", methods=["GET"])
+def memory_stats():
+    return jsonify(memory_store.stats())
+
+
+@app.route("/cache/stats", methods=["GET"])
+def cache_stats():
+    if not answer_cache.loaded:
+        return jsonify({"status": "not_loaded"})
+    return jsonify({**answer_cache.get().stats(), "embeddings": embedding_model.get().stats()})
+
+
+@app.route("/cache/invalidate", methods=["POST"])
+def cache_invalidate():
+    if answer_cache.loaded:
+        answer_cache.get().invalidate()
+    return jsonify({"status": "invalidated"})
+
+
+@app.route("/healthz", methods=["GET"])
+def liveness():
+    # Le processus répond : ne dépend d'aucun chargement
+    return jsonify({"status": "alive"})
+
+
+@app.route("/readyz", methods=["GET"])
+def readiness():
+    # Prêt quand modèle, index et client LLM sont chargés
+    resources = {r.name: r.status() for r in RESOURCES}
+    ready = all(r.loaded for r in RESOURCES)
+    return jsonify({"status": "ready" if ready else "loading", "resources": resources,
+                    "import_seconds": IMPORT_SECONDS}), 200 if ready else 503
+
+
+IMPORT_SECONDS = round(time.perf_counter() - _import_started, 3)
+
+# Préchargement en arrière-plan (désactivable, ex. pour mesurer le démarrage)
+if os.getenv("CHATBOT_WARMUP", "1") == "1":
+    warm_up_in_background(RESOURCES)
+
 if __name__ == "__main__":
     app.run(debug=True)
@@ -0,0 +1,105 @@
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+import faiss
+import numpy as np
+import psutil
+
+from chatbot.utils.ann import INDEX_TYPES, build_index, set_search_params
+
+
+def synthetic_vectors(n, dim, seed, clusters=1000, block=100_000):
+    """Corpus synthétique regroupé en thèmes (plus réaliste qu'un bruit uniforme), généré par blocs"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    for start in range(0, n, block):
+        size = min(block, n - start)
+        yield centers[rng.integers(0, clusters, size)] + 0.5 * rng.standard_normal((size, dim)).astype(np.float32)
+
+
+def rss_mb():
+    return psutil.Process().memory_info().rss / 1e6
+
+
+def bench(index_type, args, corpus, queries, truth):
+    rss_before = rss_mb()
+    started = time.perf_counter()
+    train = corpus[np.random.default_rng(args.seed).choice(len(corpus), min(len(corpus), args.train_size), replace=False)]
+    index = build_index(index_type, train)
+    del train
+    for start in range(0, len(corpus), 100_000):
+        index.add(corpus[start:start + 100_000])
+    build_s = time.perf_counter() - started
+    ram_mb = rss_mb() - rss_before
+    set_search_params(index, ef_search=args.ef_search, nprobe=args.nprobe)
+
+    # Latence requête par requête (cas du chatbot), puis débit en lot
+    latencies = []
+    for query in queries[:args.latency_queries]:
+        t = time.perf_counter()
+        index.search(query[None, :], args.k)
+        latencies.append((time.perf_counter() - t) * 1000)
+    t = time.perf_counter()
+    _, found = index.search(queries, args.k)
+    qps = len(queries) / (time.perf_counter() - t)
+    recall = np.mean([len(set(f) & set(g)) / args.k for f, g in zip(found, truth)])
+
+    # Taille sur disque et temps de chargement, classique puis mmap
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "index.faiss")
+        faiss.write_index(index, path)
+        size_mb = os.path.getsize(path) / 1e6
+        del index
+        t = time.perf_counter()
+        loaded = faiss.read_index(path)
+        load_ms = (time.perf_counter() - t) * 1000
+        del loaded
+        t = time.perf_counter()
+        loaded = faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+        mmap_ms = (time.perf_counter() - t) * 1000
+        del loaded
+
+    latencies.sort()
+    print(f"{index_type:<6} recall@{args.k} {recall:.3f}  p50 {statistics.median(latencies):.2f} ms  "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.2f} ms  {qps:,.0f} req/s  "
+          f"RAM +{ram_mb:,.0f} Mo  disque {size_mb:,.0f} Mo  build {build_s:.1f}s  "
+          f"chargement {load_ms:.0f} ms / mmap {mmap_ms:.0f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rappel, latence et mémoire des types d'index ANN")
+    parser.add_argument("--n", type=int, default=1_000_000, help="Nombre de chunks synthétiques")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension (384 = all-MiniLM-L6-v2)")
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--latency-queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--types", nargs="+", choices=INDEX_TYPES, default=list(INDEX_TYPES))
+    parser.add_argument("--train-size", type=int, default=200_000)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"📊 Corpus synthétique : {args.n:,} vecteurs de dimension {args.dim}, {args.queries} requêtes, k={args.k}")
+    corpus = np.empty((args.n, args.dim), dtype=np.float32)
+    offset = 0
+    for block in synthetic_vectors(args.n, args.dim, args.seed):
+        corpus[offset:offset + len(block)] = block
+        offset += len(block)
+    queries = next(synthetic_vectors(args.queries, args.dim, args.seed + 1))
+
+    # Vérité terrain : recherche exacte
+    exact = faiss.IndexFlatL2(args.dim)
+    exact.add(corpus)
+    _, truth = exact.search(queries, args.k)
+    del exact
+
+    for index_type in args.types:
+        bench(index_type, args, corpus, queries, truth)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import json
+import os
+import random
+import re
+import statistics
+import time
+
+from langchain_community.vectorstores import FAISS
+
+from chatbot.utils.embeddings import get_embeddings
+from chatbot.utils.hybrid import BM25Index, CrossEncoderReranker, HybridRetriever
+
+store_dir = "chatbot/vectorstore"
+# Questions reformulées par section de runbook (aucune ne recopie le texte attendu)
+DEFAULT_QUERIES = os.path.join(os.path.dirname(__file__), "retrieval_queries.jsonl")
+
+# Lignes de commande et clés YAML : les requêtes « identifiant exact » que la recherche vectorielle rate
+QUERY_LINE_RE = re.compile(r"(?m)^\s*((?:sudo|kubectl|docker|curl|scp|apiVersion:|kind:)\s.{8,120})$")
+
+
+def build_queries(docs, limit, seed):
+    """Requêtes synthétiques : une ligne technique prise dans un chunk ; pertinent = chunk qui la contient.
+
+    La requête recopie le texte cherché : le score mesure le recouvrement lexical
+    (borne haute, favorable à BM25), pas la qualité sur de vraies questions.
+    """
+    candidates = []
+    for doc in docs:
+        for line in QUERY_LINE_RE.findall(doc.page_content):
+            candidates.append(line.strip())
+    candidates = sorted(set(candidates))
+    random.Random(seed).shuffle(candidates)
+    return [{"question": line, "expected": line} for line in candidates[:limit]]
+
+
+def load_queries(path):
+    # JSONL : {"question": ..., "expected": texte qui doit figurer dans un chunk retourné, "source": PDF (optionnel)}
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(name, search, queries, k):
+    ranks, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        docs = search(query)
+        latencies.append((time.perf_counter() - started) * 1000)
+        rank = next((i + 1 for i, doc in enumerate(docs[:k]) if query["expected"] in doc.page_content
+                     and query.get("source", doc.metadata.get("source")) == doc.metadata.get("source")), None)
+        ranks.append(rank)
+
+    latencies.sort()
+    found = [r for r in ranks if r]
+    print(f"{name:<16} recall@1 {sum(r == 1 for r in found) / len(queries):.3f}  "
+          f"recall@{k} {len(found) / len(queries):.3f}  "
+          f"MRR {sum(1 / r for r in found) / len(queries):.3f}  "
+          f"p50 {statistics.median(latencies):.1f} ms  "
+          f"p95 {latencies[int(0.95 * (len(latencies) - 1))]:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Qualité et latence de la recherche sur les PDF indexés")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--queries", default=DEFAULT_QUERIES, help="Fichier JSONL de requêtes annotées")
+    parser.add_argument("--synthetic", action="store_true",
+                        help="Lignes techniques recopiées des chunks : borne haute du recouvrement lexical")
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rerank-model", default="cross-encoder/ms-marco-MiniLM-L-6-v2")
+    args = parser.parse_args()
+
+    embeddings = get_embeddings()
+    vectorstore = FAISS.load_local(store_dir, embeddings=embeddings, allow_dangerous_deserialization=True)
+    bm25 = BM25Index.from_vectorstore(vectorstore)
+    queries = build_queries(bm25.docs, args.limit, args.seed) if args.synthetic else load_queries(args.queries)
+    if not queries:
+        print("❌ Aucune requête à évaluer.")
+        return
+    kind = "synthétiques (borne haute lexicale)" if args.synthetic else "annotées"
+    print(f"📊 {len(queries)} requêtes {kind}, {bm25.info()['documents']} chunks, k={args.k}")
+
+    # Embeddings des requêtes calculés une fois (et mis en cache), hors mesure de latence
+    vectors = {q["question"]: embeddings.embed_query(q["question"]) for q in queries}
+    reranker = CrossEncoderReranker(args.rerank_model) if args.rerank_model else None
+    retriever = HybridRetriever(vectorstore, bm25, reranker)
+
+    evaluate("vecteurs", lambda q: retriever.vector_search(vectors[q["question"]], args.k), queries, args.k)
+    evaluate("bm25", lambda q: retriever.keyword_search(q["question"], args.k), queries, args.k)
+    evaluate("hybride (rrf)", lambda q: retriever.search(q["question"], vectors[q["question"]], args.k, rerank=False),
+             queries, args.k)
+    if reranker and reranker.load() is not None:
+        evaluate("hybride + rerank", lambda q: retriever.search(q["question"], vectors[q["question"]], args.k),
+                 queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Mesure le temps d'import de chatbot.app_chatbot dans des processus neufs (démarrage à froid)
+IMPORT_SNIPPET = "import chatbot.app_chatbot"
+READY_SNIPPET = (
+    "import time\n"
+    "import chatbot.app_chatbot as chatbot_app\n"
+    "started = time.perf_counter()\n"
+    "for resource in chatbot_app.RESOURCES:\n"
+    "    resource.get()\n"
+    "print(round((time.perf_counter() - started) * 1000, 1))\n"
+)
+
+
+def run_once(snippet):
+    env = {**os.environ, "CHATBOT_WARMUP": "0"}
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", snippet], env=env, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1] if result.stderr else "échec de l'import")
+    return elapsed_ms, result.stdout.strip()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du démarrage du chatbot")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=500, help="Budget pour l'import du module (médiane)")
+    parser.add_argument("--ready", action="store_true", help="Mesure aussi le chargement du modèle, de l'index et du LLM")
+    args = parser.parse_args()
+
+    # Interpréteur seul : base de comparaison, à retirer du temps d'import
+    baseline = statistics.median(run_once("pass")[0] for _ in range(args.runs))
+    imports = [run_once(IMPORT_SNIPPET)[0] - baseline for _ in range(args.runs)]
+    import_ms = statistics.median(imports)
+    print(f"⏱️ Import de chatbot.app_chatbot : médiane {import_ms:.0f} ms "
+          f"(min {min(imports):.0f}, max {max(imports):.0f}, {args.runs} essais)")
+
+    if args.ready:
+        loads = [float(run_once(READY_SNIPPET)[1]) for _ in range(args.runs)]
+        print(f"⏱️ Chargement des ressources : médiane {statistics.median(loads):.0f} ms")
+
+    if import_ms > args.budget_ms:
+        print(f"❌ Budget dépassé : {import_ms:.0f} ms > {args.budget_ms:.0f} ms")
+        sys.exit(1)
+    print(f"✅ Import dans le budget ({args.budget_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,50 @@
 import os
 import json
-from chatbot.utils.extract import extract_text_from_pdf
+import sys
+import time
+from chatbot.utils.extract import extract_pdfs_to_jsonl
+from chatbot.utils.hashing import sha256_file
 
 DATA_DIR = "chatbot/data"
 OUTPUT_DIR = "chatbot/extracted"
 
-os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-for filename in os.listdir(DATA_DIR):
-    if filename.endswith(".pdf"):
-        pdf_path = os.path.join(DATA_DIR, filename)
-        text = extract_text_from_pdf(pdf_path)
+def extracted_hash(output_path):
+    # Chaque ligne du JSONL porte le sha256 du PDF source : la première suffit
+    if not os.path.exists(output_path):
+        return None
+    with open(output_path, encoding="utf-8") as f:
+        first_line = f.readline()
+    return json.loads(first_line).get("sha256") if first_line.strip() else None
+
 
-        json_data = {
-            "filename": filename,
-            "content": text   # ✅ clé corrigée ici
-        }
+if __name__ == "__main__":
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    workers = int(sys.argv[sys.argv.index("--workers") + 1]) if "--workers" in sys.argv else None
 
-        output_path = os.path.join(OUTPUT_DIR, filename.replace(".pdf", ".json"))
-        with open(output_path, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
+    pdf_files = {f for f in os.listdir(DATA_DIR) if f.endswith(".pdf")}
+    jobs = []
+    for filename in sorted(pdf_files):
+        pdf_path = os.path.join(DATA_DIR, filename)
+        pdf_hash = sha256_file(pdf_path)
+        # PDF inchangé depuis la dernière extraction : rien à faire
+        if extracted_hash(os.path.join(OUTPUT_DIR, filename[:-4] + ".jsonl")) != pdf_hash:
+            jobs.append((pdf_path, pdf_hash))
 
+    started = time.perf_counter()
+    for filename in extract_pdfs_to_jsonl(jobs, OUTPUT_DIR, workers=workers):
+        # L'ancien format (un JSON par document) est remplacé par le JSONL par page
+        legacy_path = os.path.join(OUTPUT_DIR, filename[:-4] + ".json")
+        if os.path.exists(legacy_path):
+            os.remove(legacy_path)
         print(f"✅ {filename} extrait avec succès.")
+    if jobs:
+        print(f"⏱️ {len(jobs)} PDF extraits en {time.perf_counter() - started:.1f}s.")
+
+    # Supprime les extractions dont le PDF a disparu
+    for filename in os.listdir(OUTPUT_DIR):
+        if not filename.endswith((".json", ".jsonl")):
+            continue
+        if filename[:filename.rindex(".")] + ".pdf" not in pdf_files:
+            os.remove(os.path.join(OUTPUT_DIR, filename))
+            print(f"🗑️ {filename} supprimé (PDF source absent).")
@@ -1,22 +1,30 @@
+import argparse
 import os
-import json
-from chatbot.utils.embeddings import chunk_text, create_vectorstore
+import time
+from chatbot.utils.ann import INDEX_TYPES
+from chatbot.utils.embeddings import MODEL_NAME, get_embeddings
+from chatbot.utils.indexing import MANIFEST_NAME, update_vectorstore
 
-chunks = []
 input_dir = "chatbot/extracted"
+store_dir = "chatbot/vectorstore"
 
-for file in os.listdir(input_dir):
-    if file.endswith(".json"):
-        filepath = os.path.join(input_dir, file)
-        with open(filepath, encoding="utf-8") as f:
-            data = json.load(f)
-            if "content" in data:
-                chunks += chunk_text(data["content"])
-            else:
-                print(f"⚠️ Le fichier {file} ne contient pas la clé 'content'.")
+parser = argparse.ArgumentParser(description="Indexation des documents extraits")
+# --full : ignore le manifeste et réindexe tout
+parser.add_argument("--full", action="store_true")
+# Changer de type d'index déclenche une reconstruction complète
+parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.getenv("VECTORSTORE_INDEX", "flat"))
+args = parser.parse_args()
 
-if chunks:
-    create_vectorstore(chunks)
-    print("✅ Vectorstore généré avec succès.")
+manifest_path = os.path.join(store_dir, MANIFEST_NAME)
+if args.full and os.path.exists(manifest_path):
+    os.remove(manifest_path)
+
+started = time.perf_counter()
+result = update_vectorstore(input_dir, store_dir, get_embeddings(), MODEL_NAME, index_type=args.index_type)
+elapsed = time.perf_counter() - started
+
+if result["files"]:
+    print(f"✅ Vectorstore ({args.index_type}) à jour en {elapsed:.1f}s : {result['added']} chunks ajoutés, "
+          f"{result['deleted']} supprimés ({result['files']} fichiers).")
 else:
     print("❌ Aucun chunk à indexer. Vérifiez les fichiers extraits.")
@@ -0,0 +1,73 @@
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+
+# flat : recherche exacte ; les autres types sont approchés et passent mieux à l'échelle
+INDEX_TYPES = ("flat", "hnsw", "ivfpq", "sq8", "sq16")
+# Types dont on ne peut pas retirer de vecteurs : une suppression impose une reconstruction
+NO_REMOVE_TYPES = ("hnsw",)
+# En dessous de 2^4 centroïdes par sous-quantifieur, le PQ dégrade le rappel sans rien gagner
+IVFPQ_MIN_NBITS = 4
+
+
+def factory_string(index_type, dim, n_vectors, hnsw_m=32, pq_m=None, nlist=None):
+    if index_type == "flat":
+        return "Flat"
+    if index_type == "hnsw":
+        return f"HNSW{hnsw_m}"
+    if index_type == "sq8":
+        return "SQ8"
+    if index_type == "sq16":
+        return "SQfp16"
+    if index_type == "ivfpq":
+        # ~4·√n listes (au moins 39 vecteurs d'entraînement par liste), sous-vecteurs de 4 dimensions
+        # FAISS demande ~39·2^nbits points d'entraînement : 8 bits (256 centroïdes) dès 9 984 vecteurs
+        nbits = min(8, int(np.log2(max(n_vectors // 39, 1))))
+        if nbits < IVFPQ_MIN_NBITS:
+            # Corpus trop petit pour entraîner un quantifieur utile : recherche exacte
+            return "Flat"
+        nlist = nlist or max(1, min(65536, int(4 * np.sqrt(n_vectors)), n_vectors // 39))
+        pq_m = pq_m or next(m for m in (dim // 4, dim // 2, dim) if m and dim % m == 0)
+        return f"IVF{nlist},PQ{pq_m}x{nbits}"
+    raise ValueError(f"Type d'index inconnu : {index_type} (attendu : {', '.join(INDEX_TYPES)})")
+
+
+def build_index(index_type, vectors, **params):
+    """Crée (et entraîne si besoin) un index FAISS vide pour ces vecteurs"""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(vectors.shape[1], factory_string(index_type, vectors.shape[1], len(vectors), **params))
+    if index_type == "hnsw":
+        index.hnsw.efConstruction = 80
+    if not index.is_trained:
+        index.train(vectors)
+    return index
+
+
+def set_search_params(index, ef_search=64, nprobe=16):
+    # Compromis rappel / latence à la recherche, sans effet sur un index exact
+    params = faiss.ParameterSpace()
+    if hasattr(index, "hnsw"):
+        params.set_index_parameter(index, "efSearch", ef_search)
+    elif hasattr(index, "nprobe") or faiss.try_extract_index_ivf(index) is not None:
+        params.set_index_parameter(index, "nprobe", nprobe)
+
+
+def create_vectorstore(texts, embeddings, metadatas, ids, index_type="flat"):
+    """Équivalent de FAISS.from_texts avec le type d'index choisi"""
+    if index_type == "flat":
+        return FAISS.from_texts(texts, embeddings, metadatas=metadatas, ids=ids)
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    index = build_index(index_type, vectors)
+    vectorstore = FAISS(embeddings, index, InMemoryDocstore(), {})
+    vectorstore.add_embeddings(zip(texts, vectors.tolist()), metadatas=metadatas, ids=ids)
+    return vectorstore
+
+
+def load_vectorstore(store_dir, embeddings, mmap=False, **search_params):
+    """Charge l'index ; en mmap (lecture seule) les vecteurs restent sur disque et sont partagés entre processus"""
+    io_flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    vectorstore = FAISS.load_local(store_dir, embeddings=embeddings, allow_dangerous_deserialization=True,
+                                   io_flags=io_flags)
+    set_search_params(vectorstore.index, **search_params)
+    return vectorstore
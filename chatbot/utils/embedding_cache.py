@@ -0,0 +1,218 @@
+import fcntl
+import json
+import os
+from collections import OrderedDict
+from contextlib import contextmanager
+from threading import Lock
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from chatbot.utils.hashing import sha256_text
+
+CACHE_DIR = "chatbot/embedding_cache"
+
+
+def normalize_text(text):
+    return " ".join(text.split())
+
+
+class CachedEmbeddings(Embeddings):
+    """Enveloppe un modèle d'embeddings avec un cache disque persistant.
+
+    Les vecteurs sont stockés dans une matrice float32 mappée en mémoire
+    (vectors.f32) et keys.txt donne, ligne par ligne, la clé de chaque rangée.
+    La clé combine le type (document / requête) et le hash du texte normalisé ;
+    chaque modèle a son propre répertoire, donc changer de modèle invalide le cache.
+
+    Plusieurs processus (workers du chatbot, generate_vectorstore.py) partagent
+    ces fichiers : les écritures se font sous verrou fcntl, après avoir rattrapé
+    les rangées ajoutées par les autres. Seuls les documents sont persistés ; les
+    requêtes restent en mémoire, dans un LRU de `max_queries` entrées.
+    """
+
+    def __init__(self, base, model_name, cache_dir=CACHE_DIR, batch_size=64, initial_rows=1024,
+                 max_queries=10000):
+        self.base = base
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.initial_rows = initial_rows
+        self.dir = os.path.join(cache_dir, sha256_text(model_name)[:16])
+        self._lock = Lock()
+        self._vectors = None
+        self._index = {}
+        self._rows = 0
+        self._keys_offset = 0       # octets de keys.txt déjà lus
+        self._queries = OrderedDict()
+        self.max_queries = max_queries
+        self.dim = None
+        self.hits = 0
+        self.misses = 0
+        with self._file_lock():
+            self._load()
+
+    # --- stockage -------------------------------------------------------
+
+    def _paths(self):
+        return (os.path.join(self.dir, "meta.json"),
+                os.path.join(self.dir, "vectors.f32"),
+                os.path.join(self.dir, "keys.txt"))
+
+    @contextmanager
+    def _file_lock(self):
+        """Verrou inter-processus sur les fichiers du cache"""
+        os.makedirs(self.dir, exist_ok=True)
+        with open(os.path.join(self.dir, "lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        meta_path, _, _ = self._paths()
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model") != self.model_name:
+            return False
+        self.dim = meta["dim"]
+        self._sync()
+        return True
+
+    def _sync(self):
+        """Rattrape les rangées écrites par d'autres processus : keys.txt fait foi"""
+        _, vectors_path, keys_path = self._paths()
+        with open(keys_path, "rb") as f:
+            f.seek(self._keys_offset)
+            data = f.read()
+        # Une clé n'est écrite qu'après son vecteur : on ignore une éventuelle fin incomplète
+        complete = data[:data.rfind(b"\n") + 1]
+        self._keys_offset += len(complete)
+        capacity = os.path.getsize(vectors_path) // (4 * self.dim)
+        if self._vectors is None or self._vectors.shape[0] != capacity:
+            self._map(capacity)
+        for key in complete.decode("utf-8").splitlines():
+            if self._rows >= capacity:
+                break
+            self._index[key] = self._rows
+            self._rows += 1
+
+    def _init_storage(self, dim):
+        # Un autre processus a pu créer le cache depuis notre chargement : on ne l'écrase pas
+        if self._load():
+            return
+        meta_path, _, keys_path = self._paths()
+        self.dim = dim
+        with open(meta_path, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": dim}, f)
+        open(keys_path, "w").close()
+        self._rows = 0
+        self._keys_offset = 0
+        self._index = {}
+        self._resize(self.initial_rows)
+
+    def _map(self, capacity):
+        _, vectors_path, _ = self._paths()
+        if self._vectors is not None:
+            self._vectors.flush()
+            del self._vectors
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+
+    def _resize(self, capacity):
+        _, vectors_path, _ = self._paths()
+        if self._vectors is not None:
+            self._vectors.flush()
+        with open(vectors_path, "ab") as f:
+            f.truncate(capacity * self.dim * 4)
+        self._map(capacity)
+
+    def _append(self, keys, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._file_lock():
+            if self._vectors is None:
+                self._init_storage(vectors.shape[1])
+            else:
+                self._sync()
+            # Rangées déjà écrites par un autre processus pendant l'encodage
+            new = [i for i, key in enumerate(keys) if key not in self._index]
+            if not new:
+                return
+            keys, vectors = [keys[i] for i in new], vectors[new]
+            needed = self._rows + len(keys)
+            if needed > self._vectors.shape[0]:
+                self._resize(max(needed, 2 * self._vectors.shape[0]))
+            self._vectors[self._rows:needed] = vectors
+            self._vectors.flush()
+            _, _, keys_path = self._paths()
+            data = "".join(f"{key}\n" for key in keys).encode("utf-8")
+            with open(keys_path, "ab") as f:
+                f.write(data)
+            self._keys_offset += len(data)
+            for offset, key in enumerate(keys):
+                self._index[key] = self._rows + offset
+            self._rows = needed
+
+    def _refresh(self):
+        with self._file_lock():
+            if self._vectors is None:
+                self._load()
+            else:
+                self._sync()
+
+    def _remember_queries(self, keys, vectors):
+        for key, vector in zip(keys, vectors):
+            self._queries[key] = np.asarray(vector, dtype=np.float32)
+        while len(self._queries) > self.max_queries:
+            self._queries.popitem(last=False)
+
+    # --- interface Embeddings -------------------------------------------
+
+    def _embed(self, texts, kind, encode):
+        keys = [f"{kind}:{sha256_text(normalize_text(t))}" for t in texts]
+        with self._lock:
+            if kind == "d" and any(key not in self._index for key in keys):
+                # Documents peut-être déjà encodés par un autre processus
+                self._refresh()
+            known = self._queries if kind == "q" else self._index
+            missing = {}
+            for key, text in zip(keys, texts):
+                if key not in known and key not in missing:
+                    missing[key] = text
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+            # Encodage par lots des textes absents du cache
+            missing_keys = list(missing)
+            for start in range(0, len(missing_keys), self.batch_size):
+                batch = missing_keys[start:start + self.batch_size]
+                vectors = encode([missing[k] for k in batch])
+                if kind == "q":
+                    self._remember_queries(batch, vectors)
+                else:
+                    self._append(batch, vectors)
+
+            if kind == "q":
+                for key in keys:
+                    self._queries.move_to_end(key)
+                return [self._queries[key].tolist() for key in keys]
+            return [self._vectors[self._index[key]].tolist() for key in keys]
+
+    def embed_documents(self, texts):
+        return self._embed(texts, "d", self.base.embed_documents)
+
+    def embed_query(self, text):
+        return self._embed([text], "q", lambda batch: [self.base.embed_query(batch[0])])[0]
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "model": self.model_name,
+                "rows": self._rows,
+                "queries": len(self._queries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            }
@@ -2,10 +2,18 @@ from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.vectorstores import FAISS
 
+from chatbot.utils.embedding_cache import CachedEmbeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+
 def chunk_text(text):
     return RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=100).split_text(text)
 
+def get_embeddings(model_name=MODEL_NAME):
+    # Index et requêtes passent par le cache disque des embeddings
+    return CachedEmbeddings(HuggingFaceEmbeddings(model_name=model_name), model_name)
+
 def create_vectorstore(chunks):
-    embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    embeddings = get_embeddings()
     vectorstore = FAISS.from_texts(chunks, embeddings)
     vectorstore.save_local("chatbot/vectorstore")
@@ -1,20 +1,112 @@
 import fitz  # pymupdf
+import json
+import os
 import re
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Regex compilées une seule fois (et non à chaque page)
+YAML_BLOCK_RE = re.compile(r"(apiVersion:[\s\S]+?)(?=\n\n|\Z)")
+SHELL_COMMAND_RE = re.compile(r"(?m)^(sudo .*|kubectl .*|docker .*|curl .*|scp .*)")
+
+
+def format_page(text):
+    # Format YAML blocks
+    if "apiVersion:" in text or "kind:" in text:
+        text = YAML_BLOCK_RE.sub(r"```yaml\n\1\n```", text)
+
+    # Format shell commands
+    return SHELL_COMMAND_RE.sub(r"```bash\n\1\n```", text)
+
 
 def extract_text_from_pdf(pdf_path):
-    doc = fitz.open(pdf_path)
-    full_text = ""
+    with fitz.open(pdf_path) as doc:
+        return "".join(format_page(page.get_text()) + "\n" for page in doc)
+
+
+def extract_page_range(pdf_path, start, end):
+    # Exécuté dans un processus worker : chaque tâche ouvre son propre document
+    with fitz.open(pdf_path) as doc:
+        return [(number + 1, format_page(doc[number].get_text())) for number in range(start, end)]
+
+
+def extract_pdfs_to_jsonl(jobs, output_dir, workers=None, pages_per_task=8):
+    """Extrait les PDF en parallèle (fichiers et tranches de pages) vers un JSONL par PDF.
+
+    `jobs` : liste de (chemin du PDF, sha256). Chaque ligne du JSONL contient une page
+    avec son numéro ; les tranches sont écrites dans l'ordre dès qu'elles sont prêtes,
+    et le nombre de tranches en vol est borné pour limiter la mémoire. Le JSONL d'un PDF
+    n'est ouvert qu'à l'écriture de sa première tranche : seuls les PDF en cours
+    d'extraction occupent un descripteur.
+    """
+    tasks = []
+    files = {}
+    for pdf_path, pdf_hash in jobs:
+        filename = os.path.basename(pdf_path)
+        with fitz.open(pdf_path) as doc:
+            page_count = doc.page_count
+        ranges = [(start, min(start + pages_per_task, page_count)) for start in range(0, page_count, pages_per_task)]
+        output_path = os.path.join(output_dir, filename[:-4] + ".jsonl")
+        files[pdf_path] = {
+            "filename": filename,
+            "sha256": pdf_hash,
+            "output_path": output_path,
+            "handle": None,
+            "pending": {},
+            "next": 0,
+            "total": len(ranges),
+        }
+        tasks += [(pdf_path, index, start, end) for index, (start, end) in enumerate(ranges)]
+
+    def output(state):
+        if state["handle"] is None:
+            state["handle"] = open(state["output_path"] + ".tmp", "w", encoding="utf-8")
+        return state["handle"]
 
-    for page in doc:
-        text = page.get_text()
+    def flush(state):
+        while state["next"] in state["pending"]:
+            for page, content in state["pending"].pop(state["next"]):
+                record = {"filename": state["filename"], "sha256": state["sha256"], "page": page, "content": content}
+                output(state).write(json.dumps(record, ensure_ascii=False) + "\n")
+            state["next"] += 1
 
-        # Format YAML blocks
-        if "apiVersion:" in text or "kind:" in text:
-            text = re.sub(r"(apiVersion:[\s\S]+?)(?=\n\n|\Z)", r"```yaml\n\1\n```", text)
+    def finish(state):
+        output(state).close()
+        os.replace(state["output_path"] + ".tmp", state["output_path"])
+        done_files.append(state["filename"])
 
-        # Format shell commands
-        text = re.sub(r"(?m)^(sudo .*|kubectl .*|docker .*|curl .*|scp .*)", r"```bash\n\1\n```", text)
+    done_files = []
+    workers = workers or os.cpu_count() or 1
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            queue = iter(tasks)
+            in_flight = {}
+            while True:
+                while len(in_flight) < workers * 2:
+                    task = next(queue, None)
+                    if task is None:
+                        break
+                    pdf_path, index, start, end = task
+                    in_flight[pool.submit(extract_page_range, pdf_path, start, end)] = (pdf_path, index)
+                if not in_flight:
+                    break
 
-        full_text += text + "\n"
+                completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in completed:
+                    pdf_path, index = in_flight.pop(future)
+                    state = files[pdf_path]
+                    state["pending"][index] = future.result()
+                    flush(state)
+                    if state["next"] == state["total"]:
+                        finish(state)
 
-    return full_text
+        # PDF sans page : fichier vide mais complet
+        for state in files.values():
+            if state["total"] == 0:
+                finish(state)
+    finally:
+        # Extraction interrompue : on ne laisse pas de JSONL partiel
+        for state in files.values():
+            if state["handle"] is not None and not state["handle"].closed:
+                state["handle"].close()
+                os.remove(state["output_path"] + ".tmp")
+    return done_files
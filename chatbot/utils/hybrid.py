@@ -0,0 +1,152 @@
+import math
+import re
+from collections import Counter
+from threading import Lock
+
+import numpy as np
+
+# Garde les identifiants techniques entiers (kubectl, nginx-ingress, apiversion:, /etc/hosts...)
+TOKEN_RE = re.compile(r"[a-z0-9_][a-z0-9_.:/=-]*")
+SUBTOKEN_RE = re.compile(r"[._:/=-]+")
+TRAILING_PUNCT = ".:/=-"
+
+
+def tokenize(text):
+    """Tokens BM25 : l'identifiant complet plus ses parties (nginx-ingress -> nginx, ingress)"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        token = token.rstrip(TRAILING_PUNCT)
+        if not token:
+            continue
+        tokens.append(token)
+        parts = [p for p in SUBTOKEN_RE.split(token) if p]
+        if len(parts) > 1:
+            tokens += parts
+    return tokens
+
+
+def doc_key(doc):
+    return doc.metadata.get("source"), doc.metadata.get("page"), doc.page_content
+
+
+class BM25Index:
+    """Index inversé BM25 en mémoire sur les chunks du vectorstore"""
+
+    def __init__(self, docs, k1=1.5, b=0.75):
+        self.docs = list(docs)
+        self.k1 = k1
+        self.b = b
+        postings = {}
+        lengths = np.zeros(len(self.docs), dtype=np.float32)
+        for i, doc in enumerate(self.docs):
+            counts = Counter(tokenize(doc.page_content))
+            lengths[i] = sum(counts.values())
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((i, tf))
+
+        n = max(len(self.docs), 1)
+        avgdl = float(lengths.mean()) if len(self.docs) else 1.0
+        # Normalisation de longueur précalculée par document
+        self._norm = k1 * (1 - b + b * lengths / max(avgdl, 1e-9))
+        self._postings = {}
+        for term, entries in postings.items():
+            ids = np.fromiter((i for i, _ in entries), dtype=np.int32, count=len(entries))
+            tfs = np.fromiter((tf for _, tf in entries), dtype=np.float32, count=len(entries))
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            self._postings[term] = (ids, tfs, idf)
+
+    @classmethod
+    def from_vectorstore(cls, vectorstore):
+        # Même ordre que l'index FAISS
+        docstore = vectorstore.docstore
+        return cls(docstore.search(doc_id) for doc_id in vectorstore.index_to_docstore_id.values())
+
+    def search(self, query, k=20):
+        """[(document, score)] par score BM25 décroissant"""
+        scores = np.zeros(len(self.docs), dtype=np.float32)
+        for term in set(tokenize(query)):
+            entry = self._postings.get(term)
+            if entry is None:
+                continue
+            ids, tfs, idf = entry
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[ids])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        ranked = matched[np.argsort(-scores[matched])]
+        return [(self.docs[i], float(scores[i])) for i in ranked]
+
+    def info(self):
+        return {"documents": len(self.docs), "terms": len(self._postings)}
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """Fusionne plusieurs listes de documents classés (RRF) ; retourne [(document, score)]"""
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            key = doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank + 1)
+    ordered = sorted(scores, key=scores.get, reverse=True)
+    return [(docs[key], scores[key]) for key in ordered]
+
+
+class CrossEncoderReranker:
+    """Re-classement des meilleurs candidats par un cross-encoder local (chargé au premier usage)"""
+
+    def __init__(self, model_name):
+        self.model_name = model_name
+        self._model = None
+        self._lock = Lock()
+        self.disabled = False
+
+    def load(self):
+        with self._lock:
+            if self._model is None and not self.disabled:
+                try:
+                    from sentence_transformers import CrossEncoder
+                    self._model = CrossEncoder(self.model_name)
+                except Exception as e:
+                    # Sans cross-encoder on garde simplement l'ordre de la fusion
+                    print(f"⚠️ Cross-encoder {self.model_name} indisponible : {e}")
+                    self.disabled = True
+        return self._model
+
+    def rerank(self, query, docs):
+        model = self.load()
+        if model is None or not docs:
+            return docs
+        scores = model.predict([(query, doc.page_content) for doc in docs])
+        order = np.argsort(-np.asarray(scores, dtype=np.float32), kind="stable")
+        return [docs[i] for i in order]
+
+
+class HybridRetriever:
+    """BM25 + FAISS fusionnés par RRF, puis re-classement optionnel des `rerank_top` premiers"""
+
+    def __init__(self, vectorstore, bm25, reranker=None, candidates=20, rerank_top=10, rrf_k=60):
+        self.vectorstore = vectorstore
+        self.bm25 = bm25
+        self.reranker = reranker
+        self.candidates = candidates
+        self.rerank_top = rerank_top
+        self.rrf_k = rrf_k
+
+    def vector_search(self, embedding, k):
+        return self.vectorstore.similarity_search_by_vector(embedding, k=k)
+
+    def keyword_search(self, question, k):
+        return [doc for doc, _ in self.bm25.search(question, k)]
+
+    def search(self, question, embedding, k=4, rerank=True):
+        fused = reciprocal_rank_fusion(
+            [self.vector_search(embedding, self.candidates), self.keyword_search(question, self.candidates)],
+            k=self.rrf_k,
+        )
+        docs = [doc for doc, _ in fused]
+        if rerank and self.reranker is not None:
+            docs = self.reranker.rerank(question, docs[:self.rerank_top]) + docs[self.rerank_top:]
+        return docs[:k]
@@ -0,0 +1,123 @@
+import json
+import os
+
+from langchain_community.vectorstores import FAISS
+
+from chatbot.utils.ann import NO_REMOVE_TYPES, create_vectorstore
+from chatbot.utils.embeddings import chunk_text
+from chatbot.utils.hashing import sha256_file, sha256_text
+
+MANIFEST_NAME = "manifest.json"
+
+
+def chunk_id(source, text):
+    # Identifiant stable : même fichier + même texte => même vecteur
+    return sha256_text(f"{source}\0{text}")
+
+
+def load_manifest(store_dir):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(store_dir, manifest):
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_pages(path):
+    """(source, numéro de page ou None, texte) d'un fichier extrait (.jsonl par page ou ancien .json)"""
+    filename = os.path.basename(path)
+    with open(path, encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield record.get("filename", filename), record.get("page"), record.get("content", "")
+            return
+        data = json.load(f)
+    if "content" not in data:
+        print(f"⚠️ Le fichier {filename} ne contient pas la clé 'content'.")
+        return
+    yield data.get("filename", filename), None, data["content"]
+
+
+def read_document_chunks(path):
+    """Chunks (id, texte, métadonnées) d'un fichier extrait, sans doublons"""
+    chunks, seen = [], set()
+    for source, page, content in read_pages(path):
+        for text in chunk_text(content):
+            cid = chunk_id(source, text)
+            if cid not in seen:
+                seen.add(cid)
+                metadata = {"source": source} if page is None else {"source": source, "page": page}
+                chunks.append((cid, text, metadata))
+    return chunks
+
+
+def update_vectorstore(input_dir, store_dir, embeddings, model_name, index_type="flat", rebuild=False):
+    """Met à jour l'index FAISS : seuls les chunks nouveaux sont encodés,
+    ceux des fichiers modifiés ou supprimés sont retirés."""
+    manifest = None if rebuild else load_manifest(store_dir)
+    vectorstore = None
+    if (manifest and manifest.get("model") == model_name and manifest.get("index", "flat") == index_type
+            and os.path.exists(os.path.join(store_dir, "index.faiss"))):
+        vectorstore = FAISS.load_local(store_dir, embeddings=embeddings, allow_dangerous_deserialization=True)
+    else:
+        # Index sans manifeste (autre modèle ou autre type d'index) : reconstruction complète
+        manifest = {"model": model_name, "index": index_type, "files": {}}
+
+    old_files = manifest["files"]
+    new_files = {}
+    to_add = []
+    to_delete = []
+
+    for file in sorted(os.listdir(input_dir)):
+        if not file.endswith((".json", ".jsonl")) or file == MANIFEST_NAME:
+            continue
+        path = os.path.join(input_dir, file)
+        file_hash = sha256_file(path)
+        previous = old_files.get(file)
+        if previous and previous["hash"] == file_hash:
+            new_files[file] = previous
+            continue
+
+        chunks = read_document_chunks(path)
+        ids = [cid for cid, _, _ in chunks]
+        old_ids = set(previous["chunks"]) if previous else set()
+        to_add += [c for c in chunks if c[0] not in old_ids]
+        to_delete += list(old_ids - set(ids))
+        new_files[file] = {"hash": file_hash, "chunks": ids}
+
+    for file in set(old_files) - set(new_files):
+        to_delete += old_files[file]["chunks"]
+
+    if vectorstore is not None and to_delete and index_type in NO_REMOVE_TYPES:
+        # HNSW ne sait pas retirer de vecteurs : on reconstruit (les embeddings viennent du cache disque)
+        return update_vectorstore(input_dir, store_dir, embeddings, model_name, index_type, rebuild=True)
+
+    if vectorstore is not None and to_delete:
+        vectorstore.delete(to_delete)
+    if to_add:
+        texts = [text for _, text, _ in to_add]
+        metadatas = [meta for _, _, meta in to_add]
+        ids = [cid for cid, _, _ in to_add]
+        if vectorstore is None:
+            vectorstore = create_vectorstore(texts, embeddings, metadatas, ids, index_type)
+        else:
+            vectorstore.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    if vectorstore is not None:
+        if to_add or to_delete:
+            vectorstore.save_local(store_dir)
+        manifest["files"] = new_files
+        manifest["index"] = index_type
+        save_manifest(store_dir, manifest)
+
+    return {"added": len(to_add), "deleted": len(to_delete), "files": len(new_files)}
@@ -0,0 +1,139 @@
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+
+
+def estimate_tokens(text):
+    # Approximation suffisante pour borner la taille des prompts (~4 caractères / token)
+    return len(text or "") // 4 + 1
+
+
+class SessionMemory:
+    """Historique d'une session : derniers échanges + résumé des plus anciens"""
+
+    def __init__(self):
+        self.turns = deque()
+        self.summary = ""
+        self.generation = 0         # incrémenté à chaque nouveau résumé
+        self.pending = []           # échanges sortis de la fenêtre, en attente de résumé
+        self.inflight = []          # échanges en cours de résumé
+        self.summarizing = False
+        self.last_used = time.monotonic()
+
+    @property
+    def tokens(self):
+        return estimate_tokens(self.summary) + sum(estimate_tokens(q) + estimate_tokens(a)
+                                                   for q, a in [*self.inflight, *self.pending, *self.turns])
+
+
+class SessionMemoryStore:
+    """Mémoire de conversation par session, bornée en taille.
+
+    - fenêtre glissante de `window_turns` échanges et budget de `max_tokens` par session ;
+      les échanges qui sortent de la fenêtre sont résumés par `summarizer(résumé, échanges)`,
+      en arrière-plan (la réponse n'attend pas l'appel au LLM) ;
+    - éviction LRU des sessions inactives depuis `idle_ttl` secondes ;
+    - plafond global en nombre de sessions et en tokens sur tout le store.
+    """
+
+    def __init__(self, summarizer=None, window_turns=4, max_tokens=1500, summary_tokens=300,
+                 idle_ttl=1800, max_sessions=1000, max_total_tokens=500000):
+        self.summarizer = summarizer
+        self.window_turns = window_turns
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_total_tokens = max_total_tokens
+        self._sessions = OrderedDict()
+        self._lock = Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="memory-summary")
+        self.evictions = 0
+
+    def get_history(self, session_id):
+        """Retourne (résumé, [(question, réponse), ...]) de la session"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return "", []
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            # Les échanges en cours de résumé restent visibles jusqu'à ce que le résumé soit prêt
+            return session.summary, [*session.inflight, *session.pending, *session.turns]
+
+    def add_turn(self, session_id, question, answer):
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = SessionMemory()
+            session.turns.append((question, answer))
+            session.last_used = time.monotonic()
+            self._sessions.move_to_end(session_id)
+
+            while session.turns and (len(session.turns) > self.window_turns or session.tokens > self.max_tokens):
+                session.pending.append(session.turns.popleft())
+            # Un seul résumé à la fois par session : les échanges suivants attendent dans `pending`
+            start = bool(session.pending) and not session.summarizing
+            if start:
+                session.summarizing = True
+
+        if start:
+            self._executor.submit(self._summarize_pending, session_id, session)
+        self._evict()
+
+    def _summarize_pending(self, session_id, session):
+        while True:
+            with self._lock:
+                if self._sessions.get(session_id) is not session or not session.pending:
+                    session.summarizing = False
+                    return
+                session.inflight, session.pending = session.pending, []
+                turns, previous_summary, generation = session.inflight, session.summary, session.generation
+
+            summary = self._summarize(previous_summary, turns)
+            with self._lock:
+                # Session effacée ou résumé remplacé entre-temps : on n'écrase rien
+                if self._sessions.get(session_id) is session and session.generation == generation:
+                    session.summary = summary
+                    session.generation += 1
+                session.inflight = []
+
+    def _summarize(self, previous_summary, turns):
+        if self.summarizer is not None:
+            try:
+                summary = self.summarizer(previous_summary, turns)
+            except Exception as e:
+                print(f"⚠️ Résumé de conversation impossible : {e}")
+                summary = None
+            if summary:
+                return summary[:self.summary_tokens * 4]
+        # Repli sans LLM : on garde les dernières questions posées
+        text = " ".join(filter(None, [previous_summary] + [f"Q: {q}" for q, _ in turns]))
+        return text[-self.summary_tokens * 4:]
+
+    def _evict(self):
+        now = time.monotonic()
+        with self._lock:
+            for session_id in [s for s, m in self._sessions.items() if now - m.last_used > self.idle_ttl]:
+                del self._sessions[session_id]
+                self.evictions += 1
+            total = sum(m.tokens for m in self._sessions.values())
+            while self._sessions and (len(self._sessions) > self.max_sessions or total > self.max_total_tokens):
+                _, session = self._sessions.popitem(last=False)
+                total -= session.tokens
+                self.evictions += 1
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "total_tokens": sum(m.tokens for m in self._sessions.values()),
+                "evictions": self.evictions,
+                "window_turns": self.window_turns,
+                "max_tokens_per_session": self.max_tokens,
+            }
@@ -0,0 +1,62 @@
+import threading
+import time
+
+
+class LazyResource:
+    """Ressource coûteuse (modèle, index, client LLM) créée au premier usage.
+
+    L'initialisation est protégée par un verrou : plusieurs requêtes simultanées
+    attendent le même chargement au lieu de le lancer chacune.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self._value = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self):
+        return self._loaded
+
+    def get(self):
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                started = time.perf_counter()
+                try:
+                    self._value = self.factory()
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self._loaded = True
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self._loaded = False
+
+    def status(self):
+        return {"loaded": self._loaded, "load_seconds": self.load_seconds, "error": self.error}
+
+
+def warm_up_in_background(resources):
+    """Charge les ressources dans un thread pour que la première requête n'attende pas"""
+
+    def run():
+        for resource in resources:
+            try:
+                resource.get()
+            except Exception as e:
+                print(f"⚠️ Préchargement de {resource.name} impossible : {e}")
+
+    thread = threading.Thread(target=run, name="chatbot-warmup", daemon=True)
+    thread.start()
+    return thread
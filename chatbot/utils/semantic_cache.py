@@ -0,0 +1,106 @@
+import time
+from threading import Lock
+
+import numpy as np
+
+
+class SemanticCache:
+    """Cache de réponses indexé par l'embedding de la question.
+
+    Une question dont la similarité cosinus avec une question déjà traitée dépasse
+    `threshold` reçoit la réponse en cache (avec ses sources). Entrées expirées après
+    `ttl` secondes, éviction LRU au-delà de `max_entries`, invalidation complète
+    dès que `fingerprint()` change (vectorstore reconstruit).
+    """
+
+    def __init__(self, dim, threshold=0.92, ttl=86400, max_entries=2000, fingerprint=None):
+        self.dim = dim
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.fingerprint = fingerprint
+        self._lock = Lock()
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._entries = [None] * max_entries
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._last_used = np.zeros(max_entries, dtype=np.float64)
+        self._used = np.zeros(max_entries, dtype=bool)
+        self._current_fingerprint = fingerprint() if fingerprint else None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding):
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _check_fingerprint(self):
+        if self.fingerprint is None:
+            return
+        current = self.fingerprint()
+        if current != self._current_fingerprint:
+            self._current_fingerprint = current
+            self._clear()
+            self.invalidations += 1
+
+    def _clear(self):
+        self._used[:] = False
+        self._entries = [None] * self.max_entries
+
+    def lookup(self, embedding):
+        """Retourne l'entrée en cache la plus proche (dict) ou None"""
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            self._check_fingerprint()
+            expired = self._used & (now - self._created > self.ttl)
+            self._used[expired] = False
+
+            if self._used.any():
+                scores = np.where(self._used, self._vectors @ vector, -1.0)
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    self._last_used[best] = now
+                    self.hits += 1
+                    return {**self._entries[best], "similarity": round(float(scores[best]), 4)}
+            self.misses += 1
+            return None
+
+    def put(self, embedding, question, answer, sources):
+        vector = self._normalize(embedding)
+        now = time.time()
+        with self._lock:
+            free = np.nonzero(~self._used)[0]
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+            self._vectors[slot] = vector
+            self._entries[slot] = {"question": question, "answer": answer, "sources": sources}
+            self._created[slot] = now
+            self._last_used[slot] = now
+            self._used[slot] = True
+
+    def invalidate(self):
+        with self._lock:
+            self._clear()
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": int(self._used.sum()),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl,
+            }
@@ -0,0 +1,52 @@
+# checkpoint.py
+"""Points de reprise sur disque pour un redémarrage à chaud.
+
+Format compact : en-tête + JSON compressé (zlib). L'écriture passe par un
+fichier temporaire renommé : un arrêt brutal laisse l'ancien point de reprise
+intact.
+"""
+import json
+import logging
+import os
+import tempfile
+import zlib
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"VMCK1\n"
+
+
+def save_checkpoint(path, payload):
+    """Écrit le point de reprise ; retourne la taille en octets"""
+    blob = MAGIC + zlib.compress(json.dumps(payload, separators=(",", ":")).encode(), 6)
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".checkpoint-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(blob)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return len(blob)
+
+
+def load_checkpoint(path):
+    """Contenu du point de reprise, ou None s'il est absent ou illisible"""
+    try:
+        with open(path, "rb") as f:
+            blob = f.read()
+    except FileNotFoundError:
+        return None
+    if not blob.startswith(MAGIC):
+        logger.warning(f"Point de reprise ignoré (format inconnu): {path}")
+        return None
+    try:
+        return json.loads(zlib.decompress(blob[len(MAGIC):]))
+    except (zlib.error, ValueError) as e:
+        logger.warning(f"Point de reprise illisible {path}: {e}")
+        return None
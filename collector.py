@@ -0,0 +1,192 @@
+# collector.py
+"""Collecte périodique (mode pull) des VMs qui n'ont pas d'agent actif"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+
+class Collector:
+    """Interroge la flotte toutes les `interval` secondes.
+
+    Les VMs dont l'agent a poussé des données récentes sont ignorées : le pull
+    reste le mode de repli. Les fonctions enregistrées via add_cycle_hook sont
+    appelées après chaque cycle.
+
+    Avec un `leader_lock` (plusieurs workers), seul le détenteur du verrou
+    interroge la flotte ; les autres relisent le cache partagé puis exécutent
+    les hooks sur leurs données synchronisées.
+
+    Avec un `shard` (ShardCoordinator, plusieurs instances), chaque instance ne
+    collecte que les VMs que l'anneau de hachage lui attribue.
+
+    Avec un `scheduler` (AdaptiveScheduler), le collecteur se réveille au pas
+    minimal et ne lance que les sondes arrivées à échéance ; les hooks restent
+    appelés toutes les `interval` secondes.
+    """
+
+    def __init__(self, monitor, interval=60, max_workers=8, leader_lock=None, shard=None, scheduler=None):
+        self.monitor = monitor
+        self.interval = interval
+        self.max_workers = max_workers
+        self.leader_lock = leader_lock
+        self.shard = shard
+        self.scheduler = scheduler
+        self._last_hooks = None
+        # Après un redémarrage à chaud, le premier cycle étale les VMs sur `stagger` secondes
+        self.stagger = 0
+        self._hooks = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"cycles": 0, "last_cycle": None, "last_duration_s": None,
+                      "pulled": 0, "skipped_agent": 0, "failed": 0, "synced": 0, "owned": None, "probes": 0}
+
+    def add_cycle_hook(self, hook):
+        self._hooks.append(hook)
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        if self.shard is not None:
+            self.shard.start()
+        self._thread = threading.Thread(target=self._run, name="vm-collector", daemon=True)
+        self._thread.start()
+        logger.info(f"Collecteur démarré (intervalle {self.interval}s)")
+
+    def stop(self):
+        self._stop.set()
+        if self.leader_lock is not None:
+            self.leader_lock.release()
+        if self.shard is not None:
+            self.shard.stop()
+
+    def _elect(self):
+        """Rôle du worker pour ce cycle ; le verrou est retenté à chaque cycle (reprise si le leader meurt)"""
+        if self.leader_lock is None:
+            role = "standalone"
+        else:
+            role = "leader" if self.leader_lock.try_acquire() else "follower"
+        if role != self.monitor.role:
+            logger.info(f"Collecteur : rôle {role}")
+        self.monitor.role = role
+        return role
+
+    def _run(self):
+        if self.shard is not None:
+            # Laisse les instances démarrées en même temps s'inscrire avant le premier partage
+            self._stop.wait(self.shard.heartbeat_interval * 2)
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self.stats["synced"] = self.monitor.sync_from_store()
+                if self._elect() == "follower":
+                    if self._hooks_due():
+                        self.run_follower_cycle()
+                else:
+                    self.run_cycle()
+            except Exception as e:
+                logger.error(f"Erreur cycle de collecte: {e}")
+            tick = self.scheduler.min_interval if self.scheduler is not None else self.interval
+            self._stop.wait(max(tick - (time.monotonic() - started), 1))
+
+    def _hooks_due(self):
+        return (self.scheduler is None or self._last_hooks is None
+                or time.monotonic() - self._last_hooks >= self.interval)
+
+    def _collect_vm(self, label, probes=("host", "containers")):
+        self.monitor.refresh_restored(label)
+        if self.monitor.has_fresh_agent_data(label):
+            if self.scheduler is not None:
+                self.scheduler.postpone(label)
+            return False
+        viewed = self.scheduler is not None and self.monitor.viewed_recently(label, self.scheduler.view_ttl)
+        if "host" in probes:
+            self.monitor.get_vm_stats(label, force=True)
+            if self.scheduler is not None:
+                self.scheduler.update(label, "host", self.monitor.history, viewed)
+        if "containers" in probes:
+            result = self.monitor.get_active_container_resources(label, force=True)
+            if self.scheduler is not None:
+                names = [c.get("Name") or c.get("Container") for c in result.get("container_resources", [])]
+                self.scheduler.update(label, "containers", self.monitor.history, viewed, names)
+        return True
+
+    def run_cycle(self):
+        started = time.monotonic()
+        vms = self.monitor.get_all_vms()
+        if isinstance(vms, dict):
+            logger.warning(f"Cycle ignoré: {vms.get('error')}")
+            return
+
+        labels = self._owned_labels(vms)
+        # Sondes à échéance seulement (fréquence adaptative), sinon toute la partition
+        work = list(self.scheduler.due(labels).items()) if self.scheduler is not None else \
+            [(label, ("host", "containers")) for label in labels]
+        stagger, self.stagger = self.stagger, 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            if stagger and work:
+                # Données restaurées déjà servies : pas de rafale SSH sur toute la flotte
+                futures = []
+                for i, (label, probes) in enumerate(work):
+                    if self._stop.wait(max(started + i * stagger / len(work) - time.monotonic(), 0)):
+                        break
+                    futures.append(pool.submit(self._safe_collect, label, probes))
+                results = [f.result() for f in futures]
+            else:
+                results = list(pool.map(lambda item: self._safe_collect(*item), work))
+
+        if self._hooks_due():
+            self._run_hooks(labels)
+
+        self.stats.update({
+            "cycles": self.stats["cycles"] + 1,
+            "last_cycle": time.time(),
+            "last_duration_s": round(time.monotonic() - started, 2),
+            "pulled": results.count(True),
+            "skipped_agent": results.count(False),
+            "failed": results.count(None),
+            "probes": self.stats["probes"] + sum(len(probes) for _, probes in work),
+        })
+
+    def run_follower_cycle(self):
+        """Worker suiveur : aucune connexion SSH, les données viennent du cache partagé"""
+        vms = self.monitor.get_all_vms()
+        if isinstance(vms, dict):
+            logger.warning(f"Cycle ignoré: {vms.get('error')}")
+            return
+        self._run_hooks(self._owned_labels(vms))
+        self.stats.update({"cycles": self.stats["cycles"] + 1, "last_cycle": time.time(),
+                           "pulled": 0, "skipped_agent": 0, "failed": 0})
+
+    def _owned_labels(self, vms):
+        labels = [vm["label"] for vm in vms]
+        if self.shard is None:
+            return labels
+        # L'anneau est recalculé à chaque battement : une instance disparue est reprise ici
+        labels = [label for label in labels if self.shard.owns(label)]
+        self.shard.info = {"owned": len(labels)}
+        self.stats["owned"] = len(labels)
+        return labels
+
+    def _run_hooks(self, labels):
+        self._last_hooks = time.monotonic()
+        for hook in self._hooks:
+            try:
+                with self.monitor.admission.priority(BACKGROUND):
+                    hook(labels)
+            except Exception as e:
+                logger.error(f"Erreur hook de collecte {getattr(hook, '__name__', hook)}: {e}")
+
+    def _safe_collect(self, label, probes=("host", "containers")):
+        try:
+            # Passe après les actions et lectures des utilisateurs dans la file de chaque VM
+            with self.monitor.admission.priority(BACKGROUND):
+                return self._collect_vm(label, probes)
+        except Exception as e:
+            logger.warning(f"Collecte échouée pour {label}: {e}")
+            return None
@@ -0,0 +1,107 @@
+# fake_fleet.py
+"""Flotte simulée (FAKE_FLEET=N) : tester la collecte répartie sans SSH ni MySQL.
+
+Les VMs `fake-0000`… répondent après une latence configurable avec des
+mesures pseudo-aléatoires, dans le format de get_vm_stats et de `docker stats`.
+FakeFleetMonitor remplace la base et SSH de VMMonitor par cette flotte.
+"""
+import os
+import random
+import time
+from datetime import datetime
+
+from vm_utils import VMMonitor
+
+IMAGES = ("nginx:1.25", "mysql:8.0", "redis:7", "jogetworkflow/joget-dx8:latest", "python:3.11-slim")
+
+
+class FakeFleet:
+    def __init__(self, size=100, latency=0.2, containers=5):
+        self.size = size
+        self.latency = latency
+        self.containers = containers
+        self.calls = 0
+
+    def labels(self):
+        return [f"fake-{i:04d}" for i in range(self.size)]
+
+    def vms(self):
+        return [self.vm_info(label) for label in self.labels()]
+
+    def vm_info(self, label):
+        if not label.startswith("fake-") or not label[5:].isdigit() or int(label[5:]) >= self.size:
+            return None
+        i = int(label[5:])
+        return {"label": label, "ip": f"10.99.{i // 256}.{i % 256}", "port": 22,
+                "username": "fake", "auth_method": "password"}
+
+    def _rng(self, label):
+        # Valeurs stables pour une VM, qui évoluent d'un appel à l'autre
+        self.calls += 1
+        return random.Random(f"{label}:{time.time() // 5}")
+
+    def vm_stats(self, label):
+        time.sleep(self.latency)
+        rng = self._rng(label)
+        total = rng.choice((4096, 8192, 16384))
+        used = int(total * rng.uniform(0.2, 0.95))
+        disk_used = rng.randint(10, 95)
+        return {
+            "vm": label,
+            "ip": self.vm_info(label)["ip"],
+            "cpu": round(rng.uniform(1, 100), 1),
+            "cpu_detail": {},
+            "ram": {"total_mb": total, "used_mb": used, "free_mb": total - used,
+                    "usage_percent": round(used * 100 / total, 1)},
+            "disk": {"size": "100G", "used": f"{disk_used}G", "avail": f"{100 - disk_used}G",
+                     "use_percent": f"{disk_used}%"},
+            "disk_io": {},
+            "load": {"1m": round(rng.uniform(0, 4), 2), "5m": round(rng.uniform(0, 4), 2),
+                     "15m": round(rng.uniform(0, 4), 2)},
+            "uptime": "up 3 days",
+            "status": "connected",
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    def container_stats(self, label):
+        time.sleep(self.latency)
+        rng = self._rng(label)
+        stats = []
+        for i in range(self.containers):
+            name = f"{label}-c{i}"
+            mem = rng.uniform(20, 900)
+            stats.append({
+                "Name": name, "Container": name, "ID": f"{label[5:]:0>6}{i:06d}",
+                "CPUPerc": f"{rng.uniform(0, 100):.2f}%",
+                "MemPerc": f"{mem / 20.48:.2f}%",
+                "MemUsage": f"{mem:.1f}MiB / 2GiB",
+                "NetIO": "1.2MB / 800kB", "BlockIO": "10MB / 2MB", "PIDs": str(rng.randint(1, 50)),
+                "Image": IMAGES[i % len(IMAGES)], "ComposeProject": f"project{i % 2}",
+            })
+        return stats
+
+
+class FakeFleetMonitor(VMMonitor):
+    """VMMonitor dont l'inventaire et les relevés viennent d'une FakeFleet"""
+
+    def __init__(self, fleet=None):
+        super().__init__()
+        self.fake_fleet = fleet or FakeFleet(int(os.getenv("FAKE_FLEET", 100)),
+                                             latency=float(os.getenv("FAKE_FLEET_LATENCY", 0.2)))
+        # Pas de flux docker stats : les relevés passent par container_stats
+        self.STATS_STREAM = False
+
+    def _get_vm_info_by_label(self, label):
+        return self.fake_fleet.vm_info(label)
+
+    def get_all_vms(self):
+        return [{**vm, "status": "unknown", "last_check": None} for vm in self.fake_fleet.vms()]
+
+    def _fetch_vm_stats(self, label, vm_info, timeout=30):
+        return self.fake_fleet.vm_stats(label)
+
+    def _fetch_container_resources(self, label, vm_info):
+        return self.fake_fleet.container_stats(label)
+
+    def refresh_stale_images(self, labels, force=False, max_workers=8):
+        return []
@@ -0,0 +1,145 @@
+# fleet_index.py
+"""Index en mémoire du dernier instantané des conteneurs de toute la flotte.
+
+Les compteurs par groupe (image, VM, projet compose) sont mis à jour de façon
+incrémentale à chaque ingestion d'une VM ; le top-N utilise un tas.
+"""
+import heapq
+import re
+from datetime import datetime
+from threading import Lock
+
+GROUP_KEYS = ("image", "vm", "project")
+METRICS = ("cpu", "mem", "mem_percent")
+
+_SIZE_UNITS = {
+    "b": 1, "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+}
+_SIZE_RE = re.compile(r"^\s*([\d.]+)\s*([a-zA-Z]*)\s*$")
+
+
+def parse_size_bytes(value):
+    """"120MiB" / "1.5GB" / "500B" -> nombre d'octets (0 si illisible)"""
+    match = _SIZE_RE.match(str(value or ""))
+    if not match:
+        return 0
+    unit = match.group(2).lower() or "b"
+    return int(float(match.group(1)) * _SIZE_UNITS.get(unit, 1))
+
+
+def _percent(value):
+    try:
+        return float(str(value).replace("%", "").strip())
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compose_project(labels):
+    """Projet compose à partir du champ Labels de `docker ps` (chaîne k=v,... ou dict)"""
+    if isinstance(labels, dict):
+        return labels.get("com.docker.compose.project")
+    for item in (labels or "").split(","):
+        key, _, value = item.partition("=")
+        if key.strip() == "com.docker.compose.project":
+            return value.strip()
+    return None
+
+
+def container_record(label, stats):
+    """Entrée d'index à partir d'une ligne `docker stats` enrichie (Image, ComposeProject)"""
+    mem_used = (stats.get("MemUsage") or "").split("/")[0]
+    return {
+        "vm": label,
+        "name": stats.get("Name") or stats.get("Container"),
+        "id": stats.get("ID"),
+        "image": stats.get("Image") or "unknown",
+        "project": stats.get("ComposeProject") or "none",
+        "cpu": _percent(stats.get("CPUPerc")),
+        "mem": parse_size_bytes(mem_used),
+        "mem_percent": _percent(stats.get("MemPerc")),
+    }
+
+
+class FleetIndex:
+    """Top-N et agrégats par groupe sur les conteneurs de toutes les VMs"""
+
+    def __init__(self):
+        self._records = {}       # (vm, nom) -> enregistrement
+        self._by_vm = {}         # vm -> ensemble de clés
+        self._groups = {key: {} for key in GROUP_KEYS}
+        self._updated = {}       # vm -> datetime de la dernière ingestion
+        self._lock = Lock()
+
+    def _apply(self, record, sign):
+        for group_key in GROUP_KEYS:
+            counters = self._groups[group_key].setdefault(
+                record[group_key], {"count": 0, "cpu": 0.0, "mem": 0, "mem_percent": 0.0}
+            )
+            counters["count"] += sign
+            for metric in METRICS:
+                counters[metric] += sign * record[metric]
+            if counters["count"] <= 0:
+                del self._groups[group_key][record[group_key]]
+
+    def ingest_vm(self, label, container_stats):
+        """Remplace l'instantané d'une VM ; retourne les conteneurs disparus ou recréés (ID changé)"""
+        records = [container_record(label, s) for s in container_stats]
+        with self._lock:
+            previous = {}
+            for key in self._by_vm.pop(label, ()):
+                record = self._records.pop(key)
+                previous[record["name"]] = record["id"]
+                self._apply(record, -1)
+            keys = set()
+            for record in records:
+                key = (label, record["name"])
+                if key in keys:
+                    continue
+                keys.add(key)
+                self._records[key] = record
+                self._apply(record, +1)
+            self._by_vm[label] = keys
+            self._updated[label] = datetime.now()
+            current = {self._records[key]["name"]: self._records[key]["id"] for key in keys}
+        return {name for name, container_id in previous.items()
+                if name not in current or container_id and current[name] and container_id != current[name]}
+
+    def remove_vm(self, label):
+        with self._lock:
+            for key in self._by_vm.pop(label, ()):
+                self._apply(self._records.pop(key), -1)
+            self._updated.pop(label, None)
+
+    def top(self, metric="cpu", n=10, vm=None):
+        if metric not in METRICS:
+            raise ValueError(f"Métrique non supportée: {metric}")
+        with self._lock:
+            records = self._records.values() if vm is None else [
+                self._records[k] for k in self._by_vm.get(vm, ())
+            ]
+            return [dict(r) for r in heapq.nlargest(n, records, key=lambda r: r[metric])]
+
+    def aggregate(self, by="image", metric="cpu", n=None):
+        if by not in GROUP_KEYS:
+            raise ValueError(f"Regroupement non supporté: {by}")
+        if metric not in METRICS:
+            raise ValueError(f"Métrique non supportée: {metric}")
+        with self._lock:
+            groups = [
+                {by: name, "count": c["count"], "cpu": round(c["cpu"], 2), "mem": c["mem"],
+                 "mem_percent": round(c["mem_percent"], 2)}
+                for name, c in self._groups[by].items()
+            ]
+        if n:
+            return heapq.nlargest(n, groups, key=lambda g: g[metric])
+        return sorted(groups, key=lambda g: g[metric], reverse=True)
+
+    def info(self):
+        with self._lock:
+            return {
+                "containers": len(self._records),
+                "vms": len(self._by_vm),
+                "groups": {key: len(groups) for key, groups in self._groups.items()},
+                "updated": {vm: ts.isoformat() for vm, ts in self._updated.items()},
+            }
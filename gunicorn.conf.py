@@ -0,0 +1,31 @@
+# gunicorn.conf.py
+"""Service multi-workers : gunicorn -c gunicorn.conf.py app:app
+
+Chaque worker a sa propre instance de VMMonitor ; les instantanés passent par
+le cache SQLite partagé (SHARED_CACHE_PATH) et un seul worker, élu par verrou
+fichier, interroge la flotte.
+"""
+import os
+
+os.environ.setdefault("SHARED_CACHE_PATH", "/tmp/vm-monitor/snapshots.db")
+
+bind = os.getenv("BIND", "0.0.0.0:5050")
+workers = int(os.getenv("WEB_CONCURRENCY", 4))
+# Threads : les réponses en flux (NDJSON, SSE) ne bloquent pas tout le worker
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+# Pas de preload : les connexions SQLite et les threads sont créés dans chaque worker
+preload_app = False
+
+
+def post_worker_init(worker):
+    from app import collector
+    if collector.interval > 0:
+        collector.start()
+
+
+def worker_exit(server, worker):
+    from app import collector, monitor
+    collector.stop()
+    monitor.save_checkpoint(force=True)
@@ -0,0 +1,188 @@
+# image_index.py
+"""Inventaire des images Docker de toute la flotte.
+
+Une seule commande SSH par VM rapporte les images (tailles exactes en octets),
+les conteneurs qui les utilisent et `docker system df`. L'index est dédupliqué
+par ID d'image et mis à jour VM par VM : seule la VM rafraîchie est recalculée.
+"""
+import json
+from datetime import datetime
+from threading import Lock
+
+from fleet_index import parse_size_bytes
+
+IMAGE_INVENTORY_COMMAND = (
+    "echo '@@images'; sudo docker images --no-trunc --digests --format '{{json .}}'; "
+    "echo '@@sizes'; sudo docker images -q --no-trunc | sort -u | "
+    "xargs -r sudo docker image inspect --format '{{.Id}} {{.Size}}'; "
+    "echo '@@containers'; sudo docker ps -aq --no-trunc | "
+    "xargs -r sudo docker inspect --format '{{.Image}} {{.State.Running}} {{.Name}}'; "
+    "echo '@@df'; sudo docker system df --format '{{json .}}'; true"
+)
+SORT_KEYS = ("size", "fleet_size", "vms", "name")
+
+
+def _sections(output):
+    sections, current = {}, None
+    for line in output.splitlines():
+        if line.startswith("@@"):
+            current = line[2:].strip()
+            sections[current] = []
+        elif current and line.strip():
+            sections[current].append(line.strip())
+    return sections
+
+
+def parse_image_inventory(output):
+    """Sortie de IMAGE_INVENTORY_COMMAND -> (images par ID, lignes `docker system df`)"""
+    sections = _sections(output)
+    images = {}
+    for line in sections.get("images", []):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        image = images.setdefault(row.get("ID"), {
+            "id": row.get("ID"), "tags": set(), "digests": set(),
+            "size": parse_size_bytes(row.get("Size")), "created": row.get("CreatedAt"),
+            "containers": [], "running": 0,
+        })
+        if row.get("Repository") not in (None, "<none>") and row.get("Tag") not in (None, "<none>"):
+            image["tags"].add(f"{row['Repository']}:{row['Tag']}")
+        if row.get("Digest") not in (None, "<none>"):
+            image["digests"].add(f"{row.get('Repository')}@{row['Digest']}")
+
+    # Tailles exactes (docker images n'affiche qu'une taille arrondie)
+    for line in sections.get("sizes", []):
+        image_id, _, size = line.partition(" ")
+        if image_id in images and size.isdigit():
+            images[image_id]["size"] = int(size)
+
+    for line in sections.get("containers", []):
+        parts = line.split(" ", 2)
+        if len(parts) == 3 and parts[0] in images:
+            images[parts[0]]["containers"].append(parts[2].lstrip("/"))
+            images[parts[0]]["running"] += parts[1] == "true"
+
+    df = []
+    for line in sections.get("df", []):
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        df.append({
+            "type": row.get("Type"),
+            "count": int(row.get("TotalCount") or 0),
+            "active": int(row.get("Active") or 0),
+            "size": parse_size_bytes(row.get("Size")),
+            "reclaimable": parse_size_bytes(str(row.get("Reclaimable") or "").split(" ")[0]),
+        })
+    return images, df
+
+
+class FleetImageIndex:
+    """Images dédupliquées par ID, avec la correspondance VM -> images"""
+
+    def __init__(self):
+        self._images = {}        # id -> {id, tags, digests, size, created, vms: {vm: usage}}
+        self._by_vm = {}         # vm -> ensemble d'IDs
+        self._df = {}            # vm -> lignes docker system df
+        self._updated = {}       # vm -> datetime du dernier inventaire
+        self._lock = Lock()
+
+    def _remove_vm_locked(self, label):
+        for image_id in self._by_vm.pop(label, ()):
+            entry = self._images[image_id]
+            entry["vms"].pop(label, None)
+            if not entry["vms"]:
+                del self._images[image_id]
+        self._df.pop(label, None)
+        self._updated.pop(label, None)
+
+    def ingest_vm(self, label, images, df):
+        with self._lock:
+            self._remove_vm_locked(label)
+            for image_id, image in images.items():
+                entry = self._images.setdefault(image_id, {
+                    "id": image_id, "tags": set(), "digests": set(), "size": image["size"],
+                    "created": image["created"], "vms": {},
+                })
+                entry["tags"] |= image["tags"]
+                entry["digests"] |= image["digests"]
+                entry["vms"][label] = {
+                    "tags": sorted(image["tags"]),
+                    "containers": image["containers"],
+                    "running": image["running"],
+                    "dangling": not image["tags"],
+                }
+            self._by_vm[label] = set(images)
+            self._df[label] = df
+            self._updated[label] = datetime.now()
+
+    def remove_vm(self, label):
+        with self._lock:
+            self._remove_vm_locked(label)
+
+    def updated_at(self, label):
+        with self._lock:
+            return self._updated.get(label)
+
+    @staticmethod
+    def _view(entry, vm=None):
+        vms = entry["vms"]
+        # Filtre par VM : utilisation et drapeaux propres à cette VM
+        usage = {vm: vms[vm]} if vm else vms
+        return {
+            "id": entry["id"],
+            "tags": sorted(entry["tags"]),
+            "digests": sorted(entry["digests"]),
+            "size": entry["size"],
+            "created": entry["created"],
+            "vm_count": len(vms),
+            "fleet_size": entry["size"] * len(vms),
+            "vms": sorted(vms),
+            "containers": sum(len(u["containers"]) for u in usage.values()),
+            "running": sum(u["running"] for u in usage.values()),
+            "dangling": all(u["dangling"] for u in usage.values()),
+            "unused": not any(u["containers"] for u in usage.values()),
+        }
+
+    def query(self, vm=None, q=None, dangling=None, unused=None, sort="size", offset=0, limit=50):
+        """Images filtrées et triées côté serveur ; retourne (page, total)"""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Tri non supporté: {sort}")
+        q = (q or "").lower()
+        with self._lock:
+            entries = self._images.values() if vm is None else [
+                self._images[i] for i in self._by_vm.get(vm, ())
+            ]
+            views = [self._view(e, vm) for e in entries
+                     if not q or q in e["id"].lower() or any(q in t.lower() for t in e["tags"])]
+        if dangling is not None:
+            views = [v for v in views if v["dangling"] == dangling]
+        if unused is not None:
+            views = [v for v in views if v["unused"] == unused]
+
+        if sort == "name":
+            views.sort(key=lambda v: (v["tags"][0] if v["tags"] else "~", v["id"]))
+        else:
+            key = "vm_count" if sort == "vms" else sort
+            views.sort(key=lambda v: (v[key], v["id"]), reverse=True)
+        return views[offset:offset + limit], len(views)
+
+    def summary(self):
+        with self._lock:
+            views = [self._view(e) for e in self._images.values()]
+            df = {vm: rows for vm, rows in self._df.items()}
+            updated = {vm: ts.isoformat() for vm, ts in self._updated.items()}
+        return {
+            "images": len(views),
+            "vms": len(updated),
+            "unique_bytes": sum(v["size"] for v in views),
+            "fleet_bytes": sum(v["fleet_size"] for v in views),
+            "dangling_bytes": sum(v["fleet_size"] for v in views if v["dangling"]),
+            "unused_bytes": sum(v["fleet_size"] for v in views if v["unused"]),
+            "reclaimable_bytes": sum(r["reclaimable"] for rows in df.values() for r in rows),
+            "system_df": df,
+            "updated": updated,
+        }
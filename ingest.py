@@ -0,0 +1,76 @@
+# ingest.py
+"""Format d'échange agent -> service : protocole ligne (type InfluxDB)
+
+    measurement,tag1=v1,tag2=v2 field1=1.5,field2=3 <timestamp_ns>
+
+Mesures utilisées par l'agent :
+    host       vm=<label>                       cpu, user, system, iowait, steal, load1, load5, load15
+    core       vm=<label>,core=cpu0             usage, user, system, iowait, steal
+    mem        vm=<label>                       total_mb, used_mb, free_mb, available_mb, usage_percent
+    disk       vm=<label>                       size_kb, used_kb, avail_kb, use_percent
+    diskio     vm=<label>,device=sda            read_kbps, write_kbps, util_percent
+    container  vm=<label>,name=<nom>,image=<image>[,project=<compose>]
+                                                cpu_percent, mem_used_mb, mem_limit_mb, mem_percent
+"""
+import re
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _unescape(value):
+    return re.sub(r"\\(.)", r"\1", value)
+
+
+def _split_escaped(text, sep):
+    """Découpe sur sep en ignorant les séparateurs échappés (échappements conservés)"""
+    parts, current, escaped = [], [], False
+    for char in text:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            current.append(char)
+            escaped = True
+        elif char == sep:
+            parts.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def format_line(measurement, tags, fields, ts_ns):
+    tag_part = "".join(f",{_escape(k)}={_escape(v)}" for k, v in sorted(tags.items()))
+    field_part = ",".join(f"{_escape(k)}={float(v)!r}" for k, v in fields.items() if v is not None)
+    return f"{_escape(measurement)}{tag_part} {field_part} {int(ts_ns)}"
+
+
+def parse_line(line):
+    """Retourne (measurement, tags, fields, ts_secondes) ou lève ValueError"""
+    head, fields_part, ts_part = _split_escaped(line.strip(), " ")
+    head_parts = _split_escaped(head, ",")
+    tags = {}
+    for item in head_parts[1:]:
+        key, _, value = item.partition("=")
+        tags[_unescape(key)] = _unescape(value)
+    fields = {}
+    for item in _split_escaped(fields_part, ","):
+        key, _, value = item.partition("=")
+        fields[_unescape(key)] = float(value)
+    return _unescape(head_parts[0]), tags, fields, int(ts_part) / 1e9
+
+
+def parse_lines(body):
+    """Analyse un lot ; les lignes invalides sont comptées puis ignorées"""
+    points, errors = [], 0
+    for line in body.splitlines():
+        if not line.strip() or line.startswith("#"):
+            continue
+        try:
+            points.append(parse_line(line))
+        except ValueError:
+            errors += 1
+    return points, errors
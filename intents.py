@@ -0,0 +1,142 @@
+"""Routage des questions du chatbot vers les données de supervision.
+
+Toutes les intentions sont compilées en une seule expression régulière :
+le nom du groupe qui a reconnu le message (`match.lastgroup`) sert de clé
+dans la table de dispatch. Module léger, importable par le chatbot comme
+par le tableau de bord.
+"""
+import re
+
+VM = r"(?:de\s+la\s+|la\s+|sur\s+la\s+)?vm\s+(?P<{}>[\w.-]+)"
+
+# (intention, motif) : l'ordre compte, la première alternative reconnue l'emporte
+INTENT_PATTERNS = [
+    ("images", r"images\s+" + VM.format("images_vm")),
+    ("logs", r"logs\s+(?:du\s+)?conteneur\s+(?P<logs_container>[\w.-]+)\s+" + VM.format("logs_vm")),
+    ("running", r"conteneurs\s+(?:actifs|en\s+cours)\s+" + VM.format("running_vm")),
+    ("stopped", r"conteneurs\s+arr[êe]t[ée]s\s+" + VM.format("stopped_vm")),
+    ("joget", r"projets\s+joget\s+" + VM.format("joget_vm")),
+    ("top", r"top\s+(?P<top_n>\d+\s+)?conteneurs(?:\s+(?P<top_metric>cpu|ram|m[ée]moire))?"
+            r"(?:\s+" + VM.format("top_vm") + ")?"),
+    ("stats", r"(?:stats|statistiques|[ée]tat|cpu|ram|m[ée]moire|disque|charge)\s+" + VM.format("stats_vm")),
+    ("vms", r"(?:liste\s+des|quelles\s+sont\s+les|quelles)\s+vms\b"),
+]
+
+# Formulation de question facultative devant la commande ("quel est l'état de la vm X ?")
+_ARTICLE = r"(?:l'|les?\s+|la\s+|des\s+)"
+QUESTION_PREFIX = (r"(?:(?:quel(?:le)?s?\s+(?:est|sont)\s+)?" + _ARTICLE +
+                   r"|(?:donne|affiche|montre)[sz]?(?:-moi)?\s+" + _ARTICLE + ")?")
+# Message entier ancré : une question de documentation qui mentionne une VM ("comment augmenter
+# la RAM de la vm X ?") n'est pas prise pour une demande d'état
+INTENT_RE = re.compile(
+    r"^\s*" + QUESTION_PREFIX
+    + "(?:" + "|".join(f"(?P<{name}>{pattern})" for name, pattern in INTENT_PATTERNS) + ")"
+    + r"\s*[?.!]*\s*$",
+    re.IGNORECASE,
+)
+
+
+def parse_intent(message):
+    """(intention, paramètres) pour une question sur l'état de l'infrastructure, sinon None"""
+    match = INTENT_RE.match(message.strip())
+    if not match:
+        return None
+    intent = match.lastgroup
+    prefix = intent + "_"
+    params = {key[len(prefix):]: value.strip().rstrip(".") for key, value in match.groupdict().items()
+              if key.startswith(prefix) and value}
+    return intent, params
+
+
+def _top_metric(value):
+    return "mem_percent" if value and value.lower() in ("ram", "mémoire", "memoire") else "cpu"
+
+
+def _list_vms(monitor):
+    vms = monitor.get_all_vms()
+    if isinstance(vms, dict):
+        return {**vms, "status": "failed"}
+    return {"vms": vms, "status": "ok"}
+
+
+# Intention -> appel VMMonitor (les données en cache sont privilégiées)
+DISPATCH = {
+    "images": lambda monitor, p: monitor.get_inventory(p["vm"], "images"),
+    "logs": lambda monitor, p: monitor.get_container_logs(p["vm"], p["container"]),
+    "running": lambda monitor, p: monitor.get_cached_running_containers(p["vm"]),
+    "stopped": lambda monitor, p: monitor.list_containers(p["vm"], state="stopped"),
+    "joget": lambda monitor, p: monitor.get_joget_projects(p["vm"]),
+    "top": lambda monitor, p: {
+        "vm": p.get("vm"),
+        "metric": _top_metric(p.get("metric")),
+        "containers": monitor.fleet_index.top(_top_metric(p.get("metric")), int(p.get("n") or 5), p.get("vm")),
+        "status": "ok",
+    },
+    "stats": lambda monitor, p: monitor.get_vm_stats(p["vm"]),
+    "vms": lambda monitor, p: _list_vms(monitor),
+}
+
+
+def dispatch(monitor, message):
+    parsed = parse_intent(message)
+    if parsed is None:
+        return {"status": "unknown", "message": "Commande non reconnue"}
+    intent, params = parsed
+    result = DISPATCH[intent](monitor, params)
+    return {**result, "intent": intent}
+
+
+def format_answer(result):
+    """Réponse texte (markdown) du chatbot à partir du résultat d'une intention"""
+    intent = result.get("intent")
+    vm = result.get("vm")
+    target = f" pour la VM {vm}" if vm else ""
+    if result.get("status") == "busy":
+        return f"⏳ File de commandes saturée{target}, réessayez dans quelques instants."
+    if result.get("status") not in ("ok", "connected"):
+        return f"⚠️ Impossible de récupérer ces informations{target} : {result.get('error') or result.get('status')}"
+
+    if intent == "stats":
+        ram = result.get("ram") or {}
+        disk = result.get("disk") or {}
+        load = result.get("load") or {}
+        lines = [f"**VM {vm}**",
+                 f"- CPU : {result.get('cpu')} %",
+                 f"- RAM : {ram.get('used_mb')} / {ram.get('total_mb')} Mo ({ram.get('usage_percent')} %)",
+                 f"- Disque / : {disk.get('used')} / {disk.get('size')} ({disk.get('use_percent')})"]
+        if load:
+            lines.append(f"- Charge : {load.get('1m')} / {load.get('5m')} / {load.get('15m')}")
+        lines.append(f"_Mesure du {result.get('timestamp')}_")
+        return "\n".join(lines)
+
+    if intent in ("running", "stopped"):
+        title = "actifs" if intent == "running" else "arrêtés"
+        items = result.get("data", [])
+        if not items:
+            return f"Aucun conteneur {title} sur la VM {vm}."
+        rows = [f"- `{c.get('Names') or c.get('Name')}` ({c.get('Image') or '?'}) {c.get('Status', '')}".rstrip()
+                for c in items]
+        return f"**{len(items)} conteneur(s) {title} sur la VM {vm}**\n" + "\n".join(rows)
+
+    if intent == "images":
+        rows = [f"- `{i.get('Repository')}:{i.get('Tag')}` ({i.get('Size')})" for i in result.get("data", [])]
+        return f"**{len(rows)} image(s) sur la VM {vm}**\n" + "\n".join(rows)
+
+    if intent == "logs":
+        return f"**Logs de `{result.get('container')}` sur la VM {vm}**\n```\n{result.get('logs', '')}\n```"
+
+    if intent == "joget":
+        rows = [f"- `{c['container']}` : {', '.join(c['projects']) or 'aucun projet'}"
+                for c in result.get("joget_containers", [])]
+        return f"**Projets Joget sur la VM {vm}**\n" + ("\n".join(rows) or "Aucun conteneur Joget.")
+
+    if intent == "top":
+        unit = "CPU" if result["metric"] == "cpu" else "RAM"
+        rows = [f"- `{c.get('name')}` ({c.get('vm')}) : {c.get(result['metric'])} %" for c in result.get("containers", [])]
+        return f"**Top conteneurs ({unit})**\n" + ("\n".join(rows) or "Aucune donnée collectée pour l'instant.")
+
+    if intent == "vms":
+        rows = [f"- {v.get('label')} ({v.get('ip')})" for v in result.get("vms", [])]
+        return f"**{len(rows)} VM(s) supervisée(s)**\n" + "\n".join(rows)
+
+    return str(result)
@@ -0,0 +1,109 @@
+# listing.py
+"""Filtres, tri, projection et pagination par curseur des listes Docker.
+
+Appliqués côté serveur sur l'inventaire en cache d'une VM. Le curseur est un
+jeton opaque qui encode la clé de tri du dernier élément renvoyé (pagination
+par clé) : une page reste cohérente même si l'inventaire est rafraîchi entre
+deux appels.
+"""
+import base64
+import json
+
+from fleet_index import parse_size_bytes
+
+LISTING_PARAMS = ("limit", "cursor", "fields", "sort", "name", "state", "image")
+MAX_LIMIT = 500
+# Champs comparés numériquement (tailles lisibles de docker)
+SIZE_FIELDS = ("Size", "VirtualSize", "SharedSize", "UniqueSize")
+
+
+def has_listing_params(args):
+    """Aucun paramètre : réponse complète, comme avant"""
+    return any(args.get(name) is not None for name in LISTING_PARAMS)
+
+
+def encode_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, TypeError):
+        raise ValueError("Curseur invalide")
+    if not isinstance(position, dict) or not {"sort", "value", "id"} <= position.keys():
+        raise ValueError("Curseur invalide")
+    # Même forme que _sort_value : [0, nombre] ou [1, texte], sinon la comparaison lèverait TypeError
+    value = position["value"]
+    if not (isinstance(value, list) and len(value) == 2 and isinstance(position["id"], str)
+            and (value[0] == 0 and isinstance(value[1], (int, float)) and not isinstance(value[1], bool)
+                 or value[0] == 1 and isinstance(value[1], str))):
+        raise ValueError("Curseur invalide")
+    return position
+
+
+def _name(item):
+    if "Repository" in item:
+        return f"{item.get('Repository')}:{item.get('Tag')}"
+    return item.get("Names") or item.get("Name") or ""
+
+
+def _sort_value(item, field):
+    value = item.get(field)
+    if field in SIZE_FIELDS:
+        return [0, parse_size_bytes(str(value or "").split(" ")[0])]
+    if isinstance(value, (int, float)):
+        return [0, value]
+    return [1, str(value or "").lower()]
+
+
+def _matches(item, name=None, states=None, image=None):
+    if name and name.lower() not in _name(item).lower():
+        return False
+    if states and str(item.get("State", "")).lower() not in states:
+        return False
+    if image:
+        image_name = item.get("Image") or _name(item)
+        if image.lower() not in str(image_name).lower():
+            return False
+    return True
+
+
+def apply_listing(items, args, default_sort="Names"):
+    """(page, méta) pour une liste d'objets docker (ps -a / images en JSON).
+
+    Paramètres : name, state (liste séparée par des virgules), image,
+    sort (champ, préfixe '-' pour l'ordre décroissant), fields, limit, cursor.
+    """
+    states = {s.strip().lower() for s in (args.get("state") or "").split(",") if s.strip()}
+    selected = [i for i in items if _matches(i, args.get("name"), states, args.get("image"))]
+
+    sort = args.get("sort") or default_sort
+    descending = sort.startswith("-")
+    field = sort.lstrip("-")
+    # L'ID départage les égalités : l'ordre est total, le curseur non ambigu
+    keyed = sorted(((_sort_value(i, field), str(i.get("ID", _name(i))), i) for i in selected),
+                   key=lambda k: (k[0], k[1]), reverse=descending)
+
+    cursor = args.get("cursor")
+    if cursor:
+        position = decode_cursor(cursor)
+        if position.get("sort") != sort:
+            raise ValueError("Curseur créé avec un autre tri")
+        last = (position["value"], position["id"])
+        keyed = [k for k in keyed if ((k[0], k[1]) < last if descending else (k[0], k[1]) > last)]
+
+    try:
+        limit = min(max(int(args.get("limit") or MAX_LIMIT), 1), MAX_LIMIT)
+    except ValueError:
+        raise ValueError("limit doit être un entier")
+    page = keyed[:limit]
+    next_cursor = None
+    if len(keyed) > limit:
+        value, item_id, _ = page[-1]
+        next_cursor = encode_cursor({"sort": sort, "value": value, "id": item_id})
+
+    fields = [f.strip() for f in (args.get("fields") or "").split(",") if f.strip()]
+    data = [{f: item.get(f) for f in fields} if fields else item for _, _, item in page]
+    return data, {"total": len(selected), "limit": limit, "next_cursor": next_cursor, "sort": sort}
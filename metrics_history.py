@@ -0,0 +1,71 @@
+# metrics_history.py
+"""Historique borné des métriques par série (VM ou conteneur)"""
+import time
+from collections import deque
+from threading import Lock
+
+
+class MetricsHistory:
+    """Stocke les derniers points (timestamp, valeur) de chaque série.
+
+    Une série est identifiée par (label VM, nom du conteneur ou None, métrique).
+    """
+
+    def __init__(self, max_points=720):
+        self.max_points = max_points
+        self._series = {}
+        self._lock = Lock()
+
+    def record(self, label, metric, value, ts=None, container=None):
+        if value is None:
+            return
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            return
+        key = (label, container, metric)
+        ts = ts if ts is not None else time.time()
+        with self._lock:
+            points = self._series.get(key)
+            if points is None:
+                points = self._series[key] = deque(maxlen=self.max_points)
+            # Les échantillons d'un agent peuvent arriver en lot : on garde l'ordre
+            if points and ts <= points[-1][0]:
+                return
+            points.append((ts, value))
+
+    def series(self, label, metric, container=None):
+        with self._lock:
+            return list(self._series.get((label, container, metric), ()))
+
+    def snapshot(self, metrics=None):
+        """Copie {clé: [(ts, valeur), ...]} des séries, filtrées par métrique"""
+        with self._lock:
+            return {
+                key: list(points)
+                for key, points in self._series.items()
+                if metrics is None or key[2] in metrics
+            }
+
+    def latest(self, metrics=None):
+        """Dernier point {clé: (ts, valeur)} de chaque série, filtrées par métrique"""
+        with self._lock:
+            return {
+                key: points[-1]
+                for key, points in self._series.items()
+                if points and (metrics is None or key[2] in metrics)
+            }
+
+    def drop(self, label, container=None):
+        """Supprime les séries d'une VM (ou d'un seul de ses conteneurs)"""
+        with self._lock:
+            for key in [k for k in self._series if k[0] == label and (container is None or k[1] == container)]:
+                del self._series[key]
+
+    def info(self):
+        with self._lock:
+            return {
+                "series": len(self._series),
+                "points": sum(len(p) for p in self._series.values()),
+                "max_points_per_series": self.max_points,
+            }
@@ -0,0 +1,215 @@
+# proc_metrics.py
+"""Collecte des métriques hôte à partir de /proc (CPU, mémoire, charge, disques).
+
+L'utilisation est calculée par différence avec l'échantillon précédent gardé
+en mémoire, au lieu de lancer `top` sur la machine distante.
+"""
+import time
+from threading import Lock
+
+# Une seule commande distante : chaque section est précédée d'un marqueur
+PROC_FILES = ("stat", "meminfo", "loadavg", "diskstats", "uptime")
+PROC_COMMAND = (
+    "for f in " + " ".join(PROC_FILES) + "; do echo \"@@$f\"; cat /proc/$f; done; "
+    "echo '@@df'; df -h /; echo '@@uptime_cmd'; uptime"
+)
+
+CPU_FIELDS = ("user", "nice", "system", "idle", "iowait", "irq", "softirq", "steal")
+
+# Périphériques sans intérêt pour les E/S disque
+IGNORED_DISK_PREFIXES = ("loop", "ram", "zram", "fd", "sr")
+
+
+def split_sections(raw):
+    """Découpe la sortie de PROC_COMMAND en {section: texte}"""
+    sections = {}
+    current = None
+    lines = []
+    for line in (raw or "").splitlines():
+        if line.startswith("@@"):
+            if current is not None:
+                sections[current] = "\n".join(lines)
+            current = line[2:].strip()
+            lines = []
+        elif current is not None:
+            lines.append(line)
+    if current is not None:
+        sections[current] = "\n".join(lines)
+    return sections
+
+
+def parse_stat(text):
+    """Extrait les compteurs CPU (jiffies) de /proc/stat : {"cpu": [...], "cpu0": [...]}"""
+    counters = {}
+    for line in (text or "").splitlines():
+        if not line.startswith("cpu"):
+            continue
+        parts = line.split()
+        values = [int(v) for v in parts[1:1 + len(CPU_FIELDS)]]
+        values += [0] * (len(CPU_FIELDS) - len(values))
+        counters[parts[0]] = values
+    return counters
+
+
+def parse_meminfo(text):
+    """Convertit /proc/meminfo au format de parse_ram (valeurs en MB)"""
+    info = {}
+    for line in (text or "").splitlines():
+        key, _, value = line.partition(":")
+        parts = value.split()
+        if parts:
+            try:
+                info[key.strip()] = int(parts[0])  # kB
+            except ValueError:
+                continue
+
+    total = info.get("MemTotal", 0)
+    if not total:
+        return {}
+    available = info.get("MemAvailable", info.get("MemFree", 0) + info.get("Buffers", 0) + info.get("Cached", 0))
+    used = total - available
+    swap_total = info.get("SwapTotal", 0)
+    swap_used = swap_total - info.get("SwapFree", 0)
+    return {
+        "total_mb": total // 1024,
+        "used_mb": used // 1024,
+        "free_mb": info.get("MemFree", 0) // 1024,
+        "available_mb": available // 1024,
+        "usage_percent": round((used / total) * 100, 2),
+        "swap_total_mb": swap_total // 1024,
+        "swap_used_mb": swap_used // 1024,
+    }
+
+
+def parse_loadavg(text):
+    """Extrait la charge moyenne de /proc/loadavg"""
+    try:
+        parts = text.split()
+        running, total = parts[3].split("/")
+        return {
+            "1m": float(parts[0]),
+            "5m": float(parts[1]),
+            "15m": float(parts[2]),
+            "running": int(running),
+            "total": int(total),
+        }
+    except (AttributeError, IndexError, ValueError):
+        return {}
+
+
+def parse_diskstats(text):
+    """Extrait secteurs lus/écrits et temps d'E/S (ms) par périphérique"""
+    disks = {}
+    for line in (text or "").splitlines():
+        parts = line.split()
+        if len(parts) < 14:
+            continue
+        name = parts[2]
+        if name.startswith(IGNORED_DISK_PREFIXES):
+            continue
+        disks[name] = {
+            "read_sectors": int(parts[5]),
+            "write_sectors": int(parts[9]),
+            "io_ms": int(parts[12]),
+        }
+    return disks
+
+
+def parse_uptime_seconds(text):
+    try:
+        return float(text.split()[0])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+def cpu_breakdown(prev, cur):
+    """Pourcentages par mode entre deux relevés de compteurs d'un même CPU"""
+    deltas = [max(c - p, 0) for c, p in zip(cur, prev)]
+    total = sum(deltas)
+    if total <= 0:
+        return {"usage": 0.0, "user": 0.0, "system": 0.0, "iowait": 0.0, "steal": 0.0, "idle": 100.0}
+    d = dict(zip(CPU_FIELDS, deltas))
+
+    def pct(value):
+        return round(value * 100.0 / total, 2)
+
+    return {
+        "usage": pct(total - d["idle"] - d["iowait"]),
+        "user": pct(d["user"] + d["nice"]),
+        "system": pct(d["system"] + d["irq"] + d["softirq"]),
+        "iowait": pct(d["iowait"]),
+        "steal": pct(d["steal"]),
+        "idle": pct(d["idle"]),
+    }
+
+
+def disk_rates(prev, cur, elapsed):
+    """Débits (kB/s) et taux d'occupation (%) par disque"""
+    rates = {}
+    for name, counters in cur.items():
+        before = prev.get(name)
+        if not before or elapsed <= 0:
+            continue
+        rates[name] = {
+            "read_kbps": round(max(counters["read_sectors"] - before["read_sectors"], 0) * 0.5 / elapsed, 2),
+            "write_kbps": round(max(counters["write_sectors"] - before["write_sectors"], 0) * 0.5 / elapsed, 2),
+            "util_percent": round(min(max(counters["io_ms"] - before["io_ms"], 0) / (elapsed * 10.0), 100.0), 2),
+        }
+    return rates
+
+
+class ProcDeltaTracker:
+    """Garde le dernier relevé /proc par hôte et calcule les métriques par delta"""
+
+    def __init__(self):
+        self._samples = {}
+        self._lock = Lock()
+
+    def update(self, host, sections):
+        """Intègre un nouveau relevé (sections de PROC_COMMAND) et retourne les métriques"""
+        stat = parse_stat(sections.get("stat"))
+        disks = parse_diskstats(sections.get("diskstats"))
+        clock = parse_uptime_seconds(sections.get("uptime"))
+        if clock is None:
+            clock = time.monotonic()
+
+        with self._lock:
+            previous = self._samples.get(host)
+            self._samples[host] = {"stat": stat, "disks": disks, "clock": clock}
+
+        # Premier relevé (ou redémarrage de l'hôte) : moyenne depuis le boot
+        since_boot = previous is None or clock <= previous["clock"]
+        if since_boot:
+            prev_stat = {name: [0] * len(CPU_FIELDS) for name in stat}
+            elapsed = 0.0
+        else:
+            prev_stat = previous["stat"]
+            elapsed = clock - previous["clock"]
+
+        total = stat.get("cpu")
+        cpu = cpu_breakdown(prev_stat.get("cpu", [0] * len(CPU_FIELDS)), total) if total else {}
+        cores = {
+            name: cpu_breakdown(prev_stat.get(name, [0] * len(CPU_FIELDS)), values)
+            for name, values in stat.items()
+            if name != "cpu"
+        }
+
+        return {
+            "cpu": cpu.get("usage", 0.0),
+            "cpu_detail": {
+                "total": cpu,
+                "cores": cores,
+                "since_boot": since_boot,
+                "interval_seconds": round(elapsed, 2),
+            },
+            "ram": parse_meminfo(sections.get("meminfo")),
+            "load": parse_loadavg(sections.get("loadavg")),
+            "disk_io": {} if since_boot else disk_rates(previous["disks"], disks, elapsed),
+        }
+
+    def forget(self, host=None):
+        with self._lock:
+            if host is None:
+                self._samples.clear()
+            else:
+                self._samples.pop(host, None)
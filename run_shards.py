@@ -0,0 +1,93 @@
+# run_shards.py
+"""Lance N instances de app.py sur une flotte simulée et suit la répartition.
+
+    python run_shards.py --instances 3 --fleet 300 --kill-after 40
+
+Chaque instance écoute sur son port (5050, 5051, …) et s'inscrit dans le
+même registre ; --kill-after arrête la première instance pour observer la
+reprise de ses VMs par les autres.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+def fetch(url, timeout=5):
+    try:
+        with urllib.request.urlopen(url, timeout=timeout) as resp:
+            return json.loads(resp.read().decode())
+    except Exception as e:
+        return {"error": str(e)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--instances", type=int, default=3)
+    parser.add_argument("--fleet", type=int, default=300, help="nombre de VMs simulées")
+    parser.add_argument("--latency", type=float, default=0.2, help="latence simulée par appel (s)")
+    parser.add_argument("--interval", type=int, default=15, help="intervalle de collecte (s)")
+    parser.add_argument("--base-port", type=int, default=5050)
+    parser.add_argument("--duration", type=int, default=90)
+    parser.add_argument("--kill-after", type=int, default=0, help="arrête la première instance après N s")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="vm-shards-")
+    here = os.path.dirname(os.path.abspath(__file__))
+    processes = {}
+    for i in range(args.instances):
+        port = args.base_port + i
+        env = {
+            **os.environ,
+            "SHARD_ID": f"shard-{i}",
+            "SHARD_URL": f"http://127.0.0.1:{port}",
+            "SHARD_REGISTRY": os.path.join(workdir, "shards.db"),
+            "PORT": str(port),
+            "FLASK_DEBUG": "0",
+            "FAKE_FLEET": str(args.fleet),
+            "FAKE_FLEET_LATENCY": str(args.latency),
+            "COLLECT_INTERVAL": str(args.interval),
+            "CHECKPOINT_PATH": "",
+        }
+        env.pop("SHARED_CACHE_PATH", None)
+        log = open(os.path.join(workdir, f"shard-{i}.log"), "w")
+        processes[f"shard-{i}"] = (port, subprocess.Popen([sys.executable, "app.py"], cwd=here, env=env,
+                                                          stdout=log, stderr=subprocess.STDOUT))
+    print(f"📂 Journaux et registre : {workdir}")
+
+    started = time.monotonic()
+    killed = False
+    try:
+        while time.monotonic() - started < args.duration:
+            time.sleep(5)
+            elapsed = int(time.monotonic() - started)
+            if args.kill_after and not killed and elapsed >= args.kill_after:
+                processes["shard-0"][1].terminate()
+                killed = True
+                print(f"💥 shard-0 arrêté à t={elapsed}s")
+            rows = []
+            for name, (port, proc) in processes.items():
+                if proc.poll() is not None:
+                    rows.append(f"{name}: arrêté")
+                    continue
+                stats = fetch(f"http://127.0.0.1:{port}/api/collector/stats").get("collector", {})
+                rows.append(f"{name}: {stats.get('owned')} VMs, cycle {stats.get('last_duration_s')}s, "
+                            f"échecs {stats.get('failed')}")
+            alive = [port for port, proc in processes.values() if proc.poll() is None]
+            merged = fetch(f"http://127.0.0.1:{alive[0]}/api/vms", timeout=15) if alive else {}
+            checked = sum(1 for vm in merged.get("vms", []) if vm.get("last_check"))
+            print(f"t={elapsed:>3}s | " + " | ".join(rows) + f" | /api/vms: {checked}/{merged.get('total')} relevées")
+    finally:
+        for _, proc in processes.values():
+            if proc.poll() is None:
+                proc.terminate()
+        for _, proc in processes.values():
+            proc.wait(timeout=10)
+
+
+if __name__ == "__main__":
+    main()
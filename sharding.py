@@ -0,0 +1,193 @@
+# sharding.py
+"""Répartition de la collecte entre plusieurs instances (hachage cohérent).
+
+Chaque instance s'inscrit dans un registre SQLite local et y envoie un
+battement de cœur ; les instances vivantes forment un anneau de hachage sur
+lequel chaque VM (label) a un seul propriétaire. Quand une instance disparaît,
+ses VMs passent aux suivantes sur l'anneau, sans déplacer les autres.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from shared_cache import VIEWS_SCHEMA, last_view, record_view
+
+logger = logging.getLogger(__name__)
+
+LOCAL_PARAM = "local"   # ?local=1 : réponse de la seule partition de l'instance, sans diffusion
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """Anneau de hachage cohérent avec nœuds virtuels"""
+
+    def __init__(self, members, vnodes=100):
+        self.members = sorted(members)
+        points = sorted((_hash(f"{member}#{i}"), member) for member in self.members for i in range(vnodes))
+        self._keys = [p[0] for p in points]
+        self._owners = [p[1] for p in points]
+
+    def owner(self, label):
+        if not self._keys:
+            return None
+        i = bisect.bisect(self._keys, _hash(label)) % len(self._keys)
+        return self._owners[i]
+
+
+class ShardRegistry:
+    """Instances vivantes (id, url, dernier battement) dans un fichier SQLite partagé"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS members (id TEXT PRIMARY KEY, url TEXT, heartbeat REAL NOT NULL, "
+            "started REAL NOT NULL, info TEXT)"
+        )
+        self._conn().execute(VIEWS_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def heartbeat(self, member_id, url, info=None):
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO members (id, url, heartbeat, started, info) VALUES (?, ?, ?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET url = excluded.url, heartbeat = excluded.heartbeat, info = excluded.info",
+            (member_id, url, now, now, json.dumps(info or {})),
+        )
+
+    def leave(self, member_id):
+        self._conn().execute("DELETE FROM members WHERE id = ?", (member_id,))
+
+    def note_view(self, label, ts):
+        """Consultation d'une VM, visible par l'instance propriétaire (fréquence adaptative)"""
+        record_view(self._conn(), label, ts)
+
+    def last_view(self, label):
+        return last_view(self._conn(), label)
+
+    def alive(self, ttl):
+        rows = self._conn().execute(
+            "SELECT id, url, heartbeat, info FROM members WHERE heartbeat >= ? ORDER BY id", (time.time() - ttl,)
+        ).fetchall()
+        return [{"id": r[0], "url": r[1], "heartbeat": r[2], "info": json.loads(r[3] or "{}")} for r in rows]
+
+
+class ShardCoordinator:
+    """Appartenance de l'instance à l'anneau et diffusion des requêtes à toute la flotte"""
+
+    def __init__(self, registry, member_id, url, heartbeat_interval=5, ttl=15, vnodes=100, query_timeout=5):
+        self.registry = registry
+        self.member_id = member_id
+        self.url = url.rstrip("/") if url else None
+        self.heartbeat_interval = heartbeat_interval
+        self.ttl = ttl
+        self.vnodes = vnodes
+        self.query_timeout = query_timeout
+        self.info = {}                  # publié avec le battement (ex. nombre de VMs possédées)
+        self._members = []
+        self._ring = HashRing([member_id], vnodes)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self.rebalances = 0
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self.beat()
+        self._thread = threading.Thread(target=self._run, name="shard-heartbeat", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.registry.leave(self.member_id)
+        except Exception as e:
+            logger.warning(f"Désinscription de l'instance {self.member_id} échouée: {e}")
+
+    def _run(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self.beat()
+            except Exception as e:
+                logger.warning(f"Battement de cœur échoué pour {self.member_id}: {e}")
+
+    def beat(self):
+        """Battement de cœur puis recalcul de l'anneau si les instances vivantes ont changé"""
+        self.registry.heartbeat(self.member_id, self.url, self.info)
+        members = self.registry.alive(self.ttl)
+        ids = sorted({m["id"] for m in members} | {self.member_id})
+        with self._lock:
+            self._members = members
+            if ids != self._ring.members:
+                logger.info(f"Partition recalculée : {len(ids)} instance(s) {ids}")
+                self._ring = HashRing(ids, self.vnodes)
+                self.rebalances += 1
+
+    def owner(self, label):
+        with self._lock:
+            return self._ring.owner(label)
+
+    def owns(self, label):
+        return self.owner(label) == self.member_id
+
+    def peers(self):
+        """Autres instances vivantes joignables en HTTP"""
+        with self._lock:
+            return [m for m in self._members if m["id"] != self.member_id and m["url"]]
+
+    def fan_out(self, path, params=None):
+        """GET `path?local=1` sur chaque autre instance ; retourne (réponses JSON par id, erreurs par id)"""
+        query = urllib.parse.urlencode({**(params or {}), LOCAL_PARAM: "1"})
+
+        def fetch(member):
+            with urllib.request.urlopen(f"{member['url']}{path}?{query}", timeout=self.query_timeout) as resp:
+                return json.loads(resp.read().decode())
+
+        peers = self.peers()
+        results, errors = {}, {}
+        if not peers:
+            return results, errors
+        with ThreadPoolExecutor(max_workers=min(len(peers), 16)) as pool:
+            futures = {m["id"]: pool.submit(fetch, m) for m in peers}
+            for member_id, future in futures.items():
+                try:
+                    results[member_id] = future.result()
+                except Exception as e:
+                    errors[member_id] = str(e)
+        return results, errors
+
+    def gather(self, path, args, key, local_items):
+        """Éléments `key` de la partition locale complétés par ceux des autres instances"""
+        results, errors = self.fan_out(path, {k: v for k, v in args.items() if k != LOCAL_PARAM})
+        items = list(local_items)
+        for result in results.values():
+            items.extend(result.get(key, []))
+        return items, errors
+
+    def status(self):
+        with self._lock:
+            members = [{"id": m["id"], "url": m["url"], "age_s": round(time.time() - m["heartbeat"], 1), **m["info"]}
+                       for m in self._members]
+        return {"id": self.member_id, "url": self.url, "members": members, "rebalances": self.rebalances,
+                "ttl": self.ttl}
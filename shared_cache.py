@@ -0,0 +1,147 @@
+# shared_cache.py
+"""Cache d'instantanés partagé entre les workers (gunicorn) et élection du collecteur.
+
+Les instantanés (stats VM, stats conteneurs) sont écrits dans un fichier SQLite
+en mode WAL : chaque écriture est atomique et reçoit un numéro de version
+global croissant, ce qui permet à chaque worker de relire uniquement ce qui a
+changé. Un verrou fichier (flock) désigne le seul worker qui interroge la flotte.
+"""
+import fcntl
+import json
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    source TEXT,
+    writer INTEGER,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (kind, label)
+);
+CREATE INDEX IF NOT EXISTS snapshots_version ON snapshots (version);
+-- Compteur de versions : jamais réutilisé, même après suppression d'instantanés
+CREATE TABLE IF NOT EXISTS version_seq (id INTEGER PRIMARY KEY CHECK (id = 0), value INTEGER NOT NULL);
+INSERT OR IGNORE INTO version_seq (id, value) SELECT 0, COALESCE(MAX(version), 0) FROM snapshots;
+"""
+# Dernière consultation de chaque VM, quel que soit le worker ou l'instance qui l'a servie
+VIEWS_SCHEMA = "CREATE TABLE IF NOT EXISTS views (label TEXT PRIMARY KEY, ts REAL NOT NULL)"
+
+
+def record_view(conn, label, ts):
+    conn.execute("INSERT INTO views (label, ts) VALUES (?, ?) "
+                 "ON CONFLICT(label) DO UPDATE SET ts = MAX(ts, excluded.ts)", (label, ts))
+
+
+def last_view(conn, label):
+    row = conn.execute("SELECT ts FROM views WHERE label = ?", (label,)).fetchone()
+    return row[0] if row else None
+
+
+class SnapshotStore:
+    """Instantanés versionnés (kind, label) -> données JSON, dans un fichier SQLite"""
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+        self._conn().execute(VIEWS_SCHEMA)
+
+    def _conn(self):
+        # Une connexion par thread ; WAL : les lectures ne bloquent pas l'écrivain
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def put(self, kind, label, data, ts, source=None):
+        """Écriture atomique ; retourne la nouvelle version"""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE version_seq SET value = value + 1 WHERE id = 0")
+            version = conn.execute("SELECT value FROM version_seq WHERE id = 0").fetchone()[0]
+            conn.execute(
+                "INSERT OR REPLACE INTO snapshots (kind, label, version, ts, source, writer, payload) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (kind, label, version, ts, source, os.getpid(), json.dumps(data)),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return version
+
+    def get(self, kind, label):
+        row = self._conn().execute(
+            "SELECT version, ts, source, payload FROM snapshots WHERE kind = ? AND label = ?", (kind, label)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"version": row[0], "ts": row[1], "source": row[2], "data": json.loads(row[3])}
+
+    def delete(self, kind, label):
+        self._conn().execute("DELETE FROM snapshots WHERE kind = ? AND label = ?", (kind, label))
+
+    def changed_since(self, version):
+        """Instantanés écrits après `version` : [(kind, label, version, ts, source, writer, data)]"""
+        rows = self._conn().execute(
+            "SELECT kind, label, version, ts, source, writer, payload FROM snapshots "
+            "WHERE version > ? ORDER BY version", (version,)
+        ).fetchall()
+        return [(*row[:6], json.loads(row[6])) for row in rows]
+
+    def note_view(self, label, ts):
+        record_view(self._conn(), label, ts)
+
+    def last_view(self, label):
+        return last_view(self._conn(), label)
+
+    def info(self):
+        count, version = self._conn().execute(
+            "SELECT (SELECT COUNT(*) FROM snapshots), (SELECT value FROM version_seq WHERE id = 0)").fetchone()
+        return {"path": self.path, "snapshots": count, "version": version}
+
+
+class LeaderLock:
+    """Verrou exclusif non bloquant sur un fichier : libéré par le noyau si le worker meurt"""
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+        self.acquired_at = None
+
+    @property
+    def is_leader(self):
+        return self._fd is not None
+
+    def try_acquire(self):
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._fd = fd
+        self.acquired_at = time.time()
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
+            self.acquired_at = None
@@ -0,0 +1,259 @@
+# stats_stream.py
+"""Échantillonnage continu de `docker stats` par VM.
+
+Un seul processus `docker stats` (mode flux) tourne par VM sur une connexion
+SSH gardée ouverte ; les trames sont lues au fil de l'eau et les N derniers
+échantillons de chaque conteneur sont conservés. Une demande de stats lit
+donc la mémoire au lieu de relancer `docker stats --no-stream` (~2 s).
+"""
+import json
+import logging
+import re
+import socket
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+from admission import BACKGROUND
+
+logger = logging.getLogger(__name__)
+
+STATS_STREAM_COMMAND = "sudo docker stats --format '{{json .}}'"
+PS_COMMAND = "sudo docker ps --format '{{json .}}'"
+# docker efface l'écran entre deux trames quand il n'a pas de terminal
+CLEAR_SCREEN = "\x1b[2J"
+ANSI_RE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+
+
+def _exec(transport, command, timeout=15):
+    """Commande courte sur un nouveau canal de la connexion existante"""
+    channel = transport.open_session()
+    channel.settimeout(timeout)
+    channel.exec_command(command)
+    chunks = []
+    while True:
+        data = channel.recv(65536)
+        if not data:
+            break
+        chunks.append(data)
+    channel.close()
+    return b"".join(chunks).decode(errors="replace")
+
+
+class DockerStatsStream:
+    """Flux `docker stats` d'une VM, avec un tampon circulaire par conteneur"""
+
+    def __init__(self, label, connect, max_samples=60, stale_after=10, idle_timeout=300, admission=None):
+        self.label = label
+        self.connect = connect              # label -> paramiko.SSHClient connecté
+        # Ouverture du flux et `docker ps` passent par la file de la VM, pas la lecture continue
+        self.admission = admission
+        self.max_samples = max_samples
+        self.stale_after = stale_after
+        self.idle_timeout = idle_timeout
+        self._samples = {}                  # nom -> deque[(ts, échantillon)]
+        self._metadata = {}                 # nom -> ligne `docker ps`
+        self._lock = threading.Lock()
+        self._first_frame = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_access = time.monotonic()
+        self.frames = 0
+        self.reconnects = 0
+        self.error = None
+
+    # --- cycle de vie ---------------------------------------------------
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name=f"docker-stats-{self.label}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def _run(self):
+        backoff = 1
+        while not self._stop.is_set():
+            try:
+                self._stream()
+                backoff = 1
+            except Exception as e:
+                self.error = str(e)
+                logger.warning(f"Flux docker stats interrompu pour {self.label}: {e}")
+            # Plus de données fraîches : les lecteurs repassent par --no-stream jusqu'à la prochaine trame
+            self._first_frame.clear()
+            if self._stop.is_set() or time.monotonic() - self.last_access > self.idle_timeout:
+                break
+            self.reconnects += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, 60)
+        logger.info(f"Flux docker stats arrêté pour {self.label}")
+
+    def _slot(self):
+        if self.admission is None:
+            return nullcontext()
+        return self.admission.slot(self.label, BACKGROUND)
+
+    def _stream(self):
+        # La place n'est tenue que pour la connexion et le lancement : un flux ouvert n'occupe
+        # pas durablement la file (sinon `docker ps` attendrait derrière son propre flux)
+        with self._slot():
+            ssh = self.connect(self.label)
+            try:
+                transport = ssh.get_transport()
+                channel = transport.open_session()
+                channel.settimeout(5)
+                channel.exec_command(STATS_STREAM_COMMAND)
+            except Exception:
+                ssh.close()
+                raise
+        try:
+            buffer, tail, clears = "", "", 0
+            while not self._stop.is_set():
+                # Personne ne lit ces stats depuis longtemps : on libère la connexion
+                if time.monotonic() - self.last_access > self.idle_timeout:
+                    return
+                try:
+                    data = channel.recv(65536)
+                except socket.timeout:
+                    # Délai de lecture dépassé : on revérifie l'arrêt et l'inactivité
+                    continue
+                if not data:
+                    raise ConnectionError(f"docker stats terminé (code {channel.recv_exit_status()})")
+                text = data.decode(errors="replace")
+                # Un effacement d'écran ouvre chaque trame : au deuxième, la première trame est complète
+                clears += (tail + text).count(CLEAR_SCREEN)
+                tail = text[-(len(CLEAR_SCREEN) - 1):]
+                buffer += ANSI_RE.sub("", text)
+                *lines, buffer = buffer.split("\n")
+                self._ingest(lines, transport, frame_complete=clears >= 2)
+        finally:
+            ssh.close()
+
+    # --- lecture des trames --------------------------------------------
+
+    def _ingest(self, lines, transport, frame_complete=True):
+        now = time.time()
+        new_names = False
+        with self._lock:
+            for line in lines:
+                line = line.strip()
+                if not line.startswith("{"):
+                    continue
+                try:
+                    sample = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                name = sample.get("Name") or sample.get("Container")
+                if name not in self._samples:
+                    self._samples[name] = deque(maxlen=self.max_samples)
+                    new_names = True
+                self._samples[name].append((now, sample))
+                self.frames += 1
+            # Conteneurs disparus du flux
+            for name in [n for n, s in self._samples.items() if now - s[-1][0] > self.stale_after]:
+                del self._samples[name]
+                self._metadata.pop(name, None)
+
+        if new_names:
+            # Image et projet compose des nouveaux conteneurs, sur la même connexion
+            try:
+                metadata = {}
+                with self._slot():
+                    output = _exec(transport, PS_COMMAND)
+                for line in output.splitlines():
+                    try:
+                        container = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    metadata[container.get("Names")] = container
+                with self._lock:
+                    self._metadata.update(metadata)
+            except Exception as e:
+                logger.warning(f"Métadonnées conteneurs indisponibles pour {self.label}: {e}")
+        # Prêt après une trame entière (une VM sans conteneur actif n'envoie que des effacements d'écran)
+        if frame_complete:
+            self._first_frame.set()
+
+    def latest(self, wait=0, touch=True):
+        """Dernier échantillon de chaque conteneur (attend au plus `wait` s la première trame).
+
+        touch=False (collecte de fond) : la lecture ne repousse pas l'arrêt pour inactivité.
+        """
+        if touch:
+            self.last_access = time.monotonic()
+        if wait and not self._first_frame.is_set():
+            self._first_frame.wait(wait)
+        now = time.time()
+        with self._lock:
+            return [
+                {**samples[-1][1], "_ts": samples[-1][0], "_metadata": self._metadata.get(name, {})}
+                for name, samples in self._samples.items()
+                if now - samples[-1][0] <= self.stale_after
+            ]
+
+    def history(self, container):
+        self.last_access = time.monotonic()
+        with self._lock:
+            return [(ts, dict(sample)) for ts, sample in self._samples.get(container, ())]
+
+    @property
+    def ready(self):
+        return self._first_frame.is_set()
+
+    def info(self):
+        with self._lock:
+            containers = len(self._samples)
+        return {"running": self.running, "ready": self.ready, "containers": containers, "frames": self.frames,
+                "reconnects": self.reconnects, "error": self.error,
+                "idle_seconds": round(time.monotonic() - self.last_access, 1)}
+
+
+class StatsStreamPool:
+    """Un flux par VM, démarré à la première demande et arrêté après inactivité"""
+
+    def __init__(self, connect, max_samples=60, idle_timeout=300, admission=None):
+        self.connect = connect
+        self.max_samples = max_samples
+        self.idle_timeout = idle_timeout
+        self.admission = admission
+        self._streams = {}
+        self._lock = threading.Lock()
+
+    def get(self, label, create=True):
+        """Flux de la VM ; create=False : None si aucun flux ne tourne déjà"""
+        with self._lock:
+            stream = self._streams.get(label)
+            if stream is None or not stream.running:
+                if not create:
+                    return None
+                stream = DockerStatsStream(label, self.connect, self.max_samples, idle_timeout=self.idle_timeout,
+                                           admission=self.admission)
+                self._streams[label] = stream
+                stream.start()
+            return stream
+
+    def stop(self, label):
+        with self._lock:
+            stream = self._streams.pop(label, None)
+        if stream:
+            stream.stop()
+
+    def stop_all(self):
+        with self._lock:
+            streams, self._streams = list(self._streams.values()), {}
+        for stream in streams:
+            stream.stop()
+
+    def info(self):
+        with self._lock:
+            streams = dict(self._streams)
+        return {label: stream.info() for label, stream in streams.items()}
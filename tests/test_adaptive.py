@@ -0,0 +1,54 @@
+# tests/test_adaptive.py
+"""Intervalle adaptatif des sondes"""
+from adaptive import AdaptiveScheduler
+from metrics_history import MetricsHistory
+
+
+def _history(cpu_values, container_values=()):
+    history = MetricsHistory()
+    for i, value in enumerate(cpu_values):
+        history.record("vm1", "cpu", value, ts=i)
+    for i, value in enumerate(container_values):
+        history.record("vm1", "cpu_percent", value, ts=i, container="web")
+    return history
+
+
+def test_target_spans_bounds():
+    scheduler = AdaptiveScheduler(min_interval=15, max_interval=300)
+    assert scheduler._target(0.0) == 300
+    assert scheduler._target(1.0) == 15
+    assert scheduler._target(0.5) == 157.5
+
+
+def test_calm_host_slows_down_progressively():
+    scheduler = AdaptiveScheduler(base_interval=60, min_interval=15, max_interval=300, growth=1.5)
+    history = _history([5.0] * 10)
+    intervals = []
+    for step in range(5):
+        scheduler.update("vm1", "host", history, now=step)
+        intervals.append(scheduler._probes[("vm1", "host")]["interval"])
+    assert intervals == [90.0, 135.0, 202.5, 300.0, 300.0]
+    assert scheduler._probes[("vm1", "host")]["next"] == 4 + 300.0
+
+
+def test_volatility_threshold_and_view_speed_up_immediately():
+    scheduler = AdaptiveScheduler(base_interval=60, min_interval=15, max_interval=300)
+    scheduler.update("vm1", "host", _history([5.0, 40.0, 5.0, 40.0]), now=0)
+    state = scheduler._probes[("vm1", "host")]
+    assert (state["interval"], state["reason"]) == (15, "variance:cpu")
+
+    scheduler.update("vm1", "containers", _history([], [79.0] * 5), containers=["web"], now=0)
+    state = scheduler._probes[("vm1", "containers")]
+    assert state["reason"] == "threshold:cpu_percent" and state["interval"] < 30
+
+    scheduler.update("vm2", "host", _history([5.0] * 10), viewed=True, now=0)
+    assert scheduler._probes[("vm2", "host")]["reason"] == "dashboard"
+    assert scheduler._probes[("vm2", "host")]["interval"] == 15
+
+
+def test_due_forgets_removed_vms():
+    scheduler = AdaptiveScheduler()
+    scheduler.update("vm1", "host", _history([5.0] * 10), now=0)
+    assert scheduler.due(["vm1", "vm2"], now=1) == {"vm1": ["containers"], "vm2": ["host", "containers"]}
+    scheduler.due(["vm2"], now=1)
+    assert ("vm1", "host") not in scheduler._probes
@@ -0,0 +1,54 @@
+# tests/test_admission.py
+"""Ordre d'admission des commandes distantes par priorité"""
+import threading
+import time
+
+import pytest
+
+from admission import BACKGROUND, INTERACTIVE, NORMAL, AdmissionController, AdmissionTimeout
+
+
+def _wait_queued(controller, host, count):
+    deadline = time.monotonic() + 5
+    while controller.info()["hosts"][host]["queued"] < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def test_freed_slot_goes_to_highest_priority():
+    controller = AdmissionController(max_concurrent=1, timeout=5)
+    order = []
+
+    def run(name, priority):
+        with controller.slot("vm1", priority):
+            order.append(name)
+
+    with controller.slot("vm1", NORMAL):
+        threads = []
+        for i, (name, priority) in enumerate([("collecte", BACKGROUND), ("tableau", NORMAL),
+                                              ("stop", INTERACTIVE), ("collecte-2", BACKGROUND)]):
+            thread = threading.Thread(target=run, args=(name, priority))
+            thread.start()
+            threads.append(thread)
+            _wait_queued(controller, "vm1", i + 1)
+    for thread in threads:
+        thread.join(5)
+
+    # Priorité d'abord, ordre d'arrivée ensuite
+    assert order == ["stop", "tableau", "collecte", "collecte-2"]
+    info = controller.info()["hosts"]["vm1"]
+    assert (info["active"], info["queued"], info["admitted"]) == (0, 0, 5)
+
+
+def test_thread_priority_and_timeout():
+    controller = AdmissionController(max_concurrent=1, timeout=0.05)
+    with controller.priority(INTERACTIVE):
+        assert controller.current_priority() == INTERACTIVE
+        with controller.slot("vm1"):
+            with pytest.raises(AdmissionTimeout):
+                with controller.slot("vm1"):
+                    pass
+    assert controller.current_priority() == NORMAL
+    info = controller.info()["hosts"]["vm1"]
+    assert (info["active"], info["queued"], info["timeouts"]) == (0, 0, 1)
+    assert info["by_priority"]["interactive"]["admitted"] == 1
@@ -0,0 +1,28 @@
+# tests/test_ann.py
+"""Paramètres des index FAISS selon la taille du corpus"""
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("langchain_community")
+
+from chatbot.utils.ann import build_index, factory_string  # noqa: E402
+
+
+@pytest.mark.parametrize("n_vectors, expected", [
+    (150, "Flat"),                      # corpus actuel (~150 chunks)
+    (623, "Flat"),
+    (624, "IVF16,PQ96x4"),              # 39·2^4 points d'entraînement
+    (10_000, "IVF256,PQ96x8"),
+    (1_000_000, "IVF4000,PQ96x8"),
+])
+def test_ivfpq_bits_follow_training_size(n_vectors, expected):
+    assert factory_string("ivfpq", 384, n_vectors) == expected
+
+
+def test_small_corpus_builds_exact_index():
+    vectors = np.random.default_rng(0).standard_normal((150, 32)).astype(np.float32)
+    index = build_index("ivfpq", vectors)
+    index.add(vectors)
+    _, ids = index.search(vectors[:5], 1)
+    assert ids[:, 0].tolist() == list(range(5))
@@ -0,0 +1,57 @@
+# tests/test_anomaly.py
+"""Scores z par série et cycle de vie des séries de conteneurs"""
+import time
+
+from alerts.anomaly import AnomalyDetector
+from fleet_index import FleetIndex
+from metrics_history import MetricsHistory
+
+
+def _feed(detector, history, container, values, start):
+    for i, value in enumerate(values):
+        history.record("vm1", "cpu_percent", value, ts=start + i, container=container)
+        detector.update(history)
+
+
+def _spiking_detector(start):
+    detector = AnomalyDetector(min_samples=5, stale_after=60, metrics=("cpu_percent",))
+    history = MetricsHistory()
+    _feed(detector, history, "web", [10.0] * 10 + [90.0], start)
+    return detector, history
+
+
+def test_spike_is_reported_until_series_goes_stale():
+    detector, _ = _spiking_detector(time.time() - 11)
+    assert [a["container"] for a in detector.anomalies()] == ["web"]
+
+    detector, _ = _spiking_detector(time.time() - 600)
+    assert detector.anomalies() == []
+
+
+def test_forget_releases_and_reuses_series():
+    detector, history = _spiking_detector(time.time() - 11)
+    detector.forget("vm1", {"web"})
+    assert detector.anomalies() == []
+    assert detector.info()["series"] == 0
+
+    # Conteneur recréé sous le même nom : nouvelle période de chauffe, même emplacement
+    history.drop("vm1", "web")
+    _feed(detector, history, "web", [10.0, 90.0], time.time() - 2)
+    assert detector.anomalies() == []
+    assert len(detector._keys) == 1
+
+
+def test_series_dropped_from_history_are_released():
+    detector, history = _spiking_detector(time.time() - 11)
+    history.drop("vm1", "web")
+    detector.update(history)
+    assert detector.info()["series"] == 0
+    assert detector.anomalies() == []
+
+
+def test_fleet_index_reports_removed_and_recreated_containers():
+    index = FleetIndex()
+    assert index.ingest_vm("vm1", [{"Name": "web", "ID": "a1"}, {"Name": "db", "ID": "b1"}]) == set()
+    assert index.ingest_vm("vm1", [{"Name": "web", "ID": "a2"}]) == {"web", "db"}
+    # Sans identifiant (agents), seule la disparition compte
+    assert index.ingest_vm("vm1", [{"Container": "web"}]) == set()
@@ -0,0 +1,65 @@
+# tests/test_embedding_cache.py
+"""Cache disque des embeddings partagé entre processus"""
+import hashlib
+import multiprocessing
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from chatbot.utils.embedding_cache import CachedEmbeddings  # noqa: E402
+
+
+def _vector(text):
+    return [b / 255 for b in hashlib.sha256(text.encode()).digest()[:8]]
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return [_vector(t) for t in texts]
+
+    def embed_query(self, text):
+        self.calls += 1
+        return _vector(text)
+
+
+def _writer(cache_dir, tag):
+    cache = CachedEmbeddings(FakeModel(), "fake", cache_dir=cache_dir, batch_size=7, initial_rows=16)
+    for i in range(40):
+        texts = [f"{tag}-{i}-{j}" for j in range(5)] + [f"shared-{i}"]
+        assert np.allclose(cache.embed_documents(texts), [_vector(t) for t in texts], atol=1e-6)
+        cache.embed_query(f"question {tag} {i}")
+
+
+def test_concurrent_writers_keep_keys_and_rows_aligned(tmp_path):
+    ctx = multiprocessing.get_context("fork")
+    writers = [ctx.Process(target=_writer, args=(str(tmp_path), tag)) for tag in "ab"]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join(60)
+        assert writer.exitcode == 0
+
+    model = FakeModel()
+    cache = CachedEmbeddings(model, "fake", cache_dir=str(tmp_path))
+    texts = [f"{tag}-{i}-{j}" for tag in "ab" for i in range(40) for j in range(5)]
+    texts += [f"shared-{i}" for i in range(40)]
+    assert np.allclose(cache.embed_documents(texts), [_vector(t) for t in texts], atol=1e-6)
+    assert model.calls == 0
+    # Les requêtes ne sont pas persistées
+    assert cache.stats()["rows"] == len(texts)
+
+
+def test_query_embeddings_are_bounded(tmp_path):
+    model = FakeModel()
+    cache = CachedEmbeddings(model, "fake", cache_dir=str(tmp_path), max_queries=3)
+    for i in range(10):
+        assert np.allclose(cache.embed_query(f"q{i}"), _vector(f"q{i}"), atol=1e-6)
+    assert cache.stats()["queries"] == 3
+    cache.embed_query("q9")
+    assert model.calls == 10
@@ -0,0 +1,45 @@
+# tests/test_forecast.py
+"""Alignement des séries et prévision de saturation"""
+import time
+
+import numpy as np
+
+from alerts.forecast import Forecaster, build_matrix
+from metrics_history import MetricsHistory
+
+
+def test_build_matrix_right_aligns_window_points():
+    now = 10_000.0
+    series = {
+        "a": [(now - 7200, 1.0), (now - 1800, 2.0), (now - 600, 3.0)],
+        "b": [(now - 300, 5.0)],
+        "c": [],
+    }
+    keys, t, y, mask = build_matrix(series, window_seconds=3600, now=now)
+    assert keys == ["a", "b", "c"]
+    assert t.shape == (3, 3)
+    # Point hors fenêtre ignoré, points restants alignés à droite
+    assert mask.tolist() == [[False, True, True], [False, False, True], [False, False, False]]
+    assert y[0, 1:].tolist() == [2.0, 3.0]
+    assert np.allclose(t[0, 1:], [-0.5, -1 / 6])
+
+
+def test_build_matrix_keeps_last_points():
+    now = 1_000.0
+    series = {"a": [(now - 10 * i, float(i)) for i in range(10, 0, -1)]}
+    _, _, y, mask = build_matrix(series, window_seconds=3600, now=now, max_points=4)
+    assert mask.all()
+    assert y[0].tolist() == [4.0, 3.0, 2.0, 1.0]
+
+
+def test_nearly_flat_series_has_no_eta():
+    now = time.time()
+    history = MetricsHistory()
+    for i in range(20):
+        # Pente à peine au-dessus du seuil : saturation dans des milliers d'années
+        history.record("vm1", "disk_percent", 10 + 1.1e-6 * i * 300 / 3600, ts=now - (20 - i) * 300)
+        history.record("vm2", "disk_percent", 50 + i, ts=now - (20 - i) * 300)
+    forecaster = Forecaster()
+    forecaster.update(history)
+    assert forecaster.get_vm_forecasts("vm1")[0]["eta"] is None
+    assert forecaster.get_vm_forecasts("vm2")[0]["eta_hours"] == 2.5
@@ -0,0 +1,27 @@
+# tests/test_ingest.py
+"""Protocole ligne agent -> service"""
+from ingest import format_line, parse_lines
+
+
+def test_round_trip_with_escaped_tags():
+    line = format_line("container", {"vm": "vm 1", "name": "web,1", "image": "a=b"},
+                       {"cpu_percent": 12.5, "mem_percent": None}, 1_700_000_000_000_000_000)
+    points, errors = parse_lines(line)
+    assert errors == 0
+    assert points == [("container", {"vm": "vm 1", "name": "web,1", "image": "a=b"},
+                       {"cpu_percent": 12.5}, 1_700_000_000.0)]
+
+
+def test_invalid_lines_are_counted_and_skipped():
+    body = "\n".join([
+        "# commentaire",
+        "",
+        "host,vm=vm1 cpu=3.5,load1=0.2 1000000000",
+        "host,vm=vm1 cpu=abc 1000000000",          # valeur non numérique
+        "host,vm=vm1 cpu=1",                        # horodatage manquant
+        "mem,vm=vm1 usage_percent=40 2000000000",
+    ])
+    points, errors = parse_lines(body)
+    assert errors == 2
+    assert [(p[0], p[3]) for p in points] == [("host", 1.0), ("mem", 2.0)]
+    assert points[0][2] == {"cpu": 3.5, "load1": 0.2}
@@ -0,0 +1,54 @@
+# tests/test_listing.py
+"""Filtres, tri et pagination par curseur des listes Docker"""
+import pytest
+
+from listing import apply_listing, decode_cursor, encode_cursor
+
+CONTAINERS = [
+    {"ID": f"c{i:02d}", "Names": f"app-{i % 3}-{i}", "State": "running" if i % 2 else "exited",
+     "Image": "nginx" if i % 3 == 0 else "redis", "Size": f"{i}MB"}
+    for i in range(10)
+]
+
+
+def _pages(args):
+    cursor, pages = None, []
+    while True:
+        page, meta = apply_listing(CONTAINERS, dict(args, cursor=cursor))
+        pages.append(page)
+        cursor = meta["next_cursor"]
+        if cursor is None:
+            return pages, meta
+
+
+def test_cursor_pages_cover_the_list_once():
+    pages, meta = _pages({"limit": "3", "sort": "-Size"})
+    assert [len(p) for p in pages] == [3, 3, 3, 1]
+    ids = [item["ID"] for page in pages for item in page]
+    # Tailles comparées numériquement, ordre décroissant
+    assert ids == [f"c{i:02d}" for i in range(9, -1, -1)]
+    assert meta["total"] == 10
+
+
+def test_filters_and_projection():
+    page, meta = apply_listing(CONTAINERS, {"state": "running", "image": "NGINX", "fields": "ID,State"})
+    assert page == [{"ID": "c03", "State": "running"}, {"ID": "c09", "State": "running"}]
+    assert meta["next_cursor"] is None
+
+
+def test_cursor_from_another_sort_is_rejected():
+    _, meta = apply_listing(CONTAINERS, {"limit": "2", "sort": "Names"})
+    with pytest.raises(ValueError):
+        apply_listing(CONTAINERS, {"cursor": meta["next_cursor"], "sort": "-Names"})
+
+
+@pytest.mark.parametrize("cursor", [
+    "pas-un-curseur",
+    encode_cursor(["Names", 1]),
+    encode_cursor({"sort": "Names", "value": [1, 2], "id": "c01"}),
+    encode_cursor({"sort": "Names", "value": [0, True], "id": "c01"}),
+    encode_cursor({"sort": "Names", "value": [1, "a"]}),
+])
+def test_malformed_cursors_are_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
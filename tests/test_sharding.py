@@ -0,0 +1,74 @@
+# tests/test_sharding.py
+"""Répartition de la collecte entre instances sur une flotte simulée.
+
+Trois instances (moniteur FakeFleet + collecteur + coordinateur) partagent un
+registre SQLite : chaque VM doit être collectée par une seule instance, puis
+reprise par les survivantes quand une instance cesse ses battements de cœur.
+"""
+import time
+
+import pytest
+
+from collector import Collector
+from fake_fleet import FakeFleet, FakeFleetMonitor
+from sharding import ShardCoordinator, ShardRegistry
+
+FLEET_SIZE = 60
+TTL = 0.5
+
+
+@pytest.fixture
+def instances(tmp_path, monkeypatch):
+    monkeypatch.setenv("CHECKPOINT_PATH", "")
+    monkeypatch.delenv("SHARED_CACHE_PATH", raising=False)
+    registry_path = str(tmp_path / "shards.db")
+    result = []
+    for i in range(3):
+        monitor = FakeFleetMonitor(FakeFleet(FLEET_SIZE, latency=0, containers=2))
+        shard = ShardCoordinator(ShardRegistry(registry_path), f"shard-{i}", f"http://127.0.0.1:{6000 + i}",
+                                 heartbeat_interval=0.1, ttl=TTL)
+        result.append(Collector(monitor, interval=1, max_workers=4, shard=shard))
+    return result
+
+
+def _collect(collectors):
+    """Un battement puis un cycle par instance ; retourne les VMs relevées par chacune"""
+    for collector in collectors:
+        collector.shard.beat()
+    for collector in collectors:
+        collector.shard.beat()      # toutes les instances voient le même anneau
+        collector.monitor.vm_stats_cache.clear()
+        collector.run_cycle()
+    return {collector.shard.member_id: set(collector.monitor.vm_stats_cache) for collector in collectors}
+
+
+def _assert_partition(owned):
+    labels = [label for vms in owned.values() for label in vms]
+    assert len(labels) == len(set(labels)), "VM collectée par plusieurs instances"
+    assert set(labels) == set(FakeFleet(FLEET_SIZE).labels()), "VM collectée par aucune instance"
+
+
+def test_partition_is_disjoint_and_complete(instances):
+    owned = _collect(instances)
+    _assert_partition(owned)
+    assert all(owned.values()), "instance sans VM"
+    for collector in instances:
+        assert collector.stats["owned"] == len(owned[collector.shard.member_id])
+
+
+def test_survivors_take_over_after_ttl(instances):
+    before = _collect(instances)
+    # Arrêt brutal : plus de battement ni de désinscription
+    dead, survivors = instances[0], instances[1:]
+
+    # Avant l'expiration du TTL, les VMs de l'instance arrêtée ne sont pas prises
+    owned = _collect(survivors)
+    assert not any(vms & before[dead.shard.member_id] for vms in owned.values())
+
+    time.sleep(TTL + 0.2)
+    owned = _collect(survivors)
+    _assert_partition(owned)
+    # Hachage cohérent : les VMs des survivantes ne changent pas de propriétaire
+    for collector in survivors:
+        member_id = collector.shard.member_id
+        assert before[member_id] <= owned[member_id]
@@ -0,0 +1,30 @@
+# tests/test_shared_cache.py
+"""Versions des instantanés partagés entre workers"""
+import sqlite3
+
+from shared_cache import SnapshotStore
+
+
+def test_versions_are_not_reused_after_delete(tmp_path):
+    store = SnapshotStore(str(tmp_path / "cache.db"))
+    store.put("vm", "vm1", {"cpu": 1}, ts=1.0)
+    seen = store.put("containers", "vm2", [], ts=1.0, source="agent")
+    store.delete("containers", "vm2")
+
+    # Un worker déjà à jour (version `seen`) doit voir l'écriture suivante
+    version = store.put("vm", "vm3", {"cpu": 3}, ts=2.0)
+    assert version > seen
+    assert [row[:3] for row in store.changed_since(seen)] == [("vm", "vm3", version)]
+    assert store.info()["version"] == version
+
+
+def test_counter_starts_after_existing_versions(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE snapshots (kind TEXT NOT NULL, label TEXT NOT NULL, version INTEGER NOT NULL, "
+                 "ts REAL NOT NULL, source TEXT, writer INTEGER, payload TEXT NOT NULL, PRIMARY KEY (kind, label))")
+    conn.execute("INSERT INTO snapshots VALUES ('vm', 'vm1', 7, 1.0, NULL, NULL, '{}')")
+    conn.commit()
+    conn.close()
+
+    assert SnapshotStore(path).put("vm", "vm2", {}, ts=2.0) == 8
@@ -2,11 +2,23 @@ import re
 import os
 import io
 import json
+import shlex
 import paramiko
 import logging
 import mysql.connector
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
+from queue import Queue
 from threading import Lock
+from proc_metrics import PROC_COMMAND, ProcDeltaTracker, split_sections
+from metrics_history import MetricsHistory
+from fleet_index import FleetIndex, compose_project
+from intents import dispatch as dispatch_intent
+from stats_stream import StatsStreamPool
+from image_index import IMAGE_INVENTORY_COMMAND, FleetImageIndex, parse_image_inventory
+from shared_cache import SnapshotStore
+import checkpoint
+from admission import BACKGROUND, INTERACTIVE, AdmissionController, AdmissionTimeout
 
 DB_CONFIG = {
     "host": "127.0.0.1",
@@ -19,11 +31,83 @@ DB_CONFIG = {
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+AGENT_REMOTE_DIR = ".vm-monitor-agent"
+# Le motif [m] évite que pkill ne tue le shell qui exécute la commande
+AGENT_STOP_COMMAND = "(sudo -n pkill -f '[m]onitoring_agent.py' || pkill -f '[m]onitoring_agent.py') 2>/dev/null"
+CONTAINER_ACTIONS = ("start", "stop", "restart")
+# Mêmes ensembles qu'avant l'inventaire : `docker ps` (actifs) et `docker ps -a` moins `docker ps` (arrêtés)
+CONTAINER_STATE_GROUPS = {
+    "running": ("running", "paused", "restarting"),
+    "stopped": ("exited", "created", "dead"),
+}
+
+# Découverte Joget en un aller-retour : conteneurs joget puis, pour chacun, les projets de app_src.
+# La sonde ne lit que les mtimes ; l'inventaire complet ajoute la taille (du) de chaque projet.
+JOGET_APP_DIR = "/opt/joget/wflow/app_src"
+_JOGET_EACH_CONTAINER = ("sudo docker ps --format '{{.ID}} {{.Names}}' | grep -i joget | "
+                         "while read id name; do echo \"@@container $id $name\"; "
+                         "sudo docker exec \"$id\" sh -c '%s' </dev/null 2>/dev/null; done; true")
+JOGET_PROBE_COMMAND = _JOGET_EACH_CONTAINER % (
+    f"cd {JOGET_APP_DIR} 2>/dev/null && for p in *; do [ -e \"$p\" ] && echo \"$(stat -c %Y \"$p\") - $p\"; done")
+JOGET_SCAN_COMMAND = _JOGET_EACH_CONTAINER % (
+    f"cd {JOGET_APP_DIR} 2>/dev/null && for p in *; do [ -e \"$p\" ] && "
+    f"echo \"$(stat -c %Y \"$p\") $(du -sk \"$p\" | cut -f1) $p\"; done")
+
 class VMMonitor:
     def __init__(self):
         self.vm_stats_cache = {}
         self.cache_lock = Lock()
         self.CACHE_DURATION = timedelta(minutes=5)
+        self.proc_tracker = ProcDeltaTracker()
+        self.history = MetricsHistory()
+        self.container_stats_cache = {}
+        self.fleet_index = FleetIndex()
+        # Appelés avec (label, noms) quand des conteneurs disparaissent ou sont recréés
+        self.container_removed_hooks = []
+        self.joget_cache = {}
+        self.image_index = FleetImageIndex()
+        # Inventaire `docker ps -a` / `docker images` par VM, base des listes paginées
+        self.inventory_cache = {}
+        self.INVENTORY_TTL = timedelta(seconds=int(os.getenv("INVENTORY_TTL", 30)))
+        self.IMAGE_INDEX_TTL = timedelta(seconds=int(os.getenv("IMAGE_INDEX_TTL", 600)))
+        # Commandes SSH simultanées par VM, les actions interactives passent en tête de file
+        self.admission = AdmissionController(
+            max_concurrent=int(os.getenv("HOST_MAX_COMMANDS", 3)),
+            timeout=float(os.getenv("HOST_ADMISSION_TIMEOUT", 60)),
+        )
+        # Flux `docker stats` continu par VM (STATS_STREAM=0 : retour au --no-stream)
+        self.STATS_STREAM = os.getenv("STATS_STREAM", "1") == "1"
+        self.stats_streams = StatsStreamPool(
+            self._connect_by_label,
+            max_samples=int(os.getenv("STATS_STREAM_SAMPLES", 60)),
+            idle_timeout=int(os.getenv("STATS_STREAM_IDLE", 300)),
+            admission=self.admission,
+        )
+        self.JOGET_CACHE_TTL = timedelta(seconds=int(os.getenv("JOGET_CACHE_TTL", 60)))
+        # Données poussées par un agent considérées fraîches pendant ce délai
+        self.AGENT_STALE_AFTER = timedelta(seconds=int(os.getenv("AGENT_STALE_AFTER", 30)))
+        # Plusieurs workers (gunicorn) : instantanés partagés via SQLite, un seul collecteur élu
+        shared_path = os.getenv("SHARED_CACHE_PATH")
+        self.shared_store = SnapshotStore(shared_path) if shared_path else None
+        self.SHARED_STALE_AFTER = timedelta(seconds=int(os.getenv("SHARED_STALE_AFTER", 120)))
+        self.role = "standalone"        # standalone | leader | follower (fixé par le collecteur)
+        self._store_version = 0
+        # Redémarrage à chaud : instantanés et inventaires rechargés depuis le dernier point de reprise
+        self.CHECKPOINT_PATH = os.getenv("CHECKPOINT_PATH", "checkpoint/vm_monitor.ckpt")
+        self.CHECKPOINT_INTERVAL = timedelta(seconds=int(os.getenv("CHECKPOINT_INTERVAL", 300)))
+        self.CHECKPOINT_MAX_AGE = timedelta(hours=float(os.getenv("CHECKPOINT_MAX_AGE_HOURS", 24)))
+        # Entrées restaurées servies (stale) au plus ce délai après le redémarrage, même sans collecteur
+        self.RESTORED_MAX_AGE = timedelta(seconds=int(os.getenv("RESTORED_MAX_AGE", 120)))
+        self.last_checkpoint = None
+        self.vm_list_cache = None       # dernière liste de VMs lue en base
+        # Labels acceptés par /api/ingest : liste de VMs relue au plus toutes les VM_LIST_TTL secondes
+        self.VM_LIST_TTL = timedelta(seconds=int(os.getenv("VM_LIST_TTL", 60)))
+        # Dernière consultation de chaque VM par un utilisateur (fréquence adaptative)
+        self.last_viewed = {}
+        # Consultations publiées pour les autres workers / instances (collecteur leader ou propriétaire)
+        self.view_logs = [self.shared_store] if self.shared_store else []
+        self.VIEW_PUBLISH_INTERVAL = timedelta(seconds=int(os.getenv("VIEW_PUBLISH_INTERVAL", 10)))
+        self._view_published = {}
         
     def get_context(user_id, key):
         return context.get(f"{user_id}:{key}")
@@ -33,84 +117,55 @@ class VMMonitor:
 
 
     def process_chatbot_message(self, message):
-        message = message.lower().strip()
-
-        # Commande : images vm <label>
-        match = re.match(r"images\s+vm\s+(\S+)", message)
-        if match:
-            label = match.group(1)
-            return self.get_docker_images(label)
-
-        # Commande : logs conteneur <nom> vm <label>
-        match = re.match(r"logs\s+conteneur\s+(\S+)\s+vm\s+(\S+)", message)
-        if match:
-            container, label = match.group(1), match.group(2)
-            return self.get_container_logs(label, container)
-
-        # Commande : conteneurs actifs vm <label>
-        match = re.match(r"conteneurs\s+actifs\s+vm\s+(\S+)", message)
-        if match:
-            label = match.group(1)
-            return self.get_running_containers(label)
-
-        # Commande : conteneurs arrêtés vm <label>
-        match = re.match(r"conteneurs\s+arr(ê|e)tés\s+vm\s+(\S+)", message)
-        if match:
-            label = match.group(2)
-            return self.get_stopped_containers(label)
-
-        # Commande : projets joget vm <label>
-        match = re.match(r"projets\s+joget\s+vm\s+(\S+)", message)
-        if match:
-            label = match.group(1)
-            return self.get_joget_projects(label)
-
-        # Commande inconnue
-        return {"status": "unknown", "message": "Commande non reconnue"}
-
-
-    def get_joget_projects(self, label):
-        """Liste les projets Joget dans tous les conteneurs joget d'une VM"""
+        # Table de dispatch compilée une fois (intents.py)
+        return dispatch_intent(self, message)
+
+
+    def get_joget_projects(self, label, force=False):
+        """Liste les projets Joget dans tous les conteneurs joget d'une VM.
+
+        Réponse en cache par VM ; après JOGET_CACHE_TTL une sonde légère (mtimes)
+        vérifie si les conteneurs ou les projets ont changé avant tout nouvel inventaire.
+        """
+        with self.cache_lock:
+            entry = self.joget_cache.get(label)
+        if entry and not force and datetime.now() - entry["checked"] < self.JOGET_CACHE_TTL:
+            return {**entry["data"], "cached": True}
+
         vm_info = self._get_vm_info_by_label(label)
         if not vm_info:
             return {"vm": label, "error": "VM not found", "status": "not_found"}
 
         try:
             ssh = self._connect_ssh(vm_info)
+            try:
+                if entry and not force:
+                    signature = _joget_signature(parse_joget_output(self._run_ssh_command(ssh, JOGET_PROBE_COMMAND)))
+                    if signature == entry["signature"]:
+                        with self.cache_lock:
+                            entry["checked"] = datetime.now()
+                        return {**entry["data"], "cached": True}
+                containers = parse_joget_output(self._run_ssh_command(ssh, JOGET_SCAN_COMMAND, timeout=60))
+            finally:
+                ssh.close()
 
-            # Lister les conteneurs joget
-            list_containers_cmd = "sudo docker ps --format '{{.Names}}' | grep joget"
-            containers_output = self._run_ssh_command(ssh, list_containers_cmd)
-            containers = containers_output.strip().splitlines()
-
-            all_projects = []
-
-            for container in containers:
-                container = container.strip()
-                if not container:
-                    continue
-
-                list_projects_cmd = f"sudo docker exec {container} ls /opt/joget/wflow/app_src"
-                projects_output = self._run_ssh_command(ssh, list_projects_cmd)
-                projects = [p.strip() for p in projects_output.strip().splitlines() if p.strip()]
-
-                all_projects.append({
-                    "container": container,
-                    "projects": projects
-                })
-
-            ssh.close()
-
-            return {
+            data = {
                 "vm": label,
-                "joget_containers": all_projects,
+                "joget_containers": [
+                    {"container": c["name"], "id": c["id"],
+                     "projects": [p["name"] for p in c["projects"]], "details": c["projects"]}
+                    for c in containers
+                ],
                 "status": "ok",
                 "timestamp": datetime.now().isoformat()
             }
+            with self.cache_lock:
+                self.joget_cache[label] = {"data": data, "signature": _joget_signature(containers),
+                                           "checked": datetime.now()}
+            return {**data, "cached": False}
 
         except Exception as e:
-            return {"vm": label, "error": str(e), "status": "failed"}
-
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
 
 
     def start_container(self, label, container_name):
@@ -119,11 +174,12 @@ class VMMonitor:
             return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
         try:
             ssh = self._connect_ssh(vm_info)
-            output = self._run_ssh_command(ssh, f"sudo docker start {container_name}")
+            output = self._run_ssh_command(ssh, f"sudo docker start {container_name}", priority=INTERACTIVE)
             ssh.close()
+            self.invalidate_inventory(label)
             return {"vm": label, "container": container_name, "message": output, "status": "started"}
         except Exception as e:
-            return {"vm": label, "container": container_name, "error": str(e), "status": "failed"}
+            return {"vm": label, "container": container_name, "error": str(e), "status": _error_status(e)}
 
     def stop_container(self, label, container_name):
         vm_info = self._get_vm_info_by_label(label)
@@ -131,11 +187,112 @@ class VMMonitor:
             return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
         try:
             ssh = self._connect_ssh(vm_info)
-            output = self._run_ssh_command(ssh, f"sudo docker stop {container_name}")
+            output = self._run_ssh_command(ssh, f"sudo docker stop {container_name}", priority=INTERACTIVE)
             ssh.close()
+            self.invalidate_inventory(label)
             return {"vm": label, "container": container_name, "message": output, "status": "stopped"}
         except Exception as e:
-            return {"vm": label, "container": container_name, "error": str(e), "status": "failed"}
+            return {"vm": label, "container": container_name, "error": str(e), "status": _error_status(e)}
+
+    def run_container_actions(self, label, items):
+        """Exécute des actions (start/stop/restart) sur plusieurs conteneurs d'une VM.
+
+        Une seule connexion SSH ; chaque action est une seule invocation
+        `docker <action> a b c`. Génère les résultats par conteneur, action par action.
+        """
+        vm_info = self._get_vm_info_by_label(label)
+        if not vm_info:
+            for container, action in items:
+                yield {"vm": label, "container": container, "action": action,
+                       "error": "VM non trouvée", "status": "not_found"}
+            return
+
+        groups = {}
+        for container, action in items:
+            groups.setdefault(action, []).append(container)
+
+        try:
+            ssh = self._connect_ssh(vm_info)
+        except Exception as e:
+            for container, action in items:
+                yield {"vm": label, "container": container, "action": action, "error": str(e), "status": "failed"}
+            return
+
+        try:
+            for index, (action, containers) in enumerate(groups.items()):
+                names = " ".join(shlex.quote(c) for c in containers)
+                # docker affiche le nom de chaque conteneur traité, les erreurs sur stderr
+                try:
+                    output = self._run_ssh_command(ssh, f"sudo docker {action} {names} 2>&1; echo \"@@exit $?\"",
+                                                   timeout=120, priority=INTERACTIVE)
+                except AdmissionTimeout as e:
+                    # File de la VM saturée (connexion fermée) : les actions restantes ne sont pas lancées
+                    for pending_action, pending in list(groups.items())[index:]:
+                        for container in pending:
+                            yield {"vm": label, "container": container, "action": pending_action,
+                                   "error": str(e), "status": "busy"}
+                    return
+                lines = [line.strip() for line in output.splitlines() if line.strip() and not line.startswith("@@exit")]
+                done = set(lines)
+                for container in containers:
+                    if container in done:
+                        yield {"vm": label, "container": container, "action": action, "status": _ACTION_STATUS[action]}
+                    else:
+                        error = next((l for l in lines if l != container and _mentions(l, container)), None)
+                        yield {"vm": label, "container": container, "action": action,
+                               "error": error or output or "Aucune réponse de docker", "status": "failed"}
+        finally:
+            ssh.close()
+            # Les relevés de conteneurs de cette VM ne sont plus à jour
+            with self.cache_lock:
+                self.container_stats_cache.pop(label, None)
+            self.invalidate_inventory(label)
+
+    def bulk_container_actions(self, items, max_workers=8):
+        """Actions groupées par VM, VMs traitées en parallèle ; résultats générés dès qu'ils arrivent"""
+        by_vm = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                yield {"index": index, "error": "Élément invalide : objet {vm, container, action} attendu",
+                       "status": "bad_request"}
+                continue
+            label, container, action = item.get("vm"), item.get("container"), item.get("action")
+            if not _is_name(label) or not _is_name(container) or action not in CONTAINER_ACTIONS:
+                yield {"index": index, "vm": label, "container": container, "action": action,
+                       "error": f"Élément invalide (actions : {', '.join(CONTAINER_ACTIONS)})", "status": "bad_request"}
+                continue
+            by_vm.setdefault(label, []).append((container, action))
+        if not by_vm:
+            return
+
+        results = Queue()
+        done = object()
+
+        def run(label, vm_items):
+            reported = set()
+            try:
+                for result in self.run_container_actions(label, vm_items):
+                    reported.add((result["container"], result["action"]))
+                    results.put(result)
+            except Exception as e:
+                logger.error(f"Erreur actions conteneurs sur VM {label}: {e}")
+                for container, action in vm_items:
+                    if (container, action) not in reported:
+                        results.put({"vm": label, "container": container, "action": action,
+                                     "error": str(e), "status": "failed"})
+            finally:
+                results.put(done)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(by_vm))) as pool:
+            for label, vm_items in by_vm.items():
+                pool.submit(run, label, vm_items)
+            remaining = len(by_vm)
+            while remaining:
+                result = results.get()
+                if result is done:
+                    remaining -= 1
+                else:
+                    yield result
 
     def get_container_logs(self, label, container_name, lines=100):
         vm_info = self._get_vm_info_by_label(label)
@@ -143,11 +300,11 @@ class VMMonitor:
             return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
         try:
             ssh = self._connect_ssh(vm_info)
-            output = self._run_ssh_command(ssh, f"sudo docker logs --tail {lines} {container_name}")
+            output = self._run_ssh_command(ssh, f"sudo docker logs --tail {lines} {container_name}", priority=INTERACTIVE)
             ssh.close()
             return {"vm": label, "container": container_name, "logs": output, "status": "ok"}
         except Exception as e:
-            return {"vm": label, "container": container_name, "error": str(e), "status": "failed"}
+            return {"vm": label, "container": container_name, "error": str(e), "status": _error_status(e)}
 
     def _get_vm_info_by_label(self, label):
         try:
@@ -185,10 +342,14 @@ class VMMonitor:
             for vm in vms:
                 vm['status'] = 'unknown'
                 vm['last_check'] = None
-            
+
+            self.vm_list_cache = {"data": vms, "timestamp": datetime.now()}
             return vms
         except Exception as e:
             logger.error(f"Erreur récupération VMs: {e}")
+            if self.vm_list_cache:
+                # Base indisponible : dernière liste connue, marquée périmée
+                return [{**vm, "stale": True} for vm in self.vm_list_cache["data"]]
             return {"error": f"Erreur base de données: {str(e)}"}
 
     def _connect_ssh(self, vm_info, timeout=30):
@@ -219,21 +380,31 @@ class VMMonitor:
                 raise Exception("Aucune méthode d'authentification valide trouvée")
 
             ssh.connect(**connect_params)
+            # Clé du contrôle d'admission (une file par VM)
+            ssh.vm_label = vm_info.get("label") or vm_info["ip"]
             return ssh
         except Exception as e:
             logger.error(f"Connexion SSH échouée: {e}")
             raise
 
-    def _run_ssh_command(self, ssh, command, timeout=15):
+    def _run_ssh_command(self, ssh, command, timeout=15, priority=None):
+        """Exécute une commande une fois admise par la file de la VM (priorité du thread par défaut).
+
+        File saturée : la connexion est fermée et AdmissionTimeout remonte à l'appelant (statut "busy").
+        """
         try:
-            stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout)
-            exit_status = stdout.channel.recv_exit_status()
-            output = stdout.read().decode().strip()
+            with self.admission.slot(getattr(ssh, "vm_label", "unknown"), priority):
+                stdin, stdout, stderr = ssh.exec_command(command, timeout=timeout)
+                exit_status = stdout.channel.recv_exit_status()
+                output = stdout.read().decode().strip()
             if exit_status != 0:
                 error_output = stderr.read().decode().strip()
                 logger.warning(f"Commande échouée: {error_output}")
                 return ""
             return output
+        except AdmissionTimeout:
+            ssh.close()
+            raise
         except Exception as e:
             logger.error(f"Erreur exécution commande '{command}': {e}")
             return ""
@@ -280,13 +451,21 @@ class VMMonitor:
             logger.error(f"Erreur parsing disk: {e}")
             return {}
 
-    def get_vm_stats(self, label, timeout=30):
+    def get_vm_stats(self, label, timeout=30, force=False):
         logger.info(f"Statistiques pour la VM: {label}")
 
+        self._note_view(label)
+        self._pull_shared("vm", label)
         with self.cache_lock:
             if label in self.vm_stats_cache:
                 entry = self.vm_stats_cache[label]
-                if datetime.now() - entry["timestamp"] < self.CACHE_DURATION:
+                age = datetime.now() - entry["timestamp"]
+                if self._serve_restored(entry) and not force:
+                    return _stale(entry)
+                if entry.get("source") == "agent":
+                    if age < self.AGENT_STALE_AFTER:
+                        return entry["data"]
+                elif not force and age < self.CACHE_DURATION:
                     return entry["data"]
 
         vm_info = self._get_vm_info_by_label(label)
@@ -294,30 +473,122 @@ class VMMonitor:
             return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
 
         try:
-            ssh = self._connect_ssh(vm_info, timeout)
+            result = self._fetch_vm_stats(label, vm_info, timeout)
+            self._store_vm_stats(label, result)
+            return result
+        except Exception as e:
+            return {"vm": label, "error": str(e), "status": _error_status(e, "connection_failed")}
+
+    def _fetch_vm_stats(self, label, vm_info, timeout=30):
+        """Relevé CPU/RAM/disque/charge de la VM par SSH"""
+        ssh = self._connect_ssh(vm_info, timeout)
+        sections = split_sections(self._run_ssh_command(ssh, PROC_COMMAND))
+
+        if sections.get("stat"):
+            # Une seule commande : /proc/* + df + uptime
+            ssh.close()
+            metrics = self.proc_tracker.update(label, sections)
+            disk_raw = sections.get("df", "")
+            uptime_raw = sections.get("uptime_cmd", "").strip()
+        else:
+            # Hôte sans /proc lisible : ancienne méthode
             cpu_raw = self._run_ssh_command(ssh, "top -bn1 | grep '%Cpu'")
             ram_raw = self._run_ssh_command(ssh, "free -m")
             disk_raw = self._run_ssh_command(ssh, "df -h /")
             uptime_raw = self._run_ssh_command(ssh, "uptime")
             ssh.close()
+            metrics = {"cpu": self.parse_cpu(cpu_raw), "ram": self.parse_ram(ram_raw)}
 
-            result = {
-                "vm": label,
-                "ip": vm_info.get("ip"),
-                "cpu": self.parse_cpu(cpu_raw),
-                "ram": self.parse_ram(ram_raw),
-                "disk": self.parse_disk(disk_raw),
-                "uptime": uptime_raw,
-                "status": "connected",
-                "timestamp": datetime.now().isoformat()
-            }
+        return {
+            "vm": label,
+            "ip": vm_info.get("ip"),
+            "cpu": metrics["cpu"],
+            "cpu_detail": metrics.get("cpu_detail", {}),
+            "ram": metrics["ram"],
+            "disk": self.parse_disk(disk_raw),
+            "disk_io": metrics.get("disk_io", {}),
+            "load": metrics.get("load", {}),
+            "uptime": uptime_raw,
+            "status": "connected",
+            "timestamp": datetime.now().isoformat()
+        }
+
+    def _connect_by_label(self, label):
+        vm_info = self._get_vm_info_by_label(label)
+        if not vm_info:
+            raise LookupError(f"VM non trouvée: {label}")
+        return self._connect_ssh(vm_info)
 
+    def _shared_container_stats(self, label):
+        """Worker suiveur : derniers stats conteneurs écrits par le leader, s'ils sont assez récents"""
+        self._pull_shared("containers", label)
+        with self.cache_lock:
+            entry = self.container_stats_cache.get(label)
+            if entry and datetime.now() - entry["timestamp"] < self.SHARED_STALE_AFTER:
+                return entry["data"]
+        return None
+
+    def _live_container_stats(self, label, wait=3):
+        """(stats, source) sans nouvelle commande docker stats : cache partagé (suiveur) ou flux (leader)"""
+        if self.role == "follower":
+            stats = self._shared_container_stats(label)
+            return (stats, "shared") if stats is not None else (None, None)
+        stats = self._streamed_container_stats(label, wait)
+        return (stats, "stream") if stats is not None else (None, None)
+
+    def _streamed_container_stats(self, label, wait=3):
+        """Derniers échantillons du flux docker stats de la VM, ou None si le flux n'est pas disponible.
+
+        Seul le leader (ou une instance seule) ouvre des flux ; la collecte de fond réutilise un flux
+        existant sans en démarrer et sans repousser son arrêt pour inactivité.
+        """
+        if not self.STATS_STREAM or self.role == "follower":
+            return None
+        background = self.admission.current_priority() == BACKGROUND
+        stream = self.stats_streams.get(label, create=not background)
+        if stream is None:
+            return None
+        # Flux en cours de reconnexion : pas d'attente, repli immédiat
+        samples = stream.latest(wait=0 if stream.reconnects or background else wait, touch=not background)
+        if not stream.ready:
+            return None
+        stats = []
+        for sample in samples:
+            container = sample.pop("_metadata")
+            sample.pop("_ts")
+            sample["Image"] = container.get("Image")
+            sample["ComposeProject"] = compose_project(container.get("Labels"))
+            stats.append(sample)
+        return stats
+
+    def get_inventory(self, label, kind="containers", force=False):
+        """Inventaire en cache (kind : containers | images), rafraîchi après INVENTORY_TTL"""
+        with self.cache_lock:
+            entry = self.inventory_cache.get((label, kind))
+        if not force and self._serve_restored(entry):
+            return {**entry["result"], "cached": True, "stale": True, "stale_since": entry["timestamp"].isoformat()}
+        if entry and not force and datetime.now() - entry["timestamp"] < self.INVENTORY_TTL:
+            return {**entry["result"], "cached": True}
+
+        result = self.get_docker_data(label, kind=kind)
+        if result.get("status") == "ok":
             with self.cache_lock:
-                self.vm_stats_cache[label] = {"data": result, "timestamp": datetime.now()}
+                self.inventory_cache[(label, kind)] = {"result": result, "timestamp": datetime.now()}
+        return {**result, "cached": False}
 
+    def list_containers(self, label, state=None, force=False):
+        """Conteneurs de l'inventaire, filtrés sur l'état (running / stopped ou un état docker précis)"""
+        result = self.get_inventory(label, "containers", force=force)
+        if result.get("status") != "ok" or state is None:
             return result
-        except Exception as e:
-            return {"vm": label, "error": str(e), "status": "connection_failed"}
+        states = CONTAINER_STATE_GROUPS.get(state, (state,))
+        data = [c for c in result["data"] if str(c.get("State", "")).lower() in states]
+        return {**result, "data": data, "count": len(data)}
+
+    def invalidate_inventory(self, label):
+        with self.cache_lock:
+            self.inventory_cache.pop((label, "containers"), None)
+            self.inventory_cache.pop((label, "images"), None)
 
     def get_docker_containers(self, label):
         """Récupère tous les conteneurs Docker (en cours d'exécution et arrêtés)"""
@@ -327,8 +598,55 @@ class VMMonitor:
         """Récupère toutes les images Docker"""
         return self.get_docker_data(label, kind="images")
 
+    def refresh_image_inventory(self, label):
+        """Inventaire des images d'une VM (tailles, conteneurs, docker system df) en un seul appel SSH"""
+        vm_info = self._get_vm_info_by_label(label)
+        if not vm_info:
+            return {"vm": label, "error": "VM not found", "status": "not_found"}
+        try:
+            ssh = self._connect_ssh(vm_info)
+            output = self._run_ssh_command(ssh, IMAGE_INVENTORY_COMMAND, timeout=60)
+            ssh.close()
+            images, df = parse_image_inventory(output)
+            self.image_index.ingest_vm(label, images, df)
+            self._publish("images", label, output, datetime.now(), "pull")
+            return {"vm": label, "images": len(images), "status": "ok", "timestamp": datetime.now().isoformat()}
+        except Exception as e:
+            logger.error(f"Erreur inventaire images pour VM {label}: {e}")
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
+
+    def refresh_stale_images(self, labels, force=False, max_workers=8):
+        """Rafraîchit en parallèle les VMs dont l'inventaire d'images a expiré"""
+        if self.role == "follower" and not force:
+            # Le leader rafraîchit l'inventaire ; il arrive par sync_from_store
+            return []
+        now = datetime.now()
+        stale = [label for label in labels if force or not self.image_index.updated_at(label)
+                 or now - self.image_index.updated_at(label) > self.IMAGE_INDEX_TTL]
+        if not stale:
+            return []
+        # Les threads du pool héritent de la priorité de l'appelant (collecte de fond ou demande explicite)
+        level = self.admission.current_priority()
+
+        def refresh(label):
+            with self.admission.priority(level):
+                return self.refresh_image_inventory(label)
+
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(stale))) as pool:
+            return list(pool.map(refresh, stale))
+
     def get_container_stats(self, label):
         """Récupère les statistiques des conteneurs Docker en cours d'exécution"""
+        streamed, source = self._live_container_stats(label)
+        if streamed is not None:
+            return {
+                "vm": label,
+                "containers_stats": [_legacy_stats(item) for item in streamed],
+                "source": source,
+                "status": "ok",
+                "timestamp": datetime.now().isoformat()
+            }
+
         vm_info = self._get_vm_info_by_label(label)
         if not vm_info:
             return {"vm": label, "error": "VM not found", "status": "not_found"}
@@ -388,7 +706,7 @@ class VMMonitor:
             }
             
         except Exception as e:
-            return {"vm": label, "error": str(e), "status": "failed"}
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
 
     def get_docker_data(self, label, kind="containers"):
         """Méthode générique pour récupérer les données Docker"""
@@ -432,7 +750,7 @@ class VMMonitor:
             
         except Exception as e:
             logger.error(f"Erreur récupération données Docker ({kind}) pour VM {label}: {e}")
-            return {"vm": label, "error": str(e), "status": "failed"}
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
 
     def test_vm_connection(self, label):
         """Teste la connexion à une VM"""
@@ -442,7 +760,7 @@ class VMMonitor:
         
         try:
             ssh = self._connect_ssh(vm_info, timeout=10)
-            test_output = self._run_ssh_command(ssh, 'echo "Connection test OK"')
+            test_output = self._run_ssh_command(ssh, 'echo "Connection test OK"', priority=INTERACTIVE)
             ssh.close()
             
             if "Connection test OK" in test_output:
@@ -451,14 +769,58 @@ class VMMonitor:
                 return {"status": "error", "message": "Test de commande échoué"}
                 
         except Exception as e:
-            return {"status": "error", "message": f"Erreur de connexion: {str(e)}"}
+            return {"status": _error_status(e, "error"), "message": f"Erreur de connexion: {str(e)}"}
 
     def clear_cache(self):
         """Vide le cache des statistiques"""
         with self.cache_lock:
             self.vm_stats_cache.clear()
+            self.container_stats_cache.clear()
+            self.joget_cache.clear()
+            self.inventory_cache.clear()
+        self.proc_tracker.forget()
         logger.info("Cache vidé")
 
+    def _note_view(self, label):
+        # La collecte de fond et les alertes ne comptent pas comme une consultation
+        if self.admission.current_priority() == BACKGROUND:
+            return
+        now = datetime.now()
+        self.last_viewed[label] = now
+        published = self._view_published.get(label)
+        if self.view_logs and (published is None or now - published >= self.VIEW_PUBLISH_INTERVAL):
+            self._view_published[label] = now
+            for log in self.view_logs:
+                try:
+                    log.note_view(label, now.timestamp())
+                except Exception as e:
+                    logger.warning(f"Publication de la consultation de {label} échouée: {e}")
+
+    def viewed_recently(self, label, seconds):
+        """Consultée depuis moins de `seconds` s par ce processus ou, via view_logs, par un autre"""
+        viewed = self.last_viewed.get(label)
+        if viewed and (datetime.now() - viewed).total_seconds() < seconds:
+            return True
+        for log in self.view_logs:
+            try:
+                ts = log.last_view(label)
+            except Exception as e:
+                logger.warning(f"Lecture des consultations de {label} échouée: {e}")
+                continue
+            if ts and datetime.now().timestamp() - ts < seconds:
+                return True
+        return False
+
+    def annotate_vms(self, vms):
+        """Statut et date du dernier relevé connus localement pour chaque VM"""
+        with self.cache_lock:
+            for vm in vms:
+                entry = self.vm_stats_cache.get(vm["label"])
+                if entry:
+                    vm["status"] = entry["data"].get("status", "unknown")
+                    vm["last_check"] = entry["timestamp"].isoformat()
+        return vms
+
     def get_cache_info(self):
         """Retourne des informations sur le cache"""
         with self.cache_lock:
@@ -474,6 +836,27 @@ class VMMonitor:
         return self.get_docker_data(label, kind="running")
 
 
+    def get_cached_running_containers(self, label):
+        """Conteneurs actifs depuis le dernier relevé (agent ou collecteur), sinon via SSH"""
+        self._note_view(label)
+        self._pull_shared("containers", label)
+        with self.cache_lock:
+            entry = self.container_stats_cache.get(label)
+            if entry:
+                max_age = self.AGENT_STALE_AFTER if entry["source"] == "agent" else self.CACHE_DURATION
+                restored = self._serve_restored(entry)
+                if restored or datetime.now() - entry["timestamp"] < max_age:
+                    return {
+                        "vm": label,
+                        "data": entry["data"],
+                        "count": len(entry["data"]),
+                        "source": entry["source"],
+                        "stale": restored,
+                        "status": "ok",
+                        "timestamp": entry["timestamp"].isoformat()
+                    }
+        return self.get_running_containers(label)
+
     def get_stopped_containers(self, label):
         """Récupère uniquement les conteneurs Docker arrêtés"""
         all_data = self.get_docker_data(label, kind="containers")
@@ -494,6 +877,22 @@ class VMMonitor:
 
     def get_single_container_stats(self, label, container_name):
         """Récupère les stats CPU/RAM/IO pour un conteneur Docker spécifique"""
+        streamed, source = self._live_container_stats(label)
+        if streamed is not None:
+            item = next((i for i in streamed if container_name in (i.get("Name"), i.get("Container"))
+                         or (i.get("ID") or "").startswith(container_name)), None)
+            if item is None:
+                return {
+                    "vm": label,
+                    "container": container_name,
+                    "status": "not_found",
+                    "message": "Conteneur non trouvé ou aucune donnée"
+                }
+            stats = _legacy_stats(item)
+            stats.pop("container")
+            return {"vm": label, "container": container_name, **stats, "source": source, "status": "ok",
+                    "timestamp": datetime.now().isoformat()}
+
         vm_info = self._get_vm_info_by_label(label)
         if not vm_info:
             return {"vm": label, "error": "VM not found", "status": "not_found"}
@@ -536,29 +935,49 @@ class VMMonitor:
 
         except Exception as e:
             logger.error(f"Erreur stats conteneur {container_name} pour VM {label}: {e}")
-            return {"vm": label, "container": container_name, "error": str(e), "status": "failed"}
+            return {"vm": label, "container": container_name, "error": str(e), "status": _error_status(e)}
 
 
-    def get_active_container_resources(self, label):
+    def get_active_container_resources(self, label, force=False):
         """Récupère CPU, RAM, disque des conteneurs actifs"""
+        self._note_view(label)
+        self._pull_shared("containers", label)
+        with self.cache_lock:
+            entry = self.container_stats_cache.get(label)
+            # Un worker suiveur sert le dernier relevé du leader au lieu d'interroger la VM
+            max_age = self.AGENT_STALE_AFTER if entry and entry["source"] == "agent" else (
+                self.SHARED_STALE_AFTER if self.role == "follower" else None)
+            restored = not force and self._serve_restored(entry)
+            if entry and (restored or max_age and datetime.now() - entry["timestamp"] < max_age):
+                return {
+                    "vm": label,
+                    "container_resources": entry["data"],
+                    "count": len(entry["data"]),
+                    "source": entry["source"],
+                    "stale": restored,
+                    "status": "ok",
+                    "timestamp": entry["timestamp"].isoformat()
+                }
+
+        streamed = self._streamed_container_stats(label)
+        if streamed is not None:
+            self._store_container_stats(label, streamed, "stream")
+            return {
+                "vm": label,
+                "container_resources": streamed,
+                "count": len(streamed),
+                "source": "stream",
+                "status": "ok",
+                "timestamp": datetime.now().isoformat()
+            }
+
         vm_info = self._get_vm_info_by_label(label)
         if not vm_info:
             return {"vm": label, "error": "VM not found", "status": "not_found"}
 
         try:
-            ssh = self._connect_ssh(vm_info)
-            cmd = "sudo docker stats --no-stream --format '{{json .}}'"
-            output = self._run_ssh_command(ssh, cmd)
-            ssh.close()
-
-            stats = []
-            if output:
-                for line in output.splitlines():
-                    try:
-                        stats.append(json.loads(line))
-                    except json.JSONDecodeError as e:
-                        logger.warning(f"Erreur parsing stats JSON: {e} - Line: {line}")
-                        continue
+            stats = self._fetch_container_resources(label, vm_info)
+            self._store_container_stats(label, stats, "pull")
 
             return {
                 "vm": label,
@@ -570,6 +989,511 @@ class VMMonitor:
 
         except Exception as e:
             logger.error(f"Erreur récupération stats conteneurs pour VM {label}: {e}")
-            return {"vm": label, "error": str(e), "status": "failed"}
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
+
+    def _fetch_container_resources(self, label, vm_info):
+        """`docker stats --no-stream` enrichi de l'image et du projet compose, par SSH"""
+        ssh = self._connect_ssh(vm_info)
+        # Stats + métadonnées (image, projet compose) en un seul appel
+        cmd = ("sudo docker stats --no-stream --format '{{json .}}'; echo '@@ps'; "
+               "sudo docker ps --format '{{json .}}'")
+        output = self._run_ssh_command(ssh, cmd)
+        ssh.close()
+
+        stats_output, _, ps_output = output.partition("@@ps")
+        stats = []
+        for line in stats_output.splitlines():
+            if not line.strip():
+                continue
+            try:
+                stats.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                logger.warning(f"Erreur parsing stats JSON: {e} - Line: {line}")
+                continue
+
+        metadata = {}
+        for line in ps_output.splitlines():
+            try:
+                container = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            metadata[container.get("Names")] = container
+        for item in stats:
+            container = metadata.get(item.get("Name"), {})
+            item["Image"] = container.get("Image")
+            item["ComposeProject"] = compose_project(container.get("Labels"))
+        return stats
+
+    def _store_vm_stats(self, label, result):
+        now = datetime.now()
+        with self.cache_lock:
+            self.vm_stats_cache[label] = {"data": result, "timestamp": now, "source": "pull"}
+        self._publish("vm", label, result, now, "pull")
+        self._record_vm_history(label, result)
+
+    def _store_container_stats(self, label, stats, source):
+        now = datetime.now()
+        with self.cache_lock:
+            self.container_stats_cache[label] = {"data": stats, "timestamp": now, "source": source}
+        self._publish("containers", label, stats, now, source)
+        self._index_containers(label, stats)
+        self._record_container_history(label, stats, now.timestamp())
+
+    def _index_containers(self, label, stats):
+        """Met à jour l'index de flotte et oublie l'historique des conteneurs disparus ou recréés"""
+        removed = self.fleet_index.ingest_vm(label, stats)
+        for name in removed:
+            self.history.drop(label, name)
+        for hook in self.container_removed_hooks if removed else ():
+            try:
+                hook(label, removed)
+            except Exception as e:
+                logger.warning(f"Hook de suppression de conteneurs en échec ({label}): {e}")
+
+    def _record_container_history(self, label, stats, ts):
+        for item in stats:
+            name = item.get("Name") or item.get("Container")
+            self.history.record(label, "cpu_percent", _parse_percent(item.get("CPUPerc")), ts, container=name)
+            self.history.record(label, "mem_percent", _parse_percent(item.get("MemPerc")), ts, container=name)
+
+    # --- point de reprise (redémarrage à chaud) -------------------------------
+
+    def export_checkpoint(self):
+        """Instantanés, inventaires et liste des VMs sous une forme sérialisable"""
+        def dump(cache):
+            return {label: {"data": e["data"], "ts": e["timestamp"].timestamp(), "source": e.get("source")}
+                    for label, e in cache.items()}
+
+        with self.cache_lock:
+            payload = {
+                "saved": datetime.now().timestamp(),
+                "vm_stats": dump(self.vm_stats_cache),
+                "container_stats": dump(self.container_stats_cache),
+                "inventory": [{"vm": label, "kind": kind, "result": e["result"], "ts": e["timestamp"].timestamp()}
+                              for (label, kind), e in self.inventory_cache.items()],
+            }
+        if self.vm_list_cache:
+            payload["vms"] = {"data": self.vm_list_cache["data"], "ts": self.vm_list_cache["timestamp"].timestamp()}
+        return payload
+
+    def restore_checkpoint(self, payload):
+        """Recharge un point de reprise ; les entrées sont marquées `restored` jusqu'au prochain relevé"""
+        now = datetime.now()
+        oldest = (now - self.CHECKPOINT_MAX_AGE).timestamp()
+        restored = 0
+        with self.cache_lock:
+            for key, cache in (("vm_stats", self.vm_stats_cache), ("container_stats", self.container_stats_cache)):
+                for label, e in payload.get(key, {}).items():
+                    if e["ts"] >= oldest and label not in cache:
+                        cache[label] = {"data": e["data"], "timestamp": datetime.fromtimestamp(e["ts"]),
+                                        "source": e["source"], "restored": True, "restored_at": now}
+                        restored += 1
+            for e in payload.get("inventory", []):
+                if e["ts"] >= oldest and (e["vm"], e["kind"]) not in self.inventory_cache:
+                    self.inventory_cache[(e["vm"], e["kind"])] = {
+                        "result": e["result"], "timestamp": datetime.fromtimestamp(e["ts"]), "restored": True,
+                        "restored_at": now}
+                    restored += 1
+        vms = payload.get("vms")
+        if vms and self.vm_list_cache is None:
+            self.vm_list_cache = {"data": vms["data"], "timestamp": datetime.fromtimestamp(vms["ts"])}
+        # Les conteneurs restaurés alimentent l'index de flotte (top N) dès le démarrage
+        for label, e in payload.get("container_stats", {}).items():
+            if e["ts"] >= oldest:
+                self.fleet_index.ingest_vm(label, e["data"])
+        return restored
+
+    def load_checkpoint(self):
+        """Au démarrage ; retourne le nombre d'entrées restaurées"""
+        if not self.CHECKPOINT_PATH:
+            return 0
+        payload = checkpoint.load_checkpoint(self.CHECKPOINT_PATH)
+        if not payload:
+            return 0
+        restored = self.restore_checkpoint(payload)
+        logger.info(f"Point de reprise rechargé: {restored} entrées ({self.CHECKPOINT_PATH})")
+        return restored
+
+    def save_checkpoint(self, force=False):
+        """Périodique (hook de collecte) et à l'arrêt ; un worker suiveur n'écrit pas"""
+        if not self.CHECKPOINT_PATH or self.role == "follower":
+            return None
+        now = datetime.now()
+        if not force and self.last_checkpoint and now - self.last_checkpoint < self.CHECKPOINT_INTERVAL:
+            return None
+        try:
+            size = checkpoint.save_checkpoint(self.CHECKPOINT_PATH, self.export_checkpoint())
+        except Exception as e:
+            logger.error(f"Écriture du point de reprise échouée: {e}")
+            return None
+        self.last_checkpoint = now
+        return size
+
+    def _serve_restored(self, entry):
+        """Entrée du point de reprise encore servie telle quelle ; passé RESTORED_MAX_AGE, relevé en direct"""
+        return bool(entry and entry.get("restored") and datetime.now() - entry["restored_at"] < self.RESTORED_MAX_AGE)
+
+    def refresh_restored(self, label):
+        """Rafraîchit les inventaires encore issus du point de reprise"""
+        with self.cache_lock:
+            kinds = [kind for (vm, kind), e in self.inventory_cache.items() if vm == label and e.get("restored")]
+        for kind in kinds:
+            self.get_inventory(label, kind, force=True)
+
+    def checkpoint_info(self):
+        with self.cache_lock:
+            restored = sum(1 for cache in (self.vm_stats_cache, self.container_stats_cache, self.inventory_cache)
+                           for e in cache.values() if e.get("restored"))
+        return {"path": self.CHECKPOINT_PATH or None, "restored_pending": restored,
+                "last_saved": self.last_checkpoint.isoformat() if self.last_checkpoint else None}
+
+    # --- cache partagé entre workers ----------------------------------------
+
+    def _cache_for(self, kind):
+        return self.vm_stats_cache if kind == "vm" else self.container_stats_cache
+
+    def _publish(self, kind, label, data, timestamp, source):
+        """Écrit l'instantané dans le cache partagé (aucun effet sans SHARED_CACHE_PATH)"""
+        if self.shared_store is None:
+            return
+        try:
+            self.shared_store.put(kind, label, data, timestamp.timestamp(), source)
+        except Exception as e:
+            logger.warning(f"Écriture cache partagé échouée ({kind}/{label}): {e}")
+
+    def _unpublish_agent(self, label):
+        if self.shared_store is None:
+            return
+        try:
+            for kind in ("vm", "containers"):
+                row = self.shared_store.get(kind, label)
+                if row and row["source"] == "agent":
+                    self.shared_store.delete(kind, label)
+        except Exception as e:
+            logger.warning(f"Suppression cache partagé échouée pour {label}: {e}")
+
+    def _adopt_snapshot(self, kind, label, data, ts, source):
+        """Remplace l'entrée locale si l'instantané partagé est plus récent ; True si adopté"""
+        received = datetime.fromtimestamp(ts)
+        cache = self._cache_for(kind)
+        with self.cache_lock:
+            entry = cache.get(label)
+            if entry and entry["timestamp"] >= received:
+                return False
+            cache[label] = {"data": data, "timestamp": received, "source": source}
+        return True
+
+    def _pull_shared(self, kind, label):
+        """Lecture directe : relevé plus récent écrit par un autre worker"""
+        if self.shared_store is None:
+            return
+        try:
+            row = self.shared_store.get(kind, label)
+        except Exception as e:
+            logger.warning(f"Lecture cache partagé échouée ({kind}/{label}): {e}")
+            return
+        if row:
+            self._adopt_snapshot(kind, label, row["data"], row["ts"], row["source"])
+
+    def sync_from_store(self):
+        """Intègre les instantanés écrits par les autres workers (caches, index, historique)"""
+        if self.shared_store is None:
+            return 0
+        rows = self.shared_store.changed_since(self._store_version)
+        pid = os.getpid()
+        adopted = 0
+        for kind, label, version, ts, source, writer, data in rows:
+            self._store_version = max(self._store_version, version)
+            if writer == pid:
+                continue
+            if kind == "images":
+                # Sortie brute de IMAGE_INVENTORY_COMMAND, réanalysée localement
+                self.image_index.ingest_vm(label, *parse_image_inventory(data))
+                adopted += 1
+                continue
+            self._adopt_snapshot(kind, label, data, ts, source)
+            if kind == "vm":
+                self._record_vm_history(label, data, ts)
+            else:
+                self._index_containers(label, data)
+                self._record_container_history(label, data, ts)
+            adopted += 1
+        return adopted
+
+    def shared_cache_info(self):
+        if self.shared_store is None:
+            return {"enabled": False, "role": self.role}
+        return {"enabled": True, "role": self.role, "pid": os.getpid(),
+                "synced_version": self._store_version, **self.shared_store.info()}
+
+    def _record_vm_history(self, label, stats, ts=None):
+        ts = ts if ts is not None else datetime.now().timestamp()
+        self.history.record(label, "cpu", stats.get("cpu"), ts)
+        self.history.record(label, "ram_percent", (stats.get("ram") or {}).get("usage_percent"), ts)
+        self.history.record(label, "disk_percent", _parse_percent((stats.get("disk") or {}).get("use_percent")), ts)
+
+    def has_fresh_agent_data(self, label):
+        # L'agent a pu pousser ses données vers un autre worker
+        self._pull_shared("vm", label)
+        with self.cache_lock:
+            entry = self.vm_stats_cache.get(label)
+            return bool(entry and entry.get("source") == "agent"
+                        and datetime.now() - entry["timestamp"] < self.AGENT_STALE_AFTER)
+
+    def known_labels(self):
+        """Labels de l'inventaire (liste en cache tant qu'elle a moins de VM_LIST_TTL)"""
+        cached = self.vm_list_cache
+        if cached and datetime.now() - cached["timestamp"] < self.VM_LIST_TTL:
+            return {vm["label"] for vm in cached["data"]}
+        vms = self.get_all_vms()
+        if isinstance(vms, dict):
+            return set()
+        return {vm["label"] for vm in vms}
+
+    def ingest_agent_points(self, points):
+        """Intègre un lot de points (ingest.parse_lines) poussé par un agent ; VMs hors inventaire ignorées"""
+        known = self.known_labels()
+        by_vm, unknown = {}, set()
+        for measurement, tags, fields, ts in points:
+            label = tags.get("vm")
+            if label in known:
+                by_vm.setdefault(label, []).append((measurement, tags, fields, ts))
+            elif label:
+                unknown.add(label)
+        if unknown:
+            logger.warning(f"Points d'agent ignorés pour des VMs inconnues: {sorted(unknown)}")
+
+        for label, vm_points in by_vm.items():
+            vm_points.sort(key=lambda p: p[3])
+            latest_ts = vm_points[-1][3]
+            latest = [p for p in vm_points if p[3] == latest_ts]
+
+            # Historique : tous les échantillons du lot
+            for measurement, tags, fields, ts in vm_points:
+                if measurement == "host":
+                    self.history.record(label, "cpu", fields.get("cpu"), ts)
+                elif measurement == "mem":
+                    self.history.record(label, "ram_percent", fields.get("usage_percent"), ts)
+                elif measurement == "disk":
+                    self.history.record(label, "disk_percent", fields.get("use_percent"), ts)
+                elif measurement == "container":
+                    self.history.record(label, "cpu_percent", fields.get("cpu_percent"), ts, container=tags.get("name"))
+                    self.history.record(label, "mem_percent", fields.get("mem_percent"), ts, container=tags.get("name"))
+
+            snapshot, containers = self._snapshot_from_points(label, latest, latest_ts)
+            received = datetime.fromtimestamp(latest_ts)
+            with self.cache_lock:
+                if snapshot is not None:
+                    previous = self.vm_stats_cache.get(label, {}).get("data", {})
+                    snapshot["ip"] = previous.get("ip")
+                    snapshot["uptime"] = previous.get("uptime", "")
+                    self.vm_stats_cache[label] = {"data": snapshot, "timestamp": received, "source": "agent"}
+                self.container_stats_cache[label] = {"data": containers, "timestamp": received, "source": "agent"}
+            if snapshot is not None:
+                self._publish("vm", label, snapshot, received, "agent")
+            self._publish("containers", label, containers, received, "agent")
+            self._index_containers(label, containers)
+
+        return {"vms": len(by_vm), "points": sum(len(p) for p in by_vm.values()), "unknown_vms": sorted(unknown)}
+
+    def _snapshot_from_points(self, label, points, ts):
+        """Reconstruit un instantané au format de get_vm_stats à partir d'un échantillon d'agent"""
+        host = mem = disk = None
+        cores, disk_io, containers = {}, {}, []
+        for measurement, tags, fields, _ in points:
+            if measurement == "host":
+                host = fields
+            elif measurement == "mem":
+                mem = fields
+            elif measurement == "disk":
+                disk = fields
+            elif measurement == "core":
+                cores[tags.get("core")] = fields
+            elif measurement == "diskio":
+                disk_io[tags.get("device")] = fields
+            elif measurement == "container":
+                containers.append({
+                    "Name": tags.get("name"),
+                    "Container": tags.get("name"),
+                    "Image": tags.get("image"),
+                    "ComposeProject": tags.get("project"),
+                    "CPUPerc": f"{fields.get('cpu_percent', 0):.2f}%",
+                    "MemPerc": f"{fields.get('mem_percent', 0):.2f}%",
+                    "MemUsage": f"{fields.get('mem_used_mb', 0):.1f}MiB / {fields.get('mem_limit_mb', 0):.1f}MiB",
+                })
+
+        if host is None:
+            return None, containers
+
+        ram = {}
+        if mem:
+            ram = {k: int(v) for k, v in mem.items() if k != "usage_percent"}
+            ram["usage_percent"] = mem.get("usage_percent", 0)
+        disk_info = {}
+        if disk:
+            disk_info = {
+                "size": _format_kb(disk.get("size_kb", 0)),
+                "used": _format_kb(disk.get("used_kb", 0)),
+                "avail": _format_kb(disk.get("avail_kb", 0)),
+                "use_percent": f"{round(disk.get('use_percent', 0))}%",
+            }
+
+        snapshot = {
+            "vm": label,
+            "cpu": host.get("cpu", 0.0),
+            "cpu_detail": {
+                "total": {k: host.get(k) for k in ("user", "system", "iowait", "steal")},
+                "cores": cores,
+                "since_boot": False,
+            },
+            "ram": ram,
+            "disk": disk_info,
+            "disk_io": disk_io,
+            "load": {"1m": host.get("load1"), "5m": host.get("load5"), "15m": host.get("load15")},
+            "status": "connected",
+            "source": "agent",
+            "timestamp": datetime.fromtimestamp(ts).isoformat()
+        }
+        return snapshot, containers
+
+    def deploy_agent(self, label, ingest_url, interval=5, token=""):
+        """Installe et démarre l'agent de push sur une VM via SSH"""
+        vm_info = self._get_vm_info_by_label(label)
+        if not vm_info:
+            return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
+
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        files = {
+            "monitoring_agent.py": os.path.join(base_dir, "agent", "monitoring_agent.py"),
+            "proc_metrics.py": os.path.join(base_dir, "proc_metrics.py"),
+            "ingest.py": os.path.join(base_dir, "ingest.py"),
+        }
+        try:
+            ssh = self._connect_ssh(vm_info)
+            sftp = ssh.open_sftp()
+            try:
+                sftp.mkdir(AGENT_REMOTE_DIR)
+            except IOError:
+                pass
+            for name, local_path in files.items():
+                sftp.put(local_path, f"{AGENT_REMOTE_DIR}/{name}")
+            with sftp.open(f"{AGENT_REMOTE_DIR}/token", "w") as f:
+                f.write(token or "")
+            sftp.chmod(f"{AGENT_REMOTE_DIR}/token", 0o600)
+            sftp.close()
+
+            args = " ".join(shlex.quote(str(a)) for a in (
+                "--url", ingest_url, "--label", label, "--interval", interval, "--token-file", "token"
+            ))
+            # sudo (sans mot de passe) si possible pour accéder au socket Docker
+            cmd = (
+                f"cd {AGENT_REMOTE_DIR} && {AGENT_STOP_COMMAND}; "
+                "SUDO=''; sudo -n true 2>/dev/null && SUDO='sudo -n'; "
+                f"nohup $SUDO python3 monitoring_agent.py {args} > agent.log 2>&1 < /dev/null & echo started"
+            )
+            output = self._run_ssh_command(ssh, cmd, priority=INTERACTIVE)
+            ssh.close()
+            if "started" not in output:
+                return {"vm": label, "error": "Démarrage de l'agent échoué", "status": "failed"}
+            return {"vm": label, "ingest_url": ingest_url, "interval": interval, "status": "deployed",
+                    "timestamp": datetime.now().isoformat()}
+        except Exception as e:
+            logger.error(f"Déploiement agent échoué pour VM {label}: {e}")
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
+
+    def stop_agent(self, label):
+        """Arrête l'agent de push ; la VM repasse en mode pull"""
+        vm_info = self._get_vm_info_by_label(label)
+        if not vm_info:
+            return {"vm": label, "error": "VM non trouvée", "status": "not_found"}
+        try:
+            ssh = self._connect_ssh(vm_info)
+            self._run_ssh_command(ssh, f"{AGENT_STOP_COMMAND}; echo stopped", priority=INTERACTIVE)
+            ssh.close()
+            with self.cache_lock:
+                if self.vm_stats_cache.get(label, {}).get("source") == "agent":
+                    del self.vm_stats_cache[label]
+                if self.container_stats_cache.get(label, {}).get("source") == "agent":
+                    del self.container_stats_cache[label]
+            self._unpublish_agent(label)
+            self.fleet_index.remove_vm(label)
+            return {"vm": label, "status": "stopped", "timestamp": datetime.now().isoformat()}
+        except Exception as e:
+            return {"vm": label, "error": str(e), "status": _error_status(e)}
+
+
+_ACTION_STATUS = {"start": "started", "stop": "stopped", "restart": "restarted"}
+
+
+def _is_name(value):
+    return isinstance(value, str) and bool(value.strip())
+
+
+def _mentions(line, name):
+    """La ligne cite le conteneur `name` en entier (une erreur sur web2 ne concerne pas web)"""
+    return re.search(rf"(?<![\w.-]){re.escape(name)}(?![\w.-])", line) is not None
+
+
+def _error_status(error, default="failed"):
+    """Statut d'échec ; "busy" quand la file d'admission de la VM est saturée"""
+    return "busy" if isinstance(error, AdmissionTimeout) else default
+
+
+def _stale(entry):
+    """Instantané issu du point de reprise, servi en attendant le prochain relevé"""
+    return {**entry["data"], "stale": True, "stale_since": entry["timestamp"].isoformat()}
+
+
+def parse_joget_output(output):
+    """Sortie de JOGET_PROBE_COMMAND / JOGET_SCAN_COMMAND -> [{id, name, projects: [{name, mtime, size_kb}]}]"""
+    containers = []
+    for line in output.splitlines():
+        if line.startswith("@@container "):
+            _, container_id, name = (line.split(" ", 2) + [""])[:3]
+            containers.append({"id": container_id, "name": name.strip(), "projects": []})
+            continue
+        parts = line.split(" ", 2)
+        if not containers or len(parts) < 3 or not parts[0].isdigit():
+            continue
+        containers[-1]["projects"].append({
+            "name": parts[2],
+            "mtime": int(parts[0]),
+            "size_kb": int(parts[1]) if parts[1].isdigit() else None,
+        })
+    return containers
+
+
+def _joget_signature(containers):
+    # Conteneurs présents + mtime de chaque projet (la taille n'est pas dans la sonde)
+    return tuple(sorted(
+        (c["id"], tuple(sorted((p["name"], p["mtime"]) for p in c["projects"]))) for c in containers
+    ))
+
+
+def _legacy_stats(item):
+    # Format historique de get_container_stats / get_single_container_stats
+    return {
+        "container": item.get("Name") or item.get("Container"),
+        "cpu_percent": item.get("CPUPerc"),
+        "memory_usage": item.get("MemUsage"),
+        "memory_percent": item.get("MemPerc"),
+        "network_io": item.get("NetIO"),
+        "block_io": item.get("BlockIO"),
+    }
+
+
+def _parse_percent(value):
+    """"12.5%" -> 12.5 ; None si absent ou invalide"""
+    try:
+        return float(str(value).replace("%", "").strip())
+    except (TypeError, ValueError):
+        return None
 
 
+def _format_kb(kb):
+    """Taille en kB -> format lisible proche de `df -h`"""
+    size = float(kb)
+    for unit in ("K", "M", "G", "T"):
+        if size < 1024 or unit == "T":
+            return f"{size:.1f}{unit}" if size < 10 else f"{size:.0f}{unit}"
+        size /= 1024